@@ -1,171 +1,334 @@
-from fastapi import FastAPI, HTTPException, Body
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Body, Header, Request, Response
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from app import schemas
 from app.services.llm_engine import llm_engine
 from app.services.skill_manager import skill_manager
-import pandas as pd
-import pickle
-import ast
+import numpy as np
+import asyncio
+import hmac
+import json
 import os
-from sklearn.metrics.pairwise import linear_kernel
 from app.services.psych_service import psych_service
+from app.services.psych_table import psych_table
+from app.services.question_pool import QuestionGenerationError, question_pool
+from app.services.intent_router import intent_router
+from app.services.pre_grader import pre_grader
+from app.services.course_catalog import LEVEL_MAP
+from app.services.model_registry import ModelReloadError, model_registry
+from app.services.rec_table import MIN_MATCH_SCORE, rec_table
+from app.services.catalog_ingest import IngestError, catalog_ingestor
+from app.services.startup import FAILED, READY, startup_tracker
+from app.services.model_policy import start_degradation_trace, summarize_trace
+from app.services.admission import AdmissionRejected
+from app.services import metrics
+from app.services.metrics import stage, timed
 from typing import List
 
 app = FastAPI(title="MORA - AI Learning Assistant (Final)")
 
-# --- GLOBAL MODELS STORE ---
-models = {
-    'df': None,
-    'tfidf': None,
-    'matrix': None
-}
+# pandas / sklearn / scipy tidak di-import di sini: baru dimuat oleh warm-up di background
+startup_tracker.record("imports", READY, (time.perf_counter() - _IMPORT_STARTED) * 1000)
+# Subsystem wajib untuk /readyz. Intent router & question pool opsional (ada fallback ke LLM)
+startup_tracker.register("models")
+startup_tracker.register("keywords")
+startup_tracker.register("intent_router", required=False)
+startup_tracker.register("question_pool", required=False)
+startup_tracker.register("psych_table", required=False)
 
-SKILL_KEYWORDS = []
+# Warm-up di background: server langsung menerima traffic, /readyz jadi 200 setelah model siap.
+# WARMUP_IN_BACKGROUND=0 = load semua dulu sebelum server menerima request (perilaku lama)
+WARMUP_IN_BACKGROUND = os.getenv("WARMUP_IN_BACKGROUND", "1") == "1"
 
-@app.on_event("startup")
-def load_skill_keywords():
-    global SKILL_KEYWORDS
-    try:
-        current_dir = os.path.dirname(os.path.abspath(__file__))
-        csv_path = os.path.join(current_dir, "data", "Skill Keywords.csv")
-        df = pd.read_csv(csv_path)
-        SKILL_KEYWORDS = df['keyword'].dropna().tolist()
-        print(f"✅ Berhasil memuat {len(SKILL_KEYWORDS)} keywords skill.")
-    except Exception as e:
-        print(f"⚠️ Gagal memuat dataset keyword: {e}")
-        SKILL_KEYWORDS = []
+# Maksimal jawaban per request /exam/submit/batch
+EXAM_BATCH_MAX = int(os.getenv("EXAM_BATCH_MAX", "20"))
+
+# Token untuk endpoint admin (reload model). Kosong = endpoint admin dimatikan
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# Semantic cache LLM memakai vectorizer TF-IDF yang sama (ikut diganti saat reload)
+model_registry.on_reload(lambda bundle: llm_engine.cache.attach_vectorizer(bundle.tfidf))
+# Course hasil ingest (journal) diputar ulang di atas setiap bundle yang di-load dari disk
+model_registry.add_overlay(catalog_ingestor.overlay)
+# Tabel rekomendasi per (skill, level) dihitung ulang setiap model / Sub_skill.json berganti
+model_registry.on_reload(rec_table.schedule)
+skill_manager.on_reload(rec_table.schedule)
+
+# Upstream LLM penuh / kena rate limit: balas 429/503 + Retry-After, bukan 500
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# Timing per tahap tiap request: dikirim balik di header Server-Timing & masuk histogram /metrics
+@app.middleware("http")
+async def server_timing_middleware(request: Request, call_next):
+    started = time.perf_counter()
+    timings = metrics.start_request_timing()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    if metrics.METRICS_ENABLED:
+        metrics.HTTP_SECONDS.observe(elapsed, method=request.method, status=response.status_code,
+                                     path=getattr(route, "path", "unmatched"))
+    # Endpoint streaming: header terkirim sebelum stream jalan, jadi hanya berisi tahap sebelum token pertama
+    if metrics.SERVER_TIMING_ENABLED:
+        response.headers["Server-Timing"] = metrics.server_timing_header(timings, elapsed)
+    return response
 
 # Fungsi Pembantu: Mencari keyword dalam pesan user
 def find_keywords_in_text(user_text: str):
-    found = []
-    text_lower = " " + user_text.lower() + " " # Tambah spasi biar aman deteksi kata pendek
-    
-    for k in SKILL_KEYWORDS:
-        # Cek sederhana: Apakah keyword ada di dalam pesan?
-        # Untuk kata pendek (<3 huruf) seperti "C", "R", "Go", kita pakai spasi agar tidak match "Car" atau "Goat"
-        if len(k) < 3:
-            if f" {k.lower()} " in text_lower:
-                found.append(k)
-        else:
-            if k.lower() in text_lower:
-                found.append(k)
-                
-    # Hapus duplikat dan kembalikan
-    return list(set(found))
+    # Satu kali jalan di atas pesan (Aho-Corasick), aturan kata pendek tetap sama:
+    # keyword <3 huruf seperti "C", "R", "Go" harus diapit spasi agar tidak match "Car" atau "Goat"
+    with stage("keywords"):
+        return model_registry.current.keyword_matcher.find_keywords(user_text)
 
-# --- 1. STARTUP: LOAD MODEL .PKL ---
-@app.on_event("startup")
+def require_chat_models():
+    """Selama model & keyword masih dimuat, matcher masih kosong: balas 503 + Retry-After seperti /recommendations."""
+    if startup_tracker.loading("models") or startup_tracker.loading("keywords"):
+        raise HTTPException(status_code=503, detail="Model & keyword chat masih dimuat.", headers={"Retry-After": "2"})
+
+# --- Helper Server-Sent Events (endpoint streaming) ---
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+class StreamTimer:
+    """Mengukur time-to-first-byte, waktu token pertama, dan total waktu sebuah stream."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.first_byte = None
+        self.first_token = None
+
+    def _elapsed_ms(self):
+        return round((time.perf_counter() - self.start) * 1000, 1)
+
+    def mark_first(self, chunk: str) -> str:
+        if self.first_byte is None:
+            self.first_byte = self._elapsed_ms()
+        return chunk
+
+    def mark_token(self):
+        if self.first_token is None:
+            self.first_token = self._elapsed_ms()
+
+    def report(self, name: str) -> dict:
+        timing = {"ttfb_ms": self.first_byte, "first_token_ms": self.first_token, "total_ms": self._elapsed_ms()}
+        print(f"⏱️ {name}: TTFB {timing['ttfb_ms']} ms | token pertama {timing['first_token_ms']} ms | total {timing['total_ms']} ms")
+        return timing
+
+# --- 1. STARTUP: LOAD MODEL & KEYWORD (warm-up) ---
 def load_models():
     print("🔄 Loading Pre-trained Models...")
-    
-    # Menggunakan Absolute Path agar aman dijalankan dari mana saja
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    base_dir = os.path.dirname(current_dir)
-    artifacts_dir = os.path.join(base_dir, "model_artifacts")
-    
+    bundle = model_registry.load()
+    for part in ("models", "keywords"):
+        status = FAILED if part in bundle.errors else READY
+        startup_tracker.record(part, status, bundle.timings.get(part), bundle.errors.get(part))
+
+def load_intent_router():
+    try:
+        with startup_tracker.phase("intent_router"):
+            intent_router.train()
+    except Exception as e:
+        # Tanpa classifier lokal semua pesan tetap diarahkan oleh Router LLM
+        print(f"⚠️ Gagal melatih intent router lokal: {e}")
+
+async def warm_up():
+    """Load model, keyword & intent router di thread (event loop tetap melayani /healthz dll)."""
+    await asyncio.to_thread(load_models)
+    await asyncio.to_thread(load_intent_router)
+    # --- QUESTION POOL (stok soal ujian di background) ---
     try:
-        with open(os.path.join(artifacts_dir, 'courses_df.pkl'), 'rb') as f:
-            models['df'] = pickle.load(f)
-        with open(os.path.join(artifacts_dir, 'tfidf_vectorizer.pkl'), 'rb') as f:
-            models['tfidf'] = pickle.load(f)
-        with open(os.path.join(artifacts_dir, 'tfidf_matrix.pkl'), 'rb') as f:
-            models['matrix'] = pickle.load(f)
-        print(f"✅ Models Loaded Successfully from: {artifacts_dir}")
+        with startup_tracker.phase("question_pool"):
+            question_pool.load()
+            question_pool.start()
     except Exception as e:
-        print(f"❌ Error Loading Models: {e}")
-        print(f"👉 Pastikan folder 'model_artifacts' ada di: {base_dir}")
+        print(f"⚠️ Question pool gagal dijalankan: {e}")
+    # --- PSYCH TABLE (analisis tes psikologi yang dihitung di muka) ---
+    try:
+        with startup_tracker.phase("psych_table"):
+            psych_table.load()
+            psych_table.start()
+    except Exception as e:
+        print(f"⚠️ Psych table gagal dijalankan: {e}")
+    model_registry.start_watcher()
+    skill_manager.start_watcher()
+    print(f"⏱️ Startup selesai: {startup_tracker.breakdown()} (siap setelah {startup_tracker.ready_at_ms} ms)")
+
+warm_up_task = None
+
+@app.on_event("startup")
+async def start_warm_up():
+    global warm_up_task
+    if WARMUP_IN_BACKGROUND:
+        warm_up_task = asyncio.create_task(warm_up())
+    else:
+        await warm_up()
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    await model_registry.stop_watcher()
+    await skill_manager.stop_watcher()
+    await question_pool.stop()
+    await psych_table.stop()
+
+# --- HEALTH CHECK ---
+@app.get("/healthz")
+def healthz():
+    """Liveness: proses hidup & event loop merespons (tidak menunggu model)."""
+    return {"status": "ok", "uptime_s": startup_tracker.snapshot()["uptime_s"]}
+
+@app.get("/readyz")
+def readyz(response: Response):
+    """Readiness: 200 jika semua subsystem wajib sudah siap, 503 selama warm-up / jika gagal."""
+    snapshot = startup_tracker.snapshot()
+    snapshot["model_version"] = model_registry.current.version
+    if not snapshot["ready"]:
+        response.status_code = 503
+        response.headers["Retry-After"] = "2"
+    return snapshot
 
 # --- 2. ENDPOINT REKOMENDASI (ML POWERED) ---
 @app.post("/recommendations")
-def get_recommendations(user: schemas.UserProfile):
-    df = models.get('df')
-    tfidf = models.get('tfidf')
-    matrix = models.get('matrix')
+def get_recommendations(user: schemas.UserProfile, response: Response):
+    # Ambil bundle sekali: reload di tengah request tidak mencampur katalog lama & baru
+    bundle = model_registry.current
+    if bundle.catalog is None and startup_tracker.loading("models"):
+        raise HTTPException(status_code=503, detail="Model rekomendasi masih dimuat.", headers={"Retry-After": "2"})
+    response.headers["X-Model-Version"] = str(bundle.version)
+    catalog = bundle.catalog
     
     # Jika model belum siap, return kosong biar gak crash
-    if df is None: return []
+    if catalog is None or not user.missing_skills: return []
+    course_ids = catalog.course_ids
+    level_codes = catalog.level_codes
 
-    # Mapping Level agar komputer mengerti urutan
-    LEVEL_MAP = {
-        'beginner': 1, 'dasar': 1, 'pemula': 1,
-        'intermediate': 2, 'menengah': 2,
-        'advanced': 3, 'mahir': 3, 'expert': 3, 'profesional': 3
-    }
+    gaps = user.missing_skills
+    target_lvls = np.array([LEVEL_MAP.get(gap.target_level.lower(), 1) for gap in gaps], dtype=np.int8) # Default 1 (Pemula)
     
-    final_recs = []
-    # Set course yang sudah diambil agar tidak disarankan lagi
-    seen_courses = set(user.completed_courses)
+    try:
+        with stage("rec.score"):
+            # Top kandidat per gap (Cosine Similarity), urut skor turun. Skill yang dikenal diambil
+            # dari tabel precomputed per (skill, level); skill lain di-transform & di-scoring live.
+            top_idx, top_scores = rec_table.candidates(bundle, [gap.skill_name.lower() for gap in gaps], target_lvls)
+    except Exception as e:
+        # Satu gap bermasalah tidak boleh mengosongkan seluruh rekomendasi: ulangi per gap
+        print(f"Error scoring recommendations (batch), dicoba per gap: {e}")
+        top_idx, top_scores = rec_table.candidates_each(bundle, [gap.skill_name.lower() for gap in gaps], target_lvls)
     
-    # --- LOGIKA CORE: Loop setiap 'Gap' Skill User ---
-    for gap in user.missing_skills:
-        skill_query = gap.skill_name
-        target_lvl_str = gap.target_level.lower()
-        target_lvl_num = LEVEL_MAP.get(target_lvl_str, 1) # Default 1 (Pemula)
+    with stage("rec.filter"):
+        # --- FILTER (NumPy mask) ---
+        cand_lvls = level_codes[top_idx]
+        cand_ids = course_ids[top_idx]
+        # Skip jika kemiripan text terlalu rendah, course sudah diambil,
+        # atau levelnya DI ATAS target (kejauhan)
+        keep = (top_scores >= MIN_MATCH_SCORE) & (cand_lvls <= target_lvls[:, None])
+        if user.completed_courses:
+            keep &= ~np.isin(cand_ids, np.array(user.completed_courses, dtype=np.int64))
         
-        try:
-            # 1. Transform nama skill jadi vektor angka
-            vec = tfidf.transform([skill_query.lower()])
-            
-            # 2. Hitung kemiripan (Cosine Similarity)
-            scores = linear_kernel(vec, matrix).flatten()
-            
-            # 3. Ambil Top 15 kandidat
-            indices = scores.argsort()[:-15:-1]
-            
-            for idx in indices:
-                score = scores[idx]
-                # Filter awal: Skip jika kemiripan text terlalu rendah
-                if score < 0.1: continue
-                
-                course = df.iloc[idx]
-                c_id = int(course['course_id'])
-                
+        # Course yang sudah disarankan untuk gap sebelumnya tidak disarankan lagi
+        candidates = []
+        seen_courses = set()
+        for g, row in enumerate(keep):
+            for j in np.flatnonzero(row):
+                c_id = int(cand_ids[g, j])
                 if c_id in seen_courses: continue
-                
-                # --- FILTER LEVEL (ADAPTIVE) ---
-                c_lvl_str = str(course['level_name']).lower()
-                c_lvl_num = LEVEL_MAP.get(c_lvl_str, 1)
-                
-                # Logic: Jangan kasih course yang levelnya DI ATAS target (kejauhan)
-                if c_lvl_num > target_lvl_num: continue
-                
-                # Logic Badge (Penanda)
-                if c_lvl_num == target_lvl_num:
-                    badge = "🎯 Target Pas"
-                else:
-                    badge = "↺ Review Dasar"
-
-                # Parse Tutorial List (karena di CSV formatnya string)
-                tuts = course['tutorial_list']
-                if isinstance(tuts, str):
-                    try: tuts = ast.literal_eval(tuts)
-                    except: tuts = []
-                
-                # Tambahkan ke hasil
-                final_recs.append({
-                    "skill": skill_query,
-                    "current_level": gap.target_level,
-                    "course_to_take": course['course_name'],
-                    "chapters": tuts[:3], # Ambil 3 bab pertama
-                    "match_score": round(score * 100, 1),
-                    "badge": badge
-                })
                 seen_courses.add(c_id)
-                
-        except Exception as e:
-            print(f"Error processing {skill_query}: {e}")
-            continue
-
-    # Urutkan berdasarkan skor kecocokan tertinggi
-    final_recs = sorted(final_recs, key=lambda x: x['match_score'], reverse=True)
+                candidates.append((round(float(top_scores[g, j]) * 100, 1), g, int(top_idx[g, j])))
+        
+        # Urutkan berdasarkan skor kecocokan tertinggi, lalu baru ambil detail course Top 5
+        candidates.sort(key=lambda x: x[0], reverse=True)
+    
+    final_recs = []
+    for match_score, g, idx in candidates[:5]:
+        gap = gaps[g]
+        
+        # Logic Badge (Penanda)
+        if level_codes[idx] == target_lvls[g]:
+            badge = "🎯 Target Pas"
+        else:
+            badge = "↺ Review Dasar"
+        
+        final_recs.append({
+            "skill": gap.skill_name,
+            "current_level": gap.target_level,
+            "course_to_take": catalog.names[idx],
+            "chapters": list(catalog.chapters[idx][:3]), # Ambil 3 bab pertama
+            "match_score": match_score,
+            "badge": badge
+        })
     
-    return final_recs[:5] # Kembalikan Top 5
+    return final_recs # Kembalikan Top 5
 
 # --- 3. ENDPOINT CHAT ROUTER ---
+# Batas paralel & timeout generate soal ujian (multi-skill)
+EXAM_MAX_CONCURRENCY = int(os.getenv("EXAM_MAX_CONCURRENCY", "4"))
+EXAM_ITEM_TIMEOUT = float(os.getenv("EXAM_ITEM_TIMEOUT", "30"))
+
+@timed("exam.generate")
+async def generate_exams(req: schemas.ChatRequest, target_skill_ids: List[str]):
+    """
+    Generate soal untuk beberapa skill sekaligus secara paralel.
+    Urutan hasil selalu sama dengan urutan target_skill_ids. Soal yang gagal /
+    kelamaan tetap dikembalikan dengan status "timeout" / "error" (partial result),
+    tanpa menggagalkan soal lain.
+    """
+    semaphore = asyncio.Semaphore(max(1, EXAM_MAX_CONCURRENCY))
+
+    async def build_exam(skid: str):
+        # Ambil level user
+        user_current_level = req.current_skills.get(skid, "beginner")
+        skill_details = skill_manager.get_skill_details(req.role, skid)
+        level_data = skill_details['levels'].get(user_current_level, skill_details['levels']['beginner'])
+        exam = {
+            "skill_id": skid,
+            "skill_name": skill_details['name'],
+            "level": user_current_level,
+            "question": None,
+            "context": {},
+            "status": "ok"
+        }
+
+        try:
+            async with semaphore:
+                # Ambil dari stok question pool, generate langsung hanya jika stok kosong
+                llm_res = await asyncio.wait_for(
+                    question_pool.get_question(skid, user_current_level, level_data['exam_topics']),
+                    timeout=EXAM_ITEM_TIMEOUT
+                )
+            exam["question"] = llm_res['question_text']
+            # Teks soal ikut di context (dikirim balik frontend saat submit) untuk aturan copy_question pre-grader
+            exam["context"] = {**llm_res['grading_rubric'], "question_text": llm_res['question_text']}
+        except asyncio.TimeoutError:
+            print(f"⚠️ Generate soal {skid} timeout ({EXAM_ITEM_TIMEOUT}s)")
+            exam["status"] = "timeout"
+        except AdmissionRejected as e:
+            print(f"⚠️ Generate soal {skid} ditolak admission: {e.reason}")
+            exam["status"] = "busy"
+        except QuestionGenerationError as e:
+            print(f"⚠️ Generate soal {skid} tidak valid: {e}")
+            exam["status"] = "error"
+        except Exception as e:
+            print(f"⚠️ Generate soal {skid} gagal: {e}")
+            exam["status"] = "error"
+        return exam
+
+    # gather menjaga urutan hasil sesuai urutan input
+    return await asyncio.gather(*(build_exam(skid) for skid in target_skill_ids))
+
+
 # app/main.py (Bagian process_chat saja)
 
-@app.post("/chat/process", response_model=schemas.ChatResponse)
-async def process_chat(req: schemas.ChatRequest):
-    role_data = skill_manager.get_role_data(req.role)
+async def route_chat(req: schemas.ChatRequest):
+    """Langkah 1-2 chat: deteksi keyword skill di pesan user + Router LLM."""
     # --- [UPDATE BARU: Ektrak Silabus Lengkap] ---
     # Kita buat string rapi berisi Skill + Topik-topiknya
     found_keywords = find_keywords_in_text(req.message)
@@ -180,50 +343,42 @@ async def process_chat(req: schemas.ChatRequest):
         keyword_context = "NONE"
         dataset_status = "NOT_FOUND"
 
-    # 2. Router
-    intent = await llm_engine.process_user_intent(req.message, [])
+    # 2. Router (lokal dulu, Router LLM hanya jika classifier lokal tidak yakin)
+    with stage("router"):
+        intent = await intent_router.route(req.message, req.role)
     
-    action = intent.get('action')
-    # PERUBAHAN 1: Ambil List skills, bukan single skill
-    detected_skills_list = intent.get('detected_skills', [])
+    return {
+        "action": intent.get('action'),
+        # PERUBAHAN 1: Ambil List skills, bukan single skill
+        "detected_skills": intent.get('detected_skills', []),
+        "keyword_context": keyword_context,
+        "dataset_status": dataset_status
+    }
+
+async def run_chat_action(req: schemas.ChatRequest, route: dict):
+    """
+    Langkah 3 chat: jalankan aksi hasil router.
+    Return (action, final_reply, response_data). final_reply None artinya
+    jawaban harus dibuat oleh casual chat LLM (biasa atau streaming).
+    """
+    role_data = skill_manager.get_role_data(req.role)
+    action = route['action']
+    detected_skills_list = route['detected_skills']
     
     final_reply = ""
     response_data = None
     
     # 3. Logic
     if action == "START_EXAM":
+        # A. Cari ID untuk SEMUA skill yang dideteksi (index n-gram di SkillManager)
         target_skill_ids = []
-        
-        # A. Cari ID untuk SEMUA skill yang dideteksi (Looping)
         if detected_skills_list and role_data:
-            for ds in detected_skills_list:
-                for s in role_data['sub_skills']:
-                    # Cek kemiripan nama
-                    if s['name'].lower() in ds.lower() or ds.lower() in s['name'].lower():
-                        if s['id'] not in target_skill_ids:
-                            target_skill_ids.append(s['id'])
+            target_skill_ids = skill_manager.resolve_skill_ids(req.role, detected_skills_list)
         
         # B. Jika ada skill yang valid, generate soal untuk MASING-MASING skill
         if target_skill_ids:
-            exam_list = []
-            
-            for skid in target_skill_ids:
-                # Ambil level user
-                user_current_level = req.current_skills.get(skid, "beginner")
-                skill_details = skill_manager.get_skill_details(req.role, skid)
-                level_data = skill_details['levels'].get(user_current_level, skill_details['levels']['beginner'])
-                
-                # Generate Soal (Sequential)
-                llm_res = await llm_engine.generate_question(level_data['exam_topics'], user_current_level)
-                
-                # Masukkan ke list soal
-                exam_list.append({
-                    "skill_id": skid,
-                    "skill_name": skill_details['name'],
-                    "level": user_current_level,
-                    "question": llm_res['question_text'],
-                    "context": llm_res['grading_rubric']
-                })
+            # Generate Soal secara paralel (dibatasi semaphore + timeout per soal)
+            exam_list = await generate_exams(req, target_skill_ids)
             
             # C. Format Response Baru (Multi-Exam)
             response_data = {
@@ -231,17 +386,19 @@ async def process_chat(req: schemas.ChatRequest):
                 "exams": exam_list        # List soal ada di sini
             }
             
-            skill_display = ", ".join([x['skill_name'] for x in exam_list])
-            final_reply = f"Siap! Saya siapkan {len(exam_list)} ujian untukmu: **{skill_display}**. Silakan kerjakan satu per satu di bawah ini! 👇"
+            ready_exams = [x for x in exam_list if x['status'] == "ok"]
+            failed_display = ", ".join([x['skill_name'] for x in exam_list if x['status'] != "ok"])
+            if ready_exams:
+                skill_display = ", ".join([x['skill_name'] for x in ready_exams])
+                final_reply = f"Siap! Saya siapkan {len(ready_exams)} ujian untukmu: **{skill_display}**. Silakan kerjakan satu per satu di bawah ini! 👇"
+                if failed_display:
+                    final_reply += f"\n\n⚠️ Soal untuk **{failed_display}** belum berhasil dibuat, coba minta lagi sebentar lagi ya."
+            else:
+                final_reply = f"Maaf, soal untuk **{failed_display}** belum berhasil dibuat. Coba minta lagi sebentar lagi ya 🙏"
             
         else:
             action = "CASUAL_CHAT"
-            final_reply = await llm_engine.casual_chat(
-            req.message, 
-            [m.dict() for m in req.history], 
-            keyword_context, 
-            dataset_status 
-        )
+            final_reply = None
 
     elif action == "START_PSYCH_TEST":
         response_data = {"trigger_psych_test": True}
@@ -252,30 +409,93 @@ async def process_chat(req: schemas.ChatRequest):
         final_reply = "Sedang menganalisis kebutuhan belajarmu..."
 
     elif action == "CASUAL_CHAT":
+        final_reply = None
+
+    return action, final_reply, response_data
+
+@app.post("/chat/process", response_model=schemas.ChatResponse)
+async def process_chat(req: schemas.ChatRequest):
+    require_chat_models()
+    # Catat method LLM yang turun ke model cadangan / template lokal selama request ini
+    trace = start_degradation_trace()
+    route = await route_chat(req)
+    action, final_reply, response_data = await run_chat_action(req, route)
+    
+    if final_reply is None:
         final_reply = await llm_engine.casual_chat(
             req.message, 
             [m.dict() for m in req.history], 
-            keyword_context, 
-            dataset_status 
+            route['keyword_context'], 
+            route['dataset_status'] 
         )
 
     return schemas.ChatResponse(
         reply=final_reply,
         action_type=action,
-        data=response_data
+        data=response_data,
+        degraded=bool(trace),
+        degraded_reason=summarize_trace(trace)
     )
 
+@app.post("/chat/process/stream")
+async def process_chat_stream(req: schemas.ChatRequest):
+    """
+    Versi streaming (Server-Sent Events) dari /chat/process.
+    Event: "route" (keputusan router) -> "token" (potongan jawaban casual chat) -> "done" (ChatResponse lengkap).
+    Jika upstream LLM penuh, dikirim event "error" (status_code + retry_after) lalu stream ditutup.
+    """
+    # Dicek sebelum stream dibuka supaya client tetap menerima status 503 biasa
+    require_chat_models()
+    async def events():
+        timer = StreamTimer()
+        trace = start_degradation_trace()
+        try:
+            route = await route_chat(req)
+        except AdmissionRejected as e:
+            yield timer.mark_first(sse_event("error", {"detail": e.reason, "status_code": e.status_code, "retry_after": e.retry_after}))
+            return
+        yield timer.mark_first(sse_event("route", {
+            "action": route['action'],
+            "detected_skills": route['detected_skills'],
+            "dataset_status": route['dataset_status']
+        }))
+        
+        try:
+            action, final_reply, response_data = await run_chat_action(req, route)
+        except AdmissionRejected as e:
+            yield sse_event("error", {"detail": e.reason, "status_code": e.status_code, "retry_after": e.retry_after})
+            return
+        
+        if final_reply is None:
+            parts = []
+            async for token in llm_engine.stream_casual_chat(
+                req.message,
+                [m.dict() for m in req.history],
+                route['keyword_context'],
+                route['dataset_status']
+            ):
+                timer.mark_token()
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+            final_reply = "".join(parts)
+        
+        final = schemas.ChatResponse(
+            reply=final_reply, action_type=action, data=response_data,
+            degraded=bool(trace), degraded_reason=summarize_trace(trace)
+        )
+        yield sse_event("done", {**final.dict(), "timing": timer.report("/chat/process/stream")})
 
-@app.post("/exam/submit", response_model=schemas.EvaluationResponse)
-async def submit_exam(sub: schemas.AnswerSubmission):
-    evaluation = await llm_engine.evaluate_answer(
-        user_answer=sub.user_answer,
-        question_context={
-            "question_text": "REFER TO CONTEXT",
-            "grading_rubric": sub.question_context
-        }
-    )
-    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def grading_context(sub: schemas.AnswerSubmission) -> dict:
+    # Teks soal dipisah dari rubrik; context lama (tanpa question_text) tetap bisa dinilai
+    rubric = {k: v for k, v in sub.question_context.items() if k != "question_text"}
+    return {
+        "question_text": sub.question_context.get("question_text") or "REFER TO CONTEXT",
+        "grading_rubric": rubric
+    }
+
+def to_evaluation_response(evaluation: dict) -> schemas.EvaluationResponse:
     is_passed = evaluation['is_correct'] and evaluation['score'] >= 70
     suggested_lvl = "intermediate" if is_passed else None # Logika sederhana
     
@@ -287,6 +507,27 @@ async def submit_exam(sub: schemas.AnswerSubmission):
         suggested_new_level=suggested_lvl
     )
 
+@app.post("/exam/submit", response_model=schemas.EvaluationResponse)
+async def submit_exam(sub: schemas.AnswerSubmission):
+    # Jawaban kosong / "tidak tahu" / melenceng dinilai lokal, sisanya oleh LLM
+    evaluation = await pre_grader.evaluate(sub.user_answer, grading_context(sub))
+    return to_evaluation_response(evaluation)
+
+@app.post("/exam/submit/batch", response_model=List[schemas.EvaluationResponse])
+async def submit_exam_batch(subs: List[schemas.AnswerSubmission]):
+    """
+    Kirim beberapa jawaban sekaligus (misal hasil multiple_exams). Hasil berurutan sesuai input.
+    Jawaban digabung dalam prompt penilaian bersama; item yang gagal dinilai ulang sendiri.
+    """
+    if not subs:
+        return []
+    if len(subs) > EXAM_BATCH_MAX:
+        raise HTTPException(status_code=422, detail=f"Maksimal {EXAM_BATCH_MAX} jawaban per batch.")
+    evaluations = await pre_grader.evaluate_many(
+        [(sub.user_answer, grading_context(sub)) for sub in subs]
+    )
+    return [to_evaluation_response(evaluation) for evaluation in evaluations]
+
 # --- 5. ENDPOINT PROGRESS ---
 @app.post("/progress/analyze")
 async def get_progress_analysis(data: schemas.ProgressData):
@@ -301,6 +542,143 @@ async def get_progress_analysis(data: schemas.ProgressData):
     
     return {"analysis": analysis_text}
 
+@app.post("/progress/analyze/stream")
+async def get_progress_analysis_stream(data: schemas.ProgressData):
+    """Versi streaming (Server-Sent Events): event "token" berulang lalu "done" berisi analysis lengkap."""
+    progress_dict = data.dict()
+
+    async def events():
+        timer = StreamTimer()
+        parts = []
+        async for token in llm_engine.stream_analyze_progress(
+            user_name=data.user_name,
+            progress_data=progress_dict
+        ):
+            yield timer.mark_first(sse_event("token", {"text": token}))
+            timer.mark_token()
+            parts.append(token)
+        yield sse_event("done", {"analysis": "".join(parts), "timing": timer.report("/progress/analyze/stream")})
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+# --- 6. ENDPOINT STATUS LLM ---
+@app.get("/llm/status")
+def get_llm_status():
+    """Status scheduler API key Groq (headroom, cooldown, beban per key), cache & call yang digabung."""
+    return {
+        "keys": llm_engine.key_pool.snapshot(),
+        "cache": llm_engine.cache.snapshot(),
+        "singleflight": llm_engine.singleflight.snapshot(),
+        "upstream": {**llm_engine.upstream_stats, "latency": llm_engine.latency.snapshot()},
+        "model_policy": llm_engine.policy.snapshot(),
+        "admission": llm_engine.admission.snapshot(),
+        "question_pool": question_pool.snapshot(),
+        "intent_router": intent_router.snapshot(),
+        "pre_grader": pre_grader.snapshot(),
+        "psych_table": psych_table.snapshot()
+    }
+
+# --- METRICS (format Prometheus) ---
+def collect_service_metrics():
+    """Angka yang sudah dihitung modul lain, dibaca saat /metrics di-scrape."""
+    cache_rows, ratio_rows = [], []
+    for method, bucket in llm_engine.cache.stats.items():
+        for result, count in bucket.items():
+            cache_rows.append(({"method": method, "result": result}, count))
+        lookups = sum(bucket.values())
+        hits = bucket.get("exact_hits", 0) + bucket.get("semantic_hits", 0)
+        ratio_rows.append(({"method": method}, round(hits / lookups, 4) if lookups else 0.0))
+    yield "mora_llm_cache_lookups_total", "counter", "Lookup cache LLM per method & hasil.", cache_rows
+    yield "mora_llm_cache_hit_ratio", "gauge", "Porsi lookup cache LLM yang hit (exact + semantic).", ratio_rows
+
+    keys = llm_engine.key_pool.snapshot()
+    per_key = lambda field: [({"key": f"key-{i + 1}"}, k[field]) for i, k in enumerate(keys)]
+    yield "mora_llm_key_requests_total", "counter", "Call sukses per API key.", per_key("total_requests")
+    yield "mora_llm_key_tokens_total", "counter", "Token terpakai per API key.", per_key("total_tokens")
+    yield "mora_llm_key_throttled_total", "counter", "Rate limit (429) per API key.", per_key("throttled")
+    yield "mora_llm_key_failures_total", "counter", "Call gagal per API key.", per_key("failures")
+    yield "mora_llm_key_inflight", "gauge", "Call yang sedang berjalan per API key.", per_key("inflight")
+    yield "mora_llm_key_headroom", "gauge", "Sisa kuota per API key (0-1).", per_key("headroom")
+    yield "mora_llm_key_circuit_open", "gauge", "1 jika circuit breaker key sedang open.", \
+        [({"key": f"key-{i + 1}"}, int(k["circuit"] == "open")) for i, k in enumerate(keys)]
+
+    yield "mora_llm_upstream_events_total", "counter", "Hedged request, hedge yang menang & timeout.", \
+        [({"event": name}, count) for name, count in llm_engine.upstream_stats.items()]
+    flight = llm_engine.singleflight.snapshot()
+    yield "mora_llm_coalesced_total", "counter", "Call LLM yang digabung (singleflight).", [({}, flight["coalesced"])]
+    admission = llm_engine.admission.snapshot()
+    yield "mora_llm_admission_queue_depth", "gauge", "Request yang antre di admission control.", [({}, admission["queue_depth"])]
+    yield "mora_llm_admission_rejected_total", "counter", "Request yang ditolak admission control.", \
+        [({"reason": name[len("rejected_"):]}, admission[name]) for name in admission if name.startswith("rejected_")]
+    yield "mora_model_version", "gauge", "Versi bundle model rekomendasi yang aktif.", [({}, model_registry.current.version)]
+    yield "mora_rec_table_lookups_total", "counter", "Gap rekomendasi dari tabel precomputed vs scoring live.", \
+        [({"result": "hit"}, rec_table.stats["hits"]), ({"result": "miss"}, rec_table.stats["misses"]),
+         ({"result": "stale"}, rec_table.stats["stale"])]
+
+metrics.registry.register_collector(collect_service_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Histogram latency per tahap & endpoint, token, cache, failover (format teks Prometheus)."""
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4")
+
+# --- 7. ENDPOINT MODEL (status & hot reload) ---
+@app.get("/models/status")
+def get_models_status():
+    """Versi bundle model yang sedang dipakai + status reload, ingest katalog & tabel rekomendasi."""
+    return {**model_registry.snapshot(), "ingest": catalog_ingestor.snapshot(), "rec_table": rec_table.snapshot()}
+
+def check_admin_token(x_admin_token: str):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Endpoint admin dimatikan (ADMIN_TOKEN belum di-set).")
+    if not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Token admin salah.")
+
+@app.post("/admin/models/reload")
+async def reload_models(force: bool = True, x_admin_token: str = Header(default="")):
+    """
+    Bangun ulang katalog, TF-IDF & keyword matcher di background lalu tukar secara atomik.
+    Request yang sedang berjalan tetap selesai dengan bundle lama.
+    """
+    check_admin_token(x_admin_token)
+    previous = model_registry.current.version
+    try:
+        bundle = await model_registry.reload(force=force)
+    except ModelReloadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "reloaded": bundle is not None,
+        "previous_version": previous,
+        "serving": model_registry.current.info()
+    }
+
+@app.post("/admin/catalog/courses")
+async def upsert_courses(courses: List[schemas.CourseUpsert], x_admin_token: str = Header(default="")):
+    """
+    Tambah / perbarui course di katalog yang sedang dipakai (tanpa fit ulang TF-IDF).
+    Rebuild penuh dijadwalkan otomatis di background jika drift IDF melewati ambang.
+    """
+    check_admin_token(x_admin_token)
+    try:
+        return await asyncio.to_thread(catalog_ingestor.upsert, [c.dict() for c in courses])
+    except IngestError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.delete("/admin/catalog/courses/{course_id}")
+async def delete_course(course_id: int, x_admin_token: str = Header(default="")):
+    """Hapus course dari rekomendasi (tombstone sampai rebuild berikutnya)."""
+    check_admin_token(x_admin_token)
+    try:
+        return await asyncio.to_thread(catalog_ingestor.delete, [course_id])
+    except IngestError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+@app.post("/admin/catalog/rebuild")
+def rebuild_catalog(x_admin_token: str = Header(default="")):
+    """Fit ulang vectorizer dari dataset + journal di background (output ke cache/catalog/), lalu hot reload."""
+    check_admin_token(x_admin_token)
+    return {"scheduled": catalog_ingestor.schedule_rebuild("manual"), "ingest": catalog_ingestor.snapshot()}
+
 # ==========================================
 # ENDPOINT PSIKOLOGI (JOB ROLE TEST)
 # ==========================================
@@ -312,17 +690,16 @@ def get_psych_questions():
 
 @app.post("/psych/submit", response_model=schemas.PsychResultResponse)
 async def submit_psych_test(req: schemas.PsychSubmitRequest):
-    """Menerima jawaban user, hitung skor, dan minta analisis LLM."""
+    """Menerima jawaban user, hitung skor, dan ambil analisis dari tabel (LLM jika pola belum ada)."""
     
     # 1. Hitung Skor secara matematis
     result = psych_service.calculate_result(req.answers)
     
     winner = result["winner"]
     scores = result["scores"]
-    traits = result["traits"]
     
-    # 2. Minta LLM buatkan kata-kata mutiara/analisis
-    analysis_text = await llm_engine.analyze_psych_result(winner, traits)
+    # 2. Ambil kata-kata mutiara/analisis dari tabel yang dihitung di muka
+    analysis_text = await psych_table.analyze(req.answers, result)
     
     return schemas.PsychResultResponse(
         suggested_role=winner,
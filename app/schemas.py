@@ -25,6 +25,8 @@ class ChatResponse(BaseModel):
     reply: str                          # Teks balasan bot
     action_type: str                    # "START_EXAM", "GET_RECOMMENDATION", "CASUAL_CHAT", "START_PSYCH_TEST"
     data: Optional[Dict[str, Any]] = None # Data tambahan (Soal ujian / List Rekomendasi)
+    degraded: bool = False              # True jika jawaban dibuat model cadangan / template lokal (beban tinggi)
+    degraded_reason: Optional[str] = None # Contoh: "casual_chat -> fast (headroom=0.10)"
 
 # ==========================================
 # 2. EXAM SYSTEM (UJIAN)
@@ -70,6 +72,16 @@ class RecommendationItem(BaseModel):
     chapters: List[str]
     match_score: float
     badge: str
+
+class CourseUpsert(BaseModel):
+    """Course baru / versi baru course untuk ingest katalog (kolom sama dengan smart_course_dataset.csv)."""
+    course_id: int
+    course_name: str
+    level_name: str                      # Contoh: "Pemula"
+    learning_path_name: List[str] = []   # Contoh: ["Back-End Developer Python"]
+    tutorial_list: List[str] = []        # Daftar bab
+    hours_to_study: int = 0
+    combined_text_for_model: Optional[str] = None # Kosong = dibentuk dari nama + path + level + bab
 # ==========================================
 # 4. PROGRESS SYSTEM
 # ==========================================
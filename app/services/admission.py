@@ -0,0 +1,225 @@
+# app/services/admission.py
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+from app.services.key_pool import MAX_INFLIGHT_PER_KEY
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Panjang antrean maksimal; jika penuh request prioritas terendah ditolak (503)
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "32"))
+# Lama maksimal menunggu di antrean sebelum ditolak (detik)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10"))
+# Retry-After (detik) untuk penolakan karena antrean penuh / kelamaan
+ADMISSION_RETRY_AFTER = int(os.getenv("ADMISSION_RETRY_AFTER", "5"))
+# Hedged request hanya dikirim jika slot terpakai masih di bawah porsi kapasitas ini & tidak ada antrean
+HEDGE_MAX_UTILIZATION = float(os.getenv("ADMISSION_HEDGE_MAX_UTILIZATION", "0.75"))
+
+# Prioritas per method LLMEngine (angka kecil = didahulukan).
+# Penilaian ujian paling penting (user menunggu hasil), casual chat paling rendah.
+# Override lewat env, contoh: ADMISSION_PRIORITY_CASUAL_CHAT=3
+DEFAULT_PRIORITIES = {
+    "evaluate_answer": 0,
+    "evaluate_answer_batch": 0,
+    "generate_question": 1,
+    "process_user_intent": 2,
+    "analyze_psych_result": 3,
+    "analyze_progress": 3,
+    "casual_chat": 4,
+}
+DEFAULT_PRIORITY = 5
+# Pekerjaan background (misal refill question pool) selalu paling belakang
+BACKGROUND_PRIORITY = 9
+WAIT_WINDOW = 500
+
+_background: ContextVar[bool] = ContextVar("admission_background", default=False)
+
+
+def method_priority(method: Optional[str]) -> int:
+    if _background.get():
+        return BACKGROUND_PRIORITY
+    if method:
+        env_value = os.getenv(f"ADMISSION_PRIORITY_{method.upper()}")
+        if env_value is not None:
+            return int(env_value)
+        if method in DEFAULT_PRIORITIES:
+            return DEFAULT_PRIORITIES[method]
+    return DEFAULT_PRIORITY
+
+
+@contextmanager
+def background_work():
+    """Tandai call LLM di dalam blok ini sebagai pekerjaan background (prioritas terendah)."""
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+class AdmissionRejected(Exception):
+    """Request ditolak sebelum dikirim ke Groq. Endpoint membalas status_code + Retry-After."""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = max(int(retry_after), 1)
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Gerbang sebelum call ke Groq:
+    - Maksimal MAX_INFLIGHT_PER_KEY call per key sehat berjalan bersamaan.
+    - Kelebihannya antre di priority queue (evaluate_answer > generate_question > intent > analisis > casual).
+    - Antrean penuh / kelamaan -> 503, semua key kena rate limit -> 429 (dengan Retry-After).
+    """
+
+    def __init__(self, key_pool, per_key: int = MAX_INFLIGHT_PER_KEY, max_queue: int = ADMISSION_MAX_QUEUE,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT):
+        self.key_pool = key_pool
+        self.per_key = max(per_key, 1)
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self._heap = []                      # (prioritas, urutan, future)
+        self._seq = itertools.count()
+        self._waits = deque(maxlen=WAIT_WINDOW)
+        self.stats = {"admitted": 0, "queued": 0, "rejected_full": 0, "rejected_timeout": 0,
+                      "rejected_throttled": 0, "rejected_unavailable": 0, "evicted": 0}
+
+    # --- KAPASITAS ---
+    def capacity(self, now: Optional[float] = None) -> int:
+        now = now or time.monotonic()
+        healthy = sum(1 for k in self.key_pool.keys if k.breaker.allows(now))
+        return healthy * self.per_key
+
+    def _throttle_retry_after(self, now: float) -> Optional[int]:
+        """Jika semua key sedang cooldown (rate limit), return sisa cooldown terpendek."""
+        keys = self.key_pool.keys
+        if not keys or not all(k.is_cooling(now) for k in keys):
+            return None
+        return math.ceil(min(k.cooldown_until for k in keys) - now)
+
+    def _circuit_retry_after(self, now: float) -> Optional[int]:
+        """Jika circuit breaker semua key open, return waktu sampai key pertama bisa di-probe."""
+        keys = self.key_pool.keys
+        if any(k.breaker.allows(now) for k in keys):
+            return None
+        return math.ceil(min(k.breaker.opened_until for k in keys) - now)
+
+    def queue_depth(self) -> int:
+        return sum(1 for _, _, fut in self._heap if not fut.done())
+
+    # --- ACQUIRE / RELEASE ---
+    async def acquire(self, method: Optional[str]):
+        if not len(self.key_pool):
+            # Tidak ada key: biarkan LLMEngine yang melaporkan error seperti biasa
+            self.inflight += 1
+            return
+        now = time.monotonic()
+        retry_after = self._throttle_retry_after(now)
+        if retry_after is not None:
+            self.stats["rejected_throttled"] += 1
+            raise AdmissionRejected(429, retry_after, "Semua API key sedang kena rate limit.")
+        retry_after = self._circuit_retry_after(now)
+        if retry_after is not None:
+            self.stats["rejected_unavailable"] += 1
+            raise AdmissionRejected(503, retry_after, "Layanan LLM sedang tidak tersedia.")
+
+        started = time.perf_counter()
+        if self.inflight < self.capacity(now) and not self.queue_depth():
+            self._admit(started)
+            return
+
+        priority = method_priority(method)
+        if len(self._heap) > 2 * self.max_queue:
+            # Buang entri yang sudah batal / timeout
+            self._heap = [item for item in self._heap if not item[2].done()]
+            heapq.heapify(self._heap)
+        self._make_room(priority)
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (priority, next(self._seq), fut))
+        self.stats["queued"] += 1
+        try:
+            await asyncio.wait_for(fut, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.stats["rejected_timeout"] += 1
+            raise AdmissionRejected(503, ADMISSION_RETRY_AFTER,
+                                    f"Antrean LLM penuh, sudah menunggu {self.queue_timeout:g} detik.")
+        except asyncio.CancelledError:
+            # Slot sudah diberikan tepat saat request dibatalkan: kembalikan
+            if fut.done() and not fut.cancelled() and fut.exception() is None:
+                self.release()
+            raise
+        self._waits.append(time.perf_counter() - started)
+
+    def _make_room(self, priority: int):
+        if self.queue_depth() < self.max_queue:
+            return
+        # Antrean penuh: geser request prioritas terendah jika yang baru lebih penting
+        pending = [item for item in self._heap if not item[2].done()]
+        worst = max(pending, key=lambda item: (item[0], item[1]), default=None)
+        if worst is None or worst[0] <= priority:
+            self.stats["rejected_full"] += 1
+            raise AdmissionRejected(503, ADMISSION_RETRY_AFTER, "Antrean LLM penuh, coba lagi sebentar.")
+        worst[2].set_exception(AdmissionRejected(503, ADMISSION_RETRY_AFTER,
+                                                 "Digeser request dengan prioritas lebih tinggi."))
+        self.stats["evicted"] += 1
+
+    def try_acquire_hedge(self, now: Optional[float] = None) -> bool:
+        """
+        Slot tambahan untuk hedged request, tanpa antre. Ditolak (False) jika ada request yang
+        menunggu atau pemakaian slot sudah di atas HEDGE_MAX_UTILIZATION. Slot dikembalikan lewat release().
+        """
+        if self.queue_depth() or self.inflight + 1 > self.capacity(now) * HEDGE_MAX_UTILIZATION:
+            return False
+        self.inflight += 1
+        return True
+
+    def _admit(self, started: float):
+        self.inflight += 1
+        self.stats["admitted"] += 1
+        self._waits.append(time.perf_counter() - started)
+
+    def release(self):
+        self.inflight = max(self.inflight - 1, 0)
+        self._dispatch()
+
+    def _dispatch(self):
+        capacity = self.capacity()
+        while self._heap and self.inflight < capacity:
+            _, _, fut = heapq.heappop(self._heap)
+            if fut.done():
+                continue
+            fut.set_result(True)
+            self.inflight += 1
+            self.stats["admitted"] += 1
+
+    # --- METRICS ---
+    def snapshot(self) -> dict:
+        waits = sorted(self._waits)
+
+        def pct(q):
+            return round(waits[min(int(q * len(waits)), len(waits) - 1)] * 1000, 1) if waits else 0.0
+
+        by_priority: Dict[int, int] = {}
+        for priority, _, fut in self._heap:
+            if not fut.done():
+                by_priority[priority] = by_priority.get(priority, 0) + 1
+        return {
+            "capacity": self.capacity(),
+            "inflight": self.inflight,
+            "queue_depth": sum(by_priority.values()),
+            "queue_by_priority": by_priority,
+            "max_queue": self.max_queue,
+            "wait_ms": {"p50": pct(0.5), "p95": pct(0.95), "max": round(waits[-1] * 1000, 1) if waits else 0.0},
+            **self.stats,
+        }
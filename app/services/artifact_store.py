@@ -0,0 +1,400 @@
+# app/services/artifact_store.py
+"""
+Format artefak model yang ringkas & bisa di-memory-map (pengganti 3 file .pkl).
+
+Struktur folder (default: model_artifacts/compact/):
+    manifest.json            versi format, parameter vectorizer, hash SHA-256 tiap file
+                             + hash SHA-256 file .pkl sumber (deteksi artefak basi)
+    matrix_data.npy          TF-IDF matrix (CSR): data
+    matrix_indices.npy       TF-IDF matrix (CSR): indices
+    matrix_indptr.npy        TF-IDF matrix (CSR): indptr
+    vocab_blob.npy           kosakata (UTF-8, urut sesuai kolom matrix)
+    vocab_offsets.npy
+    idf.npy                  bobot IDF per kolom
+    course_ids.npy           kolom course (urut sesuai baris matrix)
+    level_codes.npy
+    names_blob.npy / names_offsets.npy
+    chapters_blob.npy / chapters_offsets.npy / chapters_ptr.npy
+
+Semua array dibuka dengan mmap_mode='r', jadi beberapa worker uvicorn berbagi
+page yang sama lewat page cache OS (tidak di-copy ke memori tiap proses).
+
+Katalog hasil rebuild ingest (catalog_ingest) ditulis ke CATALOG_DIR (default: cache/catalog/,
+tidak di-track git) dengan struktur yang sama: 3 file .pkl + compact/ + base.json. Loader memakai
+folder itu selama base.json cocok dengan dataset & pickle di model_artifacts/ (lihat model_dirs).
+
+Build:  python -m app.services.artifact_store build
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.course_catalog import CourseCatalog
+
+FORMAT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+PICKLE_DIR = os.path.join(BASE_DIR, "model_artifacts")
+COMPACT_DIR = os.getenv("COMPACT_ARTIFACTS_DIR", os.path.join(PICKLE_DIR, "compact"))
+PICKLE_FILES = ("courses_df.pkl", "tfidf_vectorizer.pkl", "tfidf_matrix.pkl")
+DATASET_NAME = "smart_course_dataset.csv"
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(BASE_DIR, "cache"))
+# Output rebuild katalog saat runtime (file git di PICKLE_DIR tidak pernah ditimpa)
+CATALOG_DIR = os.getenv("CATALOG_REBUILD_DIR", os.path.join(CACHE_DIR, "catalog"))
+BASE_NAME = "base.json"
+# "full" = cek SHA-256 semua file, "size" = cek ukuran file saja (lebih cepat untuk katalog besar)
+VERIFY_MODE = os.getenv("ARTIFACT_VERIFY", "full")
+
+# Parameter TfidfVectorizer yang disimpan di manifest (harus bisa di-JSON-kan)
+VECTORIZER_PARAMS = [
+    "analyzer", "binary", "decode_error", "encoding", "input", "lowercase", "max_df",
+    "max_features", "min_df", "ngram_range", "norm", "smooth_idf", "stop_words",
+    "strip_accents", "sublinear_tf", "token_pattern", "use_idf",
+]
+
+
+class ArtifactError(Exception):
+    """Artefak compact tidak ada, versi beda, atau hash tidak cocok."""
+
+
+# ==========================================
+# STRING TABLE (teks di atas array mmap)
+# ==========================================
+
+def _pack_strings(items: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode("utf-8") for s in items]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8) if encoded else np.zeros(0, dtype=np.uint8)
+    return blob, offsets
+
+
+class StringTable:
+    """Sequence string read-only yang di-decode saat diakses dari blob UTF-8 + offsets."""
+    __slots__ = ('blob', 'offsets')
+
+    def __init__(self, blob: np.ndarray, offsets: np.ndarray):
+        self.blob = blob
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return tuple(self[i] for i in range(*idx.indices(len(self))))
+        if idx < 0:
+            idx += len(self)
+        start, end = int(self.offsets[idx]), int(self.offsets[idx + 1])
+        return bytes(self.blob[start:end]).decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.blob.nbytes + self.offsets.nbytes
+
+
+class NestedStringTable:
+    """Daftar bab per course: baris ke-i = strings[ptr[i]:ptr[i+1]]."""
+    __slots__ = ('strings', 'ptr')
+
+    def __init__(self, strings: StringTable, ptr: np.ndarray):
+        self.strings = strings
+        self.ptr = ptr
+
+    def __len__(self):
+        return len(self.ptr) - 1
+
+    def __getitem__(self, idx):
+        if idx < 0:
+            idx += len(self)
+        return self.strings[int(self.ptr[idx]):int(self.ptr[idx + 1])]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nbytes(self) -> int:
+        return self.strings.nbytes + self.ptr.nbytes
+
+
+# ==========================================
+# BUILD
+# ==========================================
+
+def _sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def source_hashes(src_dir: str = PICKLE_DIR) -> Optional[Dict[str, str]]:
+    """SHA-256 file .pkl sumber. None jika salah satu tidak ada (deploy hanya membawa artefak compact)."""
+    paths = {name: os.path.join(src_dir, name) for name in PICKLE_FILES}
+    if not all(os.path.exists(path) for path in paths.values()):
+        return None
+    return {name: _sha256(path) for name, path in paths.items()}
+
+
+def stale_reason(manifest: dict, src_dir: str = PICKLE_DIR) -> Optional[str]:
+    """Alasan artefak compact tidak lagi sesuai dengan file .pkl sumber (None = masih sesuai)."""
+    current = source_hashes(src_dir)
+    if current is None:
+        return None
+    recorded = manifest.get("sources")
+    if recorded is None:
+        return "manifest tidak mencatat hash pickle sumber"
+    changed = [name for name in PICKLE_FILES if recorded.get(name) != current[name]]
+    return f"pickle sumber berubah: {', '.join(changed)}" if changed else None
+
+
+def base_hashes(src_dir: str = PICKLE_DIR) -> dict:
+    """Hash dataset CSV + pickle git yang menjadi dasar katalog hasil rebuild."""
+    dataset = os.path.join(src_dir, DATASET_NAME)
+    return {"dataset": _sha256(dataset) if os.path.exists(dataset) else None, "pickles": source_hashes(src_dir)}
+
+
+def rebuilt_catalog_status(catalog_dir: str = CATALOG_DIR) -> Optional[str]:
+    """
+    "current" = katalog hasil rebuild ada & dibangun dari dataset git saat ini,
+    "stale" = ada tapi dataset / pickle git sudah berubah (misal setelah deploy), None = tidak ada.
+    """
+    path = os.path.join(catalog_dir, BASE_NAME)
+    if source_hashes(catalog_dir) is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return "stale"
+    return "current" if recorded == base_hashes() else "stale"
+
+
+def model_dirs() -> Tuple[str, str, str]:
+    """(folder pickle, folder compact, asal) yang dipakai loader: hasil rebuild jika masih sesuai, selain itu git."""
+    status = rebuilt_catalog_status()
+    if status == "current":
+        return CATALOG_DIR, os.path.join(CATALOG_DIR, "compact"), "rebuild"
+    if status == "stale":
+        print(f"⚠️ Katalog hasil rebuild di {CATALOG_DIR} dibuat dari dataset git lama, dipakai model_artifacts/.")
+    return PICKLE_DIR, COMPACT_DIR, "git"
+
+
+def _vectorizer_params(vectorizer) -> dict:
+    params = vectorizer.get_params()
+    for name in ("tokenizer", "preprocessor"):
+        if params.get(name) is not None:
+            raise ArtifactError(f"Vectorizer memakai {name} custom, tidak bisa disimpan ke format compact.")
+    out = {}
+    for name in VECTORIZER_PARAMS:
+        value = params.get(name)
+        if isinstance(value, tuple):
+            value = list(value)
+        out[name] = value
+    out["dtype"] = np.dtype(params.get("dtype", np.float64)).name
+    return out
+
+
+def build_artifacts(catalog: CourseCatalog, vectorizer, matrix, out_dir: str = COMPACT_DIR,
+                    sources: Optional[Dict[str, str]] = None) -> dict:
+    """
+    Tulis katalog + vectorizer + matrix ke out_dir dalam format compact. Return manifest.
+    sources = hash file .pkl asal (lihat source_hashes), dipakai loader untuk mendeteksi artefak basi.
+    """
+    matrix = matrix.tocsr()
+    matrix.sort_indices()
+    terms = vectorizer.get_feature_names_out()
+    if len(terms) != matrix.shape[1]:
+        raise ArtifactError(f"Vocab ({len(terms)}) tidak sejajar dengan kolom matrix ({matrix.shape[1]}).")
+    if len(catalog) != matrix.shape[0]:
+        raise ArtifactError(f"Katalog ({len(catalog)}) tidak sejajar dengan baris matrix ({matrix.shape[0]}).")
+
+    vocab_blob, vocab_offsets = _pack_strings([str(t) for t in terms])
+    names_blob, names_offsets = _pack_strings(list(catalog.names))
+    all_chapters: List[str] = []
+    chapters_ptr = np.zeros(len(catalog) + 1, dtype=np.int64)
+    for i, chapter_list in enumerate(catalog.chapters):
+        all_chapters.extend(chapter_list)
+        chapters_ptr[i + 1] = len(all_chapters)
+    chapters_blob, chapters_offsets = _pack_strings(all_chapters)
+
+    arrays: Dict[str, np.ndarray] = {
+        "matrix_data": matrix.data,
+        "matrix_indices": matrix.indices,
+        "matrix_indptr": matrix.indptr,
+        "vocab_blob": vocab_blob,
+        "vocab_offsets": vocab_offsets,
+        "idf": np.asarray(vectorizer.idf_),
+        "course_ids": np.asarray(catalog.course_ids, dtype=np.int64),
+        "level_codes": np.asarray(catalog.level_codes, dtype=np.int8),
+        "names_blob": names_blob,
+        "names_offsets": names_offsets,
+        "chapters_blob": chapters_blob,
+        "chapters_offsets": chapters_offsets,
+        "chapters_ptr": chapters_ptr,
+    }
+
+    # Tulis ke folder sementara lalu rename, supaya loader tidak pernah melihat artefak setengah jadi
+    os.makedirs(os.path.dirname(os.path.abspath(out_dir)), exist_ok=True)
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    os.makedirs(tmp_dir, exist_ok=True)
+    files = {}
+    for name, arr in arrays.items():
+        path = os.path.join(tmp_dir, f"{name}.npy")
+        np.save(path, np.ascontiguousarray(arr))
+        files[name] = {
+            "sha256": _sha256(path),
+            "bytes": os.path.getsize(path),
+            "dtype": str(arr.dtype),
+            "shape": list(arr.shape),
+        }
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "n_courses": int(matrix.shape[0]),
+        "n_terms": int(matrix.shape[1]),
+        "vectorizer_params": _vectorizer_params(vectorizer),
+        "files": files,
+        "sources": sources,
+    }
+    manifest["bundle_hash"] = hashlib.sha256(
+        json.dumps({k: v["sha256"] for k, v in sorted(files.items())}).encode("utf-8")
+    ).hexdigest()
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    if os.path.isdir(out_dir):
+        old_dir = f"{out_dir}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        for name in os.listdir(old_dir):
+            os.remove(os.path.join(old_dir, name))
+        os.rmdir(old_dir)
+    else:
+        os.rename(tmp_dir, out_dir)
+    return manifest
+
+
+def build_from_pickles(src_dir: str = PICKLE_DIR, out_dir: str = COMPACT_DIR) -> dict:
+    sources = source_hashes(src_dir)
+    with open(os.path.join(src_dir, 'courses_df.pkl'), 'rb') as f:
+        df = pickle.load(f)
+    with open(os.path.join(src_dir, 'tfidf_vectorizer.pkl'), 'rb') as f:
+        vectorizer = pickle.load(f)
+    with open(os.path.join(src_dir, 'tfidf_matrix.pkl'), 'rb') as f:
+        matrix = pickle.load(f)
+    return build_artifacts(CourseCatalog.from_dataframe(df), vectorizer, matrix, out_dir, sources)
+
+
+# ==========================================
+# LOAD
+# ==========================================
+
+def read_manifest(artifact_dir: str = COMPACT_DIR) -> dict:
+    path = os.path.join(artifact_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        raise ArtifactError(f"Manifest tidak ditemukan: {path}")
+    with open(path) as f:
+        manifest = json.load(f)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ArtifactError(f"Versi format {manifest.get('format_version')} tidak didukung (butuh {FORMAT_VERSION}).")
+    return manifest
+
+
+def _verify(artifact_dir: str, manifest: dict, mode: str):
+    for name, meta in manifest["files"].items():
+        path = os.path.join(artifact_dir, f"{name}.npy")
+        if not os.path.exists(path):
+            raise ArtifactError(f"File artefak hilang: {name}.npy")
+        if os.path.getsize(path) != meta["bytes"]:
+            raise ArtifactError(f"Ukuran {name}.npy tidak cocok dengan manifest.")
+        if mode == "full" and _sha256(path) != meta["sha256"]:
+            raise ArtifactError(f"Hash {name}.npy tidak cocok dengan manifest.")
+
+
+def _rebuild_vectorizer(params: dict, terms: StringTable, idf: np.ndarray):
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    params = dict(params)
+    params["ngram_range"] = tuple(params["ngram_range"])
+    params["dtype"] = np.dtype(params["dtype"]).type
+    vectorizer = TfidfVectorizer(**params)
+    vectorizer.vocabulary_ = {term: i for i, term in enumerate(terms)}
+    vectorizer.idf_ = np.asarray(idf)
+    return vectorizer
+
+
+def load_artifacts(artifact_dir: str = COMPACT_DIR, verify: str = VERIFY_MODE):
+    """
+    Buka artefak compact dengan memory-map.
+    Return (catalog, vectorizer, matrix, manifest). Raise ArtifactError jika tidak valid.
+    """
+    from scipy.sparse import csr_matrix
+
+    manifest = read_manifest(artifact_dir)
+    _verify(artifact_dir, manifest, verify)
+
+    def arr(name):
+        # np.asarray: view ndarray biasa di atas mmap (tanpa overhead subclass np.memmap)
+        return np.asarray(np.load(os.path.join(artifact_dir, f"{name}.npy"), mmap_mode='r'))
+
+    matrix = csr_matrix(
+        (arr("matrix_data"), arr("matrix_indices"), arr("matrix_indptr")),
+        shape=(manifest["n_courses"], manifest["n_terms"]),
+        copy=False,
+    )
+    catalog = CourseCatalog(
+        course_ids=arr("course_ids"),
+        level_codes=arr("level_codes"),
+        names=StringTable(arr("names_blob"), arr("names_offsets")),
+        chapters=NestedStringTable(
+            StringTable(arr("chapters_blob"), arr("chapters_offsets")), arr("chapters_ptr")
+        ),
+    )
+    vectorizer = _rebuild_vectorizer(
+        manifest["vectorizer_params"], StringTable(arr("vocab_blob"), arr("vocab_offsets")), arr("idf")
+    )
+    return catalog, vectorizer, matrix, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build / cek artefak model format compact.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Konversi file .pkl ke format compact")
+    build.add_argument("--src", default=PICKLE_DIR)
+    build.add_argument("--out", default=COMPACT_DIR)
+    check = sub.add_parser("verify", help="Cek hash artefak compact & kesesuaian dengan pickle sumber")
+    check.add_argument("--dir", default=COMPACT_DIR)
+    check.add_argument("--src", default=PICKLE_DIR)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        manifest = build_from_pickles(args.src, args.out)
+        total = sum(meta["bytes"] for meta in manifest["files"].values())
+        print(f"✅ Artefak compact v{FORMAT_VERSION} ditulis ke {args.out} "
+              f"({manifest['n_courses']} course, {manifest['n_terms']} term, {total / 1024:.1f} KB, "
+              f"hash {manifest['bundle_hash'][:12]})")
+    else:
+        manifest = read_manifest(args.dir)
+        _verify(args.dir, manifest, "full")
+        stale = stale_reason(manifest, args.src)
+        if stale:
+            raise SystemExit(f"❌ Artefak basi ({stale}). Jalankan: python -m app.services.artifact_store build")
+        print(f"✅ Artefak valid (hash {manifest['bundle_hash'][:12]})")
+
+
+if __name__ == "__main__":
+    main()
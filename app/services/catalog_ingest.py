@@ -0,0 +1,567 @@
+# app/services/catalog_ingest.py
+"""
+Ingest katalog course secara incremental, tanpa fit ulang TF-IDF di setiap perubahan.
+
+- upsert / delete course langsung dipakai endpoint rekomendasi (milidetik):
+  hanya baris yang berubah yang di-vectorize (vectorizer & IDF bundle aktif), disimpan
+  sebagai segmen delta; baris basis yang dihapus / diganti diberi tombstone
+  (lihat SegmentedIndex di retrieval_index).
+- Setiap operasi ditulis ke journal (JSONL) sebelum dipakai. Saat startup / reload model,
+  journal diputar ulang di atas artefak dari disk (overlay model_registry).
+- Drift dipantau: selisih IDF "hidup" (dari document frequency katalog saat ini) vs IDF
+  vectorizer, rasio token di luar vocab, dan jumlah baris delta + tombstone. Jika melewati
+  ambang, rebuild penuh dijalankan di background: dataset CSV git + semua operasi ->
+  fit ulang vectorizer -> tulis pickle & artefak compact ke CATALOG_DIR (cache/catalog/,
+  file git di model_artifacts/ tidak pernah ditimpa) -> journal dipotong -> hot reload.
+  Operasi yang sudah masuk rebuild diarsipkan di CATALOG_DIR/applied_ops.jsonl; jika dataset
+  git berubah (deploy), loader kembali ke model_artifacts/ dan arsip + journal diputar ulang.
+- INGEST_VECTORIZER=hashing: rebuild memakai HashingVectorizer + TfidfTransformer
+  (tidak ada kata di luar vocab; artefak hanya pickle, format compact butuh vocab).
+
+Rebuild manual (tanpa server):  python -m app.services.catalog_ingest rebuild
+"""
+import argparse
+import ast
+import csv
+import json
+import os
+import pickle
+import shutil
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.services.artifact_store import (
+    BASE_NAME, CATALOG_DIR, DATASET_NAME, PICKLE_DIR, base_hashes, build_artifacts, source_hashes,
+)
+from app.services.course_catalog import CourseCatalog, level_code
+from app.services.model_registry import ModelBundle, ModelReloadError, model_registry
+from app.services.retrieval_index import SegmentedIndex
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Vectorizer untuk rebuild penuh: "vocab" (TfidfVectorizer, seperti model awal) atau "hashing"
+INGEST_VECTORIZER = os.getenv("INGEST_VECTORIZER", "vocab")
+INGEST_HASH_FEATURES = int(os.getenv("INGEST_HASH_FEATURES", str(2 ** 18)))
+# Ambang rebuild otomatis: selisih relatif IDF, rasio token di luar vocab, baris delta + tombstone
+INGEST_IDF_DRIFT = float(os.getenv("INGEST_IDF_DRIFT", "0.05"))
+INGEST_OOV_RATE = float(os.getenv("INGEST_OOV_RATE", "0.15"))
+INGEST_MAX_PENDING = int(os.getenv("INGEST_MAX_PENDING", "2000"))
+INGEST_AUTO_REBUILD = os.getenv("INGEST_AUTO_REBUILD", "1") == "1"
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+JOURNAL_PATH = os.getenv("CATALOG_JOURNAL_PATH", os.path.join(CACHE_DIR, "catalog_journal.jsonl"))
+# Dataset git (hanya dibaca) & arsip operasi yang sudah masuk katalog hasil rebuild
+DATASET_PATH = os.path.join(PICKLE_DIR, DATASET_NAME)
+ARCHIVE_NAME = "applied_ops.jsonl"
+
+COLUMNS = ["course_name", "course_id", "learning_path_name", "level_name", "tutorial_list",
+           "hours_to_study", "combined_text_for_model"]
+# Parameter tokenisasi & pembobotan yang diwarisi vectorizer hasil rebuild
+ANALYSIS_PARAMS = ("input", "encoding", "decode_error", "strip_accents", "lowercase",
+                   "stop_words", "token_pattern", "ngram_range", "analyzer")
+WEIGHT_PARAMS = ("norm", "use_idf", "smooth_idf", "sublinear_tf")
+# Percobaan hot reload setelah rebuild (reload lain / ingest bisa sedang memegang lock)
+RELOAD_ATTEMPTS = 20
+
+
+class IngestError(Exception):
+    """Ingest tidak bisa dijalankan (model belum siap, data course tidak valid)."""
+
+
+class DeltaRow(NamedTuple):
+    course: dict
+    vector: object        # CSR 1 x n_term
+    oov_tokens: int
+    tokens: int
+
+
+# ==========================================
+# RECORD COURSE
+# ==========================================
+
+def combined_text(course: dict) -> str:
+    """Sama dengan kolom combined_text_for_model di dataset: nama + learning path + level + bab, lowercase."""
+    parts = [course["course_name"], *course["learning_path_name"], course["level_name"], *course["tutorial_list"]]
+    return " ".join(parts).lower()
+
+
+def _as_list(value) -> List[str]:
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            value = [value] if value else []
+    if not isinstance(value, (list, tuple)):
+        return []
+    return [str(v) for v in value]
+
+
+def normalize_course(data: dict) -> dict:
+    """Rapikan satu course (dari API, journal atau CSV). Raise IngestError jika tidak valid."""
+    try:
+        course = {
+            "course_name": str(data["course_name"]).strip(),
+            "course_id": int(data["course_id"]),
+            "learning_path_name": _as_list(data.get("learning_path_name", [])),
+            "level_name": str(data["level_name"]).strip(),
+            "tutorial_list": _as_list(data.get("tutorial_list", [])),
+            "hours_to_study": int(data.get("hours_to_study") or 0),
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise IngestError(f"Data course tidak valid: {e}") from e
+    if not course["course_name"]:
+        raise IngestError(f"Course {course['course_id']} tanpa nama.")
+    course["combined_text_for_model"] = data.get("combined_text_for_model") or combined_text(course)
+    return course
+
+
+def read_dataset(path: str = DATASET_PATH) -> Dict[int, dict]:
+    """Dataset CSV -> {course_id: course} (urutan baris dipertahankan)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        return {course["course_id"]: course for course in map(normalize_course, csv.DictReader(f))}
+
+
+def apply_ops(courses: Dict[int, dict], ops: List[dict]) -> Dict[int, dict]:
+    """Putar operasi journal di atas dataset. Upsert course lama tetap di posisi barisnya."""
+    for op in ops:
+        if op["op"] == "upsert":
+            course = normalize_course(op["course"])
+            courses[course["course_id"]] = course
+        elif op["op"] == "delete":
+            courses.pop(int(op["course_id"]), None)
+    return courses
+
+
+# ==========================================
+# VECTORIZER
+# ==========================================
+
+def _steps(vectorizer) -> list:
+    """TfidfVectorizer -> [vectorizer]; Pipeline hashing -> [HashingVectorizer, TfidfTransformer]."""
+    return [step for _, step in vectorizer.steps] if hasattr(vectorizer, "steps") else [vectorizer]
+
+
+def fitted_idf(vectorizer) -> Optional[np.ndarray]:
+    idf = getattr(_steps(vectorizer)[-1], "idf_", None)
+    return None if idf is None else np.asarray(idf)
+
+
+def make_vectorizer(template, mode: str = INGEST_VECTORIZER):
+    """Vectorizer baru (belum di-fit) dengan tokenisasi & pembobotan yang sama dengan template."""
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer, TfidfVectorizer
+    from sklearn.pipeline import make_pipeline
+
+    steps = _steps(template)
+    analysis = {k: v for k, v in steps[0].get_params().items() if k in ANALYSIS_PARAMS}
+    weighting = {k: v for k, v in steps[-1].get_params().items() if k in WEIGHT_PARAMS}
+    if mode == "hashing":
+        return make_pipeline(
+            HashingVectorizer(n_features=INGEST_HASH_FEATURES, alternate_sign=False, norm=None, **analysis),
+            TfidfTransformer(**weighting),
+        )
+    if isinstance(template, TfidfVectorizer):
+        from sklearn.base import clone
+        return clone(template)
+    return TfidfVectorizer(**analysis, **weighting)
+
+
+def _write_atomic(path: str, write):
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def read_ops(path: str) -> List[dict]:
+    """File JSONL operasi (journal / arsip) -> list operasi. Baris rusak dilewati."""
+    if not os.path.exists(path):
+        return []
+    ops = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                ops.append(json.loads(line))
+            except ValueError:
+                print(f"⚠️ Baris journal katalog rusak dilewati: {line[:80]}")
+    return ops
+
+
+def _write_ops(path: str, ops: List[dict]):
+    with open(path, "w", encoding="utf-8") as f:
+        for op in ops:
+            f.write(json.dumps(op, ensure_ascii=False) + "\n")
+
+
+def write_model_files(courses: List[dict], vectorizer, matrix, applied_ops: List[dict],
+                      mode: str = INGEST_VECTORIZER, out_dir: str = CATALOG_DIR):
+    """
+    Tulis dataset CSV, 3 file pickle, artefak compact (mode vocab), arsip operasi, dan base.json
+    (hash dataset git asal) ke out_dir. Folder dibangun di samping lalu ditukar utuh, supaya
+    loader tidak pernah melihat campuran file lama & baru.
+    """
+    import pandas as pd
+
+    def write_csv(path):
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=COLUMNS)
+            writer.writeheader()
+            for course in courses:
+                writer.writerow({**course, "learning_path_name": str(course["learning_path_name"]),
+                                 "tutorial_list": str(course["tutorial_list"])})
+
+    def write_pickle(obj):
+        def write(path):
+            with open(path, "wb") as f:
+                pickle.dump(obj, f)
+        return write
+
+    df = pd.DataFrame(courses, columns=COLUMNS).astype({"course_id": "int64", "hours_to_study": "int64"})
+    tmp_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    write_csv(os.path.join(tmp_dir, DATASET_NAME))
+    write_pickle(df)(os.path.join(tmp_dir, "courses_df.pkl"))
+    write_pickle(vectorizer)(os.path.join(tmp_dir, "tfidf_vectorizer.pkl"))
+    write_pickle(matrix)(os.path.join(tmp_dir, "tfidf_matrix.pkl"))
+    # Mode hashing tanpa compact: format compact menyimpan vocab, loader membaca pickle
+    if mode != "hashing":
+        build_artifacts(CourseCatalog.from_dataframe(df), vectorizer, matrix,
+                        os.path.join(tmp_dir, "compact"), sources=source_hashes(tmp_dir))
+    _write_ops(os.path.join(tmp_dir, ARCHIVE_NAME), applied_ops)
+    with open(os.path.join(tmp_dir, BASE_NAME), "w") as f:
+        json.dump(base_hashes(), f, indent=2)
+
+    if os.path.isdir(out_dir):
+        old_dir = f"{out_dir}.old-{os.getpid()}"
+        os.rename(out_dir, old_dir)
+        os.rename(tmp_dir, out_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(out_dir)), exist_ok=True)
+        os.rename(tmp_dir, out_dir)
+
+
+# ==========================================
+# INGESTOR
+# ==========================================
+
+class CatalogIngestor:
+    def __init__(self, journal_path: str = JOURNAL_PATH, catalog_dir: str = CATALOG_DIR):
+        self.journal_path = journal_path
+        self.catalog_dir = catalog_dir
+        self.base: Optional[ModelBundle] = None
+        self.delta: Dict[int, DeltaRow] = {}
+        self.base_rows: Dict[int, int] = {}
+        self.tombstones = np.zeros(0, dtype=bool)
+        self.df = np.zeros(0, dtype=np.int64)
+        self.n_live = 0
+        self.seq = 0
+        self._vocabulary = None
+        self._analyzer = None
+        # Melindungi state & file journal. Urutan lock: build lock registry -> lock ini
+        self._lock = threading.Lock()
+        self._rebuild_thread: Optional[threading.Thread] = None
+        # Satu rebuild dalam satu waktu (thread otomatis vs /admin/catalog/rebuild menulis folder yang sama)
+        self._rebuild_lock = threading.Lock()
+        self.stats = {"upserts": 0, "deletes": 0, "rebuilds": 0, "rebuild_failures": 0,
+                      "last_update_ms": None, "last_rebuild": None, "last_error": None}
+
+    # --- STATE ---
+    def _rebase(self, bundle: ModelBundle):
+        """Bundle baru dari disk: delta dikosongkan, document frequency dihitung dari matrix-nya."""
+        self.base = bundle if bundle.catalog is not None else None
+        self.delta = {}
+        if self.base is None:
+            return
+        n_base, n_terms = bundle.matrix.shape
+        self.base_rows = {}
+        for row, course_id in enumerate(bundle.catalog.course_ids.tolist()):
+            self.base_rows.setdefault(course_id, row)
+        self.tombstones = np.zeros(n_base, dtype=bool)
+        self.df = np.bincount(bundle.matrix.indices, minlength=n_terms).astype(np.int64)
+        self.n_live = n_base
+        steps = _steps(bundle.tfidf)
+        self._vocabulary = getattr(steps[0], "vocabulary_", None)
+        self._analyzer = steps[0].build_analyzer() if self._vocabulary is not None else None
+
+    def _tombstone(self, row: int):
+        self.tombstones[row] = True
+        start, end = self.base.matrix.indptr[row], self.base.matrix.indptr[row + 1]
+        self.df[self.base.matrix.indices[start:end]] -= 1
+        self.n_live -= 1
+
+    def _drop_delta(self, course_id: int) -> bool:
+        old = self.delta.pop(course_id, None)
+        if old is None:
+            return False
+        self.df[old.vector.indices] -= 1
+        self.n_live -= 1
+        return True
+
+    def _live_base_row(self, course_id: int) -> Optional[int]:
+        row = self.base_rows.get(course_id)
+        return None if row is None or self.tombstones[row] else row
+
+    def _apply(self, op: dict) -> bool:
+        """Terapkan satu operasi ke state (tanpa publish). Return False jika tidak ada yang berubah."""
+        if op["op"] == "delete":
+            course_id = int(op["course_id"])
+            row = self._live_base_row(course_id)
+            if row is not None:
+                self._tombstone(row)
+                return True
+            return self._drop_delta(course_id)
+
+        course = normalize_course(op["course"])
+        course_id = course["course_id"]
+        text = course["combined_text_for_model"]
+        vector = self.base.tfidf.transform([text]).tocsr()
+        oov_tokens = tokens = 0
+        if self._analyzer is not None:
+            words = self._analyzer(text)
+            tokens = len(words)
+            oov_tokens = sum(1 for w in words if w not in self._vocabulary)
+        row = self._live_base_row(course_id)
+        if row is not None:
+            self._tombstone(row)
+        # Versi lama di delta diganti (posisi di delta tetap)
+        self._drop_delta(course_id)
+        self.delta[course_id] = DeltaRow(course, vector, oov_tokens, tokens)
+        self.df[vector.indices] += 1
+        self.n_live += 1
+        return True
+
+    def _derive(self, version: int) -> ModelBundle:
+        """Bundle basis + delta + tombstone sebagai bundle baru (catalog & index tersegmentasi)."""
+        from scipy.sparse import csr_matrix, vstack
+
+        base = self.base
+        if not self.delta and not self.tombstones.any():
+            return base._replace(version=version)
+        rows = list(self.delta.values())
+        courses = [r.course for r in rows]
+        catalog = base.catalog.with_rows(
+            course_ids=[c["course_id"] for c in courses],
+            level_codes=[level_code(c["level_name"]) for c in courses],
+            names=[c["course_name"] for c in courses],
+            chapters=[c["tutorial_list"] for c in courses],
+        )
+        delta_matrix = vstack([r.vector for r in rows]).tocsr() if rows else \
+            csr_matrix((0, base.matrix.shape[1]), dtype=base.matrix.dtype)
+        index = SegmentedIndex(base.index, base.matrix, self.tombstones.copy(), delta_matrix)
+        return base._replace(version=version, catalog=catalog, index=index)
+
+    # --- JOURNAL ---
+    def _read_journal(self) -> List[dict]:
+        return read_ops(self.journal_path)
+
+    def _read_archive(self) -> List[dict]:
+        """Operasi yang sudah masuk katalog hasil rebuild terakhir."""
+        return read_ops(os.path.join(self.catalog_dir, ARCHIVE_NAME))
+
+    def _append_journal(self, ops: List[dict]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.journal_path)), exist_ok=True)
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            for op in ops:
+                f.write(json.dumps(op, ensure_ascii=False) + "\n")
+
+    def _truncate_journal(self, upto_seq: int):
+        """Buang operasi yang sudah masuk artefak hasil rebuild (seq <= upto_seq)."""
+        remaining = [op for op in self._read_journal() if op.get("seq", 0) > upto_seq]
+        if os.path.exists(self.journal_path):
+            _write_atomic(self.journal_path, lambda path: _write_ops(path, remaining))
+
+    # --- OVERLAY (dipanggil model_registry di setiap build) ---
+    def overlay(self, bundle: ModelBundle) -> ModelBundle:
+        with self._lock:
+            self._rebase(bundle)
+            ops = self._read_journal()
+            archived = self._read_archive()
+            if (bundle.artifact or {}).get("source") != "rebuild" and archived:
+                # Katalog hasil rebuild tidak dipakai (dataset git berubah): operasi lama ikut diputar
+                # ulang di atas katalog git supaya course hasil ingest tidak hilang
+                print(f"⚠️ {len(archived)} operasi arsip katalog diputar ulang di atas dataset git baru.")
+                ops = archived + ops
+            self.seq = max([self.seq] + [op.get("seq", 0) for op in archived + ops])
+            if self.base is None or not ops:
+                return bundle
+            for op in ops:
+                try:
+                    self._apply(op)
+                except IngestError as e:
+                    print(f"⚠️ Operasi journal katalog #{op.get('seq')} dilewati: {e}")
+            print(f"🔄 Journal katalog diputar ulang: {len(ops)} operasi "
+                  f"({len(self.delta)} baris delta, {int(self.tombstones.sum())} tombstone).")
+            return self._derive(bundle.version)
+
+    # --- API ---
+    def _ingest(self, ops: List[dict]) -> dict:
+        started = time.perf_counter()
+        applied = []
+
+        def derive(current: ModelBundle) -> Optional[ModelBundle]:
+            with self._lock:
+                if self.base is None:
+                    raise IngestError("Model rekomendasi belum siap.")
+                for op in ops:
+                    self.seq += 1
+                    op["seq"] = self.seq
+                # Journal dulu: jika proses mati setelah ini, operasi tetap diputar ulang saat startup
+                self._append_journal(ops)
+                applied.extend(self._apply(op) for op in ops)
+                return self._derive(current.version + 1) if any(applied) else None
+
+        bundle = model_registry.publish(derive)
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+        self.stats["last_update_ms"] = elapsed_ms
+        drift = self.drift()
+        reason = self.rebuild_reason(drift)
+        scheduled = bool(reason) and INGEST_AUTO_REBUILD and self.schedule_rebuild(reason)
+        return {"applied": sum(applied), "ignored": len(applied) - sum(applied), "version": bundle.version,
+                "elapsed_ms": elapsed_ms, "drift": drift, "rebuild_scheduled": scheduled, "rebuild_reason": reason}
+
+    def upsert(self, courses: List[dict]) -> dict:
+        """Tambah course baru / ganti versi course lama (berdasarkan course_id)."""
+        ops = [{"op": "upsert", "course": normalize_course(c)} for c in courses]
+        result = self._ingest(ops)
+        self.stats["upserts"] += len(ops)
+        return result
+
+    def delete(self, course_ids: List[int]) -> dict:
+        """Tombstone course (tidak lagi direkomendasikan). Course yang tidak ada diabaikan."""
+        result = self._ingest([{"op": "delete", "course_id": int(c)} for c in course_ids])
+        self.stats["deletes"] += len(course_ids)
+        return result
+
+    # --- DRIFT & REBUILD ---
+    def drift(self) -> dict:
+        with self._lock:
+            if self.base is None:
+                return {}
+            pending = len(self.delta) + int(self.tombstones.sum())
+            tokens = sum(r.tokens for r in self.delta.values())
+            oov = sum(r.oov_tokens for r in self.delta.values())
+            idf = fitted_idf(self.base.tfidf)
+            idf_drift = 0.0
+            if idf is not None and len(idf) == len(self.df) and self.n_live > 0:
+                df = np.maximum(self.df, 0)
+                if getattr(_steps(self.base.tfidf)[-1], "smooth_idf", True):
+                    live_idf = np.log((1 + self.n_live) / (1 + df)) + 1
+                else:
+                    live_idf = np.log(self.n_live / np.maximum(df, 1)) + 1
+                idf_drift = float(np.abs(live_idf - idf).sum() / idf.sum())
+        return {"idf_drift": round(idf_drift, 5), "oov_rate": round(oov / tokens, 4) if tokens else 0.0,
+                "pending_rows": pending, "live_courses": self.n_live}
+
+    @staticmethod
+    def rebuild_reason(drift: dict) -> Optional[str]:
+        if not drift:
+            return None
+        if drift["idf_drift"] > INGEST_IDF_DRIFT:
+            return f"idf_drift {drift['idf_drift']:.3f} > {INGEST_IDF_DRIFT}"
+        if drift["oov_rate"] > INGEST_OOV_RATE:
+            return f"oov_rate {drift['oov_rate']:.3f} > {INGEST_OOV_RATE}"
+        if drift["pending_rows"] > INGEST_MAX_PENDING:
+            return f"pending_rows {drift['pending_rows']} > {INGEST_MAX_PENDING}"
+        return None
+
+    @property
+    def rebuilding(self) -> bool:
+        return self._rebuild_thread is not None and self._rebuild_thread.is_alive()
+
+    def schedule_rebuild(self, reason: str = "manual") -> bool:
+        """Jalankan rebuild penuh di thread background. False jika rebuild lain masih berjalan."""
+        with self._lock:
+            if self.rebuilding:
+                return False
+            self._rebuild_thread = threading.Thread(target=self.rebuild, args=(reason,),
+                                                    name="catalog-rebuild", daemon=True)
+            self._rebuild_thread.start()
+        print(f"🔄 Rebuild katalog dijadwalkan ({reason}).")
+        return True
+
+    def rebuild(self, reason: str = "manual") -> Optional[dict]:
+        """
+        Dataset git + arsip + journal -> fit ulang vectorizer -> tulis artefak ke CATALOG_DIR ->
+        potong journal -> hot reload.
+        """
+        with self._rebuild_lock:
+            return self._rebuild(reason)
+
+    def _rebuild(self, reason: str) -> Optional[dict]:
+        started = time.perf_counter()
+        try:
+            with self._lock:
+                journal = self._read_journal()
+                upto_seq = max([0] + [op.get("seq", 0) for op in journal])
+                ops = self._read_archive() + journal
+                template = self.base.tfidf if self.base is not None else None
+            if template is None:
+                raise IngestError("Model rekomendasi belum siap.")
+            courses = list(apply_ops(read_dataset(), ops).values())
+            vectorizer = make_vectorizer(template)
+            matrix = vectorizer.fit_transform([c["combined_text_for_model"] for c in courses]).tocsr()
+            write_model_files(courses, vectorizer, matrix, ops, out_dir=self.catalog_dir)
+            with self._lock:
+                self._truncate_journal(upto_seq)
+            self._reload()
+        except Exception as e:
+            self.stats["rebuild_failures"] += 1
+            self.stats["last_error"] = str(e)
+            print(f"❌ Rebuild katalog gagal ({reason}): {e}")
+            return None
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        self.stats["rebuilds"] += 1
+        self.stats["last_error"] = None
+        self.stats["last_rebuild"] = {"reason": reason, "courses": len(courses), "terms": int(matrix.shape[1]),
+                                      "elapsed_ms": elapsed_ms, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        print(f"✅ Rebuild katalog selesai: {len(courses)} course, {matrix.shape[1]} term, {elapsed_ms} ms ({reason}).")
+        return self.stats["last_rebuild"]
+
+    def _reload(self):
+        for attempt in range(RELOAD_ATTEMPTS):
+            try:
+                model_registry.reload_sync(force=True)
+                return
+            except ModelReloadError as e:
+                # Lock sedang dipegang reload / ingest lain: coba lagi sebentar lagi
+                if "sedang berjalan" not in str(e) or attempt == RELOAD_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.25)
+
+    def snapshot(self) -> dict:
+        return {
+            "vectorizer_mode": INGEST_VECTORIZER,
+            "delta_rows": len(self.delta),
+            "tombstones": int(self.tombstones.sum()),
+            "journal_seq": self.seq,
+            "rebuilding": self.rebuilding,
+            "drift": self.drift(),
+            **self.stats,
+        }
+
+
+# Instance global
+catalog_ingestor = CatalogIngestor()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest katalog course (rebuild penuh dari dataset + journal).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Fit ulang vectorizer & tulis artefak dari dataset + journal")
+    sub.add_parser("status", help="Tampilkan delta, tombstone & drift")
+    args = parser.parse_args()
+
+    model_registry.add_overlay(catalog_ingestor.overlay)
+    model_registry.load()
+    if args.command == "rebuild":
+        if catalog_ingestor.rebuild("manual") is None:
+            raise SystemExit(1)
+    print(json.dumps(catalog_ingestor.snapshot(), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+# app/services/course_catalog.py
+import ast
+import sys
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+# Mapping Level agar komputer mengerti urutan
+LEVEL_MAP = {
+    'beginner': 1, 'dasar': 1, 'pemula': 1,
+    'intermediate': 2, 'menengah': 2,
+    'advanced': 3, 'mahir': 3, 'expert': 3, 'profesional': 3
+}
+
+
+def level_code(level_name) -> int:
+    """Mengubah nama level ("Pemula", "Mahir", ...) jadi angka 1-3. Default 1 (Pemula)."""
+    return LEVEL_MAP.get(str(level_name).lower(), 1)
+
+
+def parse_chapters(tuts) -> Tuple[str, ...]:
+    """Parse Tutorial List (di CSV formatnya string, di pickle sudah berupa list)."""
+    if isinstance(tuts, str):
+        try: tuts = ast.literal_eval(tuts)
+        except: tuts = []
+    if not isinstance(tuts, (list, tuple)):
+        return ()
+    return tuple(str(t) for t in tuts)
+
+
+class ConcatSequence:
+    """Sequence read-only gabungan dua sequence (basis + delta) tanpa menyalin basis."""
+    __slots__ = ('head', 'tail')
+
+    def __init__(self, head: Sequence, tail: Sequence):
+        self.head = head
+        self.tail = tail
+
+    def __len__(self):
+        return len(self.head) + len(self.tail)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return tuple(self[i] for i in range(*idx.indices(len(self))))
+        idx = int(idx)
+        if idx < 0:
+            idx += len(self)
+        if idx < len(self.head):
+            return self.head[idx]
+        return self.tail[idx - len(self.head)]
+
+    def __iter__(self):
+        yield from self.head
+        yield from self.tail
+
+
+class CourseCatalog:
+    """
+    Katalog course yang sudah di-parse sekali saat load.
+    Baris ke-i sejajar dengan baris ke-i di TF-IDF matrix, jadi request path
+    cukup pakai index integer tanpa parsing string maupun akses pandas.
+    """
+    __slots__ = ('course_ids', 'level_codes', 'names', 'chapters')
+
+    def __init__(self, course_ids: np.ndarray, level_codes: np.ndarray,
+                 names: Sequence[str], chapters: Sequence[Sequence[str]]):
+        self.course_ids = course_ids      # int64[n]
+        self.level_codes = level_codes    # int8[n], 1=Pemula, 2=Menengah, 3=Mahir
+        self.names = names                # nama course per baris
+        self.chapters = chapters          # daftar bab (sudah di-parse) per baris
+
+    @classmethod
+    def from_dataframe(cls, df) -> "CourseCatalog":
+        return cls(
+            course_ids=df['course_id'].to_numpy(dtype=np.int64),
+            level_codes=np.array([level_code(lvl) for lvl in df['level_name']], dtype=np.int8),
+            names=tuple(str(name) for name in df['course_name']),
+            chapters=tuple(parse_chapters(tuts) for tuts in df['tutorial_list']),
+        )
+
+    def __len__(self):
+        return len(self.course_ids)
+
+    def with_rows(self, course_ids: Sequence[int], level_codes: Sequence[int],
+                  names: Sequence[str], chapters: Sequence[Sequence[str]]) -> "CourseCatalog":
+        """
+        Katalog baru = katalog ini + baris tambahan di belakang (delta hasil ingest).
+        Kolom array disalin (murah), teks basis tidak disalin (ConcatSequence).
+        """
+        return CourseCatalog(
+            course_ids=np.concatenate([self.course_ids, np.asarray(course_ids, dtype=np.int64)]),
+            level_codes=np.concatenate([self.level_codes, np.asarray(level_codes, dtype=np.int8)]),
+            names=ConcatSequence(self.names, tuple(names)),
+            chapters=ConcatSequence(self.chapters, tuple(tuple(c) for c in chapters)),
+        )
+
+    def memory_bytes(self) -> int:
+        """Perkiraan memori katalog (array + string + tuple), dalam byte."""
+        total = self.course_ids.nbytes + self.level_codes.nbytes
+        # Versi memory-map (artifact_store) menyimpan teks di array, cukup hitung ukuran array-nya
+        if hasattr(self.names, 'nbytes'):
+            total += self.names.nbytes
+        else:
+            total += sys.getsizeof(self.names) + sum(sys.getsizeof(n) for n in self.names)
+        if hasattr(self.chapters, 'nbytes'):
+            total += self.chapters.nbytes
+        else:
+            total += sys.getsizeof(self.chapters)
+            for chapter_list in self.chapters:
+                total += sys.getsizeof(chapter_list) + sum(sys.getsizeof(c) for c in chapter_list)
+        return total
+
+
+def memory_report(catalog: CourseCatalog, df=None) -> dict:
+    """Membandingkan memori katalog dengan DataFrame asli (jika masih ada)."""
+    report = {"catalog_bytes": catalog.memory_bytes(), "courses": len(catalog)}
+    if df is not None:
+        df_bytes = int(df.memory_usage(deep=True).sum())
+        # Isi kolom list (tutorial_list, learning_path_name) tidak ikut dihitung oleh pandas
+        for col in df.columns:
+            if df[col].dtype == object:
+                df_bytes += sum(_items_sizeof(v) for v in df[col] if isinstance(v, (list, tuple)))
+        report["dataframe_bytes"] = df_bytes
+        report["saved_bytes"] = df_bytes - report["catalog_bytes"]
+    return report
+
+
+def _items_sizeof(items: List) -> int:
+    return sum(sys.getsizeof(i) for i in items)
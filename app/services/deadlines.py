@@ -0,0 +1,86 @@
+# app/services/deadlines.py
+import os
+from collections import deque
+from typing import Dict, Optional
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Budget waktu total (detik) per method LLMEngine, termasuk failover ke key lain.
+# Override lewat env, contoh: LLM_TIMEOUT_EVALUATE_ANSWER=15
+DEFAULT_TIMEOUTS = {
+    "process_user_intent": 10,
+    "casual_chat": 20,
+    "generate_question": 25,
+    "evaluate_answer": 20,
+    "evaluate_answer_batch": 30,
+    "analyze_psych_result": 15,
+    "analyze_progress": 25,
+}
+FALLBACK_TIMEOUT = float(os.getenv("LLM_TIMEOUT_DEFAULT", "30"))
+
+# Hedged request: jika call pertama belum selesai setelah latency persentil ke-P method ini,
+# kirim call kedua ke key lain dan pakai jawaban yang selesai duluan.
+# Override lewat env, contoh: LLM_HEDGE_METHODS=evaluate_answer (kosong = mati)
+DEFAULT_HEDGE_METHODS = {"process_user_intent", "casual_chat", "evaluate_answer"}
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "0.9"))
+# Jeda hedge selama sampel latency belum cukup
+HEDGE_DEFAULT_DELAY = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "4"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.5"))
+HEDGE_MIN_SAMPLES = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = 200
+
+
+def method_timeout(method: Optional[str]) -> float:
+    if method:
+        env_value = os.getenv(f"LLM_TIMEOUT_{method.upper()}")
+        if env_value is not None:
+            return float(env_value)
+        if method in DEFAULT_TIMEOUTS:
+            return float(DEFAULT_TIMEOUTS[method])
+    return FALLBACK_TIMEOUT
+
+
+def hedge_methods() -> set:
+    env_value = os.getenv("LLM_HEDGE_METHODS")
+    if env_value is None:
+        return set(DEFAULT_HEDGE_METHODS)
+    return {m.strip() for m in env_value.split(",") if m.strip()}
+
+
+class LLMTimeoutError(Exception):
+    """Budget waktu method habis sebelum ada jawaban dari Groq."""
+
+
+class LatencyTracker:
+    """Latency upstream (detik) yang sukses per method, jendela geser LATENCY_WINDOW sampel."""
+
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self.samples: Dict[str, deque] = {}
+
+    def record(self, method: Optional[str], seconds: float):
+        self.samples.setdefault(method or "unknown", deque(maxlen=self.window)).append(seconds)
+
+    def percentile(self, method: Optional[str], q: float, min_samples: int = 1) -> Optional[float]:
+        samples = self.samples.get(method or "unknown")
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+    def hedge_delay(self, method: Optional[str]) -> float:
+        samples = self.samples.get(method or "unknown")
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(self.percentile(method, HEDGE_PERCENTILE), HEDGE_MIN_DELAY)
+
+    def snapshot(self) -> dict:
+        out = {}
+        for method, samples in self.samples.items():
+            out[method] = {
+                "samples": len(samples),
+                "p50_ms": round(self.percentile(method, 0.5) * 1000, 1),
+                "p90_ms": round(self.percentile(method, 0.9) * 1000, 1),
+                "p99_ms": round(self.percentile(method, 0.99) * 1000, 1),
+                "hedge_after_ms": round(self.hedge_delay(method) * 1000, 1),
+            }
+        return out
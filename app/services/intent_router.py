@@ -0,0 +1,189 @@
+# app/services/intent_router.py
+import csv
+import os
+import re
+import time
+from typing import List, NamedTuple, Optional
+
+from app.services.llm_engine import llm_engine
+from app.services.skill_manager import skill_manager
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+INTENT_LOCAL_ENABLED = os.getenv("INTENT_LOCAL_ENABLED", "1") == "1"
+# Shadow mode: keputusan lokal hanya dicatat & dibandingkan, jawaban tetap dari Router LLM.
+# Default aktif sampai shadow_confident_agreement di /intent/status cukup tinggi untuk dipakai live.
+INTENT_SHADOW_MODE = os.getenv("INTENT_SHADOW_MODE", "1") == "1"
+# Minimal confidence agar keputusan lokal dipakai tanpa memanggil Router LLM
+INTENT_CONFIDENCE_THRESHOLD = float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8"))
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "../data/intent_examples.csv")
+
+ACTIONS = ["START_EXAM", "GET_RECOMMENDATION", "START_PSYCH_TEST", "CASUAL_CHAT"]
+
+EXAM_TRIGGER = re.compile(r"\b(tes|test|ujian|uji|diuji|soal|quiz|kuis|exam|uji kemampuan)\b")
+
+# Trigger dari prompt Router (process_user_intent). Urutan = prioritas:
+# "tes minat" harus jadi START_PSYCH_TEST, bukan START_EXAM.
+TRIGGER_RULES = [
+    ("START_PSYCH_TEST", re.compile(
+        r"\b(karir|karier|career|cocok kerja|kerja apa|tes minat|minat bakat|kepribadian|psikologi|job role)\b")),
+    ("GET_RECOMMENDATION", re.compile(
+        r"\b(saran|sarankan|rekomendasi|rekomendasikan|recommend|belajar apa|bingung mulai|mulai dari mana|harus belajar)\b")),
+    ("START_EXAM", EXAM_TRIGGER),
+    ("CASUAL_CHAT", re.compile(
+        r"^(halo|hai|hi|hello|pagi|selamat (pagi|siang|sore|malam)|terima ?kasih|makasih|thanks)\b")),
+]
+# Kata pengantar permintaan tes yang bukan nama topik. Kata lain yang tersisa setelah
+# sebutan skill dibuang dianggap topik yang belum terpetakan -> serahkan ke Router LLM.
+EXAM_FILLER_WORDS = {
+    "aku", "saya", "gue", "gw", "kami", "mau", "ingin", "pengen", "pingin", "siap", "ikut", "coba",
+    "cek", "tolong", "minta", "kasih", "beri", "berikan", "buat", "buatkan", "bikin", "bikinin",
+    "mengerjakan", "kerjakan", "latihan", "kemampuan", "skill", "skills", "materi", "topik", "tentang",
+    "soal", "lewat", "dan", "serta", "sama", "atau", "sekaligus", "di", "ke", "untuk", "yang", "ya",
+    "dong", "deh", "yuk", "ayo", "nih", "sih", "kak", "sekarang", "dulu", "lagi", "aja", "saja",
+    "please", "pls", "me", "my", "i", "want", "to", "a", "an", "the", "on", "about", "give", "take", "and",
+}
+_WORD_RE = re.compile(r"[a-z0-9+#]+")
+
+class IntentDecision(NamedTuple):
+    action: str
+    detected_skills: List[str]
+    confidence: float
+    source: str          # "rule+model", "model", atau "rule"
+    unmapped: List[str] = []   # kata topik di pesan yang tidak terpetakan ke sub_skill (START_EXAM)
+
+    @property
+    def confident(self) -> bool:
+        if self.confidence < INTENT_CONFIDENCE_THRESHOLD:
+            return False
+        # Tanpa skill yang jelas, biar Router LLM yang memetakan topiknya
+        if self.action == "START_EXAM" and not self.detected_skills:
+            return False
+        # Ada topik yang tidak dikenali ("tes deep learning dan nlp"): jangan tes sebagian saja
+        if self.action == "START_EXAM" and self.unmapped:
+            return False
+        return True
+
+    def as_intent(self) -> dict:
+        return {"action": self.action, "detected_skills": self.detected_skills}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+class IntentRouter:
+    """
+    Router intent lokal (tanpa LLM): trigger-phrase + TF-IDF char n-gram & Logistic Regression
+    yang dilatih dari app/data/intent_examples.csv. Jika tidak yakin, keputusan
+    diserahkan ke Router LLM (llm_engine.process_user_intent).
+    """
+
+    def __init__(self):
+        self.vectorizer = None
+        self.model = None
+        self.stats = {
+            "local": 0, "deferred": 0,
+            "shadow_compared": 0, "shadow_agree": 0, "shadow_confident_agree": 0, "shadow_confident": 0,
+        }
+
+    # --- TRAINING ---
+    def train(self, path: str = EXAMPLES_PATH):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        from sklearn.linear_model import LogisticRegression
+
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = [r for r in csv.DictReader(f) if r.get('text') and r.get('label') in ACTIONS]
+        texts = [_normalize(r['text']) for r in rows]
+        labels = [r['label'] for r in rows]
+
+        started = time.perf_counter()
+        vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4), sublinear_tf=True)
+        model = LogisticRegression(C=10.0, max_iter=1000)
+        model.fit(vectorizer.fit_transform(texts), labels)
+        self.vectorizer, self.model = vectorizer, model
+        print(f"✅ Intent router lokal dilatih dari {len(texts)} contoh ({(time.perf_counter() - started) * 1000:.0f} ms).")
+
+    # --- CLASSIFY ---
+    def resolve_skills(self, text: str, role: str) -> List[str]:
+        """Cari nama sub_skill (persis seperti di Sub_skill.json) yang disebut di pesan."""
+        return [skill['name'] for skill in skill_manager.find_skills_in_text(role, text)]
+
+    def unmapped_topics(self, text: str, role: str) -> List[str]:
+        """Kata di pesan yang bukan sebutan skill, bukan trigger tes, dan bukan kata pengantar."""
+        leftover = skill_manager.unmapped_text(role, text)
+        return [
+            word for word in _WORD_RE.findall(leftover)
+            if word not in EXAM_FILLER_WORDS and not EXAM_TRIGGER.fullmatch(word)
+        ]
+
+    def classify(self, text: str, role: str) -> Optional[IntentDecision]:
+        if self.model is None:
+            return None
+        norm = _normalize(text)
+        probs = dict(zip(self.model.classes_, self.model.predict_proba(self.vectorizer.transform([norm]))[0]))
+        model_action = max(probs, key=probs.get)
+
+        rule_action = next((action for action, pattern in TRIGGER_RULES if pattern.search(norm)), None)
+        if rule_action and (rule_action == model_action or probs.get(rule_action, 0.0) >= 0.3):
+            action, confidence, source = rule_action, probs.get(rule_action, 0.0), "rule+model"
+        elif rule_action:
+            action, confidence, source = rule_action, probs.get(rule_action, 0.0), "rule"
+        else:
+            action, confidence, source = model_action, probs[model_action], "model"
+
+        if action != "START_EXAM":
+            return IntentDecision(action, [], round(float(confidence), 3), source)
+        return IntentDecision(action, self.resolve_skills(text, role), round(float(confidence), 3), source,
+                              self.unmapped_topics(text, role))
+
+    # --- ROUTE ---
+    async def route(self, text: str, role: str) -> dict:
+        """Pengganti llm_engine.process_user_intent: jawab lokal jika yakin, selain itu ke LLM."""
+        decision = None
+        if INTENT_LOCAL_ENABLED:
+            try:
+                decision = self.classify(text, role)
+            except Exception as e:
+                print(f"⚠️ Intent router lokal error: {e}")
+
+        if INTENT_SHADOW_MODE:
+            intent = await llm_engine.process_user_intent(text, [])
+            if decision is not None:
+                self._record_shadow(text, decision, intent)
+            return intent
+
+        if decision is not None and decision.confident:
+            self.stats["local"] += 1
+            return decision.as_intent()
+
+        self.stats["deferred"] += 1
+        return await llm_engine.process_user_intent(text, [])
+
+    def _record_shadow(self, text: str, decision: IntentDecision, intent: dict):
+        agree = decision.action == intent.get('action')
+        if agree and decision.action == "START_EXAM":
+            agree = set(decision.detected_skills) == set(intent.get('detected_skills') or [])
+        self.stats["shadow_compared"] += 1
+        self.stats["shadow_agree"] += int(agree)
+        if decision.confident:
+            self.stats["shadow_confident"] += 1
+            self.stats["shadow_confident_agree"] += int(agree)
+        if not agree:
+            print(f"🔍 [Shadow] Beda intent untuk '{text[:60]}': lokal={decision.action} {decision.detected_skills} "
+                  f"({decision.confidence}, {decision.source}, unmapped={decision.unmapped}) vs LLM={intent.get('action')} {intent.get('detected_skills')}")
+
+    def snapshot(self) -> dict:
+        compared = self.stats["shadow_compared"]
+        confident = self.stats["shadow_confident"]
+        return {
+            "trained": self.model is not None,
+            "shadow_mode": INTENT_SHADOW_MODE,
+            "threshold": INTENT_CONFIDENCE_THRESHOLD,
+            "shadow_agreement": round(self.stats["shadow_agree"] / compared, 3) if compared else None,
+            "shadow_confident_agreement": round(self.stats["shadow_confident_agree"] / confident, 3) if confident else None,
+            **self.stats,
+        }
+
+
+# Instance global
+intent_router = IntentRouter()
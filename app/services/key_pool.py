@@ -0,0 +1,366 @@
+# app/services/key_pool.py
+import os
+import re
+import time
+from typing import Dict, List, Optional
+
+# Default limit per key (free tier Groq). RPD & TPM dikoreksi otomatis dari header x-ratelimit-*:
+# header *-requests Groq = kuota HARIAN (RPD), *-tokens = per menit (TPM). RPM tidak punya header,
+# jadi bucket per menit hanya perkiraan lokal (429 + Retry-After tetap jadi koreksinya)
+DEFAULT_RPM = int(os.getenv("GROQ_RPM_LIMIT", "30"))
+DEFAULT_RPD = int(os.getenv("GROQ_RPD_LIMIT", "14400"))
+DEFAULT_TPM = int(os.getenv("GROQ_TPM_LIMIT", "12000"))
+# Cooldown default kalau kena 429 tapi tidak ada header Retry-After
+DEFAULT_COOLDOWN = float(os.getenv("GROQ_THROTTLE_COOLDOWN", "10"))
+# Cooldown singkat untuk error non-rate-limit (koneksi putus, 5xx, dll)
+ERROR_COOLDOWN = float(os.getenv("GROQ_ERROR_COOLDOWN", "2"))
+# Maksimal call bersamaan per key (juga dipakai admission control untuk menghitung kapasitas)
+MAX_INFLIGHT_PER_KEY = int(os.getenv("GROQ_MAX_INFLIGHT_PER_KEY", "4"))
+# Circuit breaker: setelah N kegagalan beruntun key "open" (tidak dipakai) selama X detik,
+# lalu "half_open": 1 request percobaan menentukan key kembali normal atau open lagi
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("GROQ_BREAKER_FAILURES", "3"))
+BREAKER_RESET_TIMEOUT = float(os.getenv("GROQ_BREAKER_RESET_TIMEOUT", "30"))
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value) -> Optional[float]:
+    """Parse durasi dari header Groq ("2m59.56s", "7.66s", "120ms", "3") jadi detik."""
+    if value is None:
+        return None
+    value = str(value).strip()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    return sum(float(num) * units[unit] for num, unit in parts)
+
+
+def estimate_tokens(messages: List[dict]) -> int:
+    """Perkiraan kasar jumlah token prompt (~4 karakter per token) + jatah output."""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + 256
+
+
+class TokenBucket:
+    """
+    Token bucket per jendela waktu (default per menit). Bisa disinkronkan dengan header rate-limit:
+    sisa kuota (remaining) dan waktu reset dipakai untuk menghitung ulang isi bucket.
+    """
+
+    def __init__(self, capacity: float, window: float = 60.0):
+        self.window = window
+        self.capacity = float(capacity)
+        self.refill_rate = self.capacity / window
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        # Sampai waktu reset server, refill_rate mengikuti header; setelahnya kembali capacity / window
+        self.reset_at: Optional[float] = None
+
+    def _refill(self, now: float):
+        if now <= self.updated:
+            return
+        if self.reset_at is not None and now >= self.reset_at:
+            self.tokens = min(self.capacity, self.tokens + (self.reset_at - self.updated) * self.refill_rate)
+            self.updated = self.reset_at
+            self.refill_rate = self.capacity / self.window
+            self.reset_at = None
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_rate)
+        self.updated = now
+
+    def available(self, now: Optional[float] = None) -> float:
+        self._refill(now or time.monotonic())
+        return self.tokens
+
+    def consume(self, amount: float, now: Optional[float] = None):
+        self._refill(now or time.monotonic())
+        self.tokens -= amount
+
+    def sync(self, limit: Optional[float], remaining: Optional[float], reset_seconds: Optional[float]):
+        """Samakan isi bucket dengan angka resmi dari server."""
+        now = time.monotonic()
+        self._refill(now)
+        if limit:
+            self.capacity = float(limit)
+        self.refill_rate = self.capacity / self.window
+        self.reset_at = None
+        if remaining is not None:
+            self.tokens = min(self.capacity, float(remaining))
+            self.updated = now
+            # Bucket penuh lagi tepat saat waktu reset dari server, lalu kembali ke laju normal
+            if reset_seconds:
+                self.refill_rate = max(self.capacity - self.tokens, 1.0) / reset_seconds
+                self.reset_at = now + reset_seconds
+
+    def wait_time(self, amount: float = 1.0, now: Optional[float] = None) -> float:
+        """Detik sampai isi bucket cukup untuk `amount` (0 jika sudah cukup)."""
+        self._refill(now or time.monotonic())
+        missing = amount - self.tokens
+        if missing <= 0:
+            return 0.0
+        return missing / self.refill_rate if self.refill_rate > 0 else self.window
+
+    def headroom(self, now: Optional[float] = None) -> float:
+        if self.capacity <= 0:
+            return 0.0
+        return max(self.available(now), 0.0) / self.capacity
+
+
+class CircuitBreaker:
+    """Circuit breaker per key: closed (normal) -> open (diblok) -> half_open (1 probe)."""
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int = BREAKER_FAILURE_THRESHOLD, reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.threshold = max(threshold, 1)
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.probing = False
+        self.trips = 0
+
+    def _refresh(self, now: float):
+        if self.state == self.OPEN and now >= self.opened_until:
+            self.state = self.HALF_OPEN
+            self.probing = False
+
+    def allows(self, now: float) -> bool:
+        """Boleh dipakai? (half_open hanya jika belum ada probe yang berjalan)"""
+        self._refresh(now)
+        if self.state == self.OPEN:
+            return False
+        if self.state == self.HALF_OPEN:
+            return not self.probing
+        return True
+
+    def on_acquire(self, now: float):
+        self._refresh(now)
+        if self.state == self.HALF_OPEN:
+            self.probing = True
+
+    def on_release(self):
+        # Probe dibatalkan (misal kalah hedge) tanpa hasil: key boleh di-probe lagi
+        self.probing = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.probing = False
+
+    def record_failure(self, now: float) -> bool:
+        """Catat kegagalan. Return True jika circuit baru saja berubah jadi open."""
+        self.consecutive_failures += 1
+        self.probing = False
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.threshold:
+            tripped = self.state != self.OPEN
+            self.state = self.OPEN
+            self.opened_until = now + self.reset_timeout
+            if tripped:
+                self.trips += 1
+            return tripped
+        return False
+
+
+class KeyState:
+    """Status penjadwalan satu API key (kuota, cooldown, beban)."""
+
+    def __init__(self, index: int, api_key: str, client, rpm: int = DEFAULT_RPM, tpm: int = DEFAULT_TPM,
+                 rpd: int = DEFAULT_RPD):
+        self.index = index
+        self.label = f"key-{index + 1} (...{api_key[-4:]})" if api_key else f"key-{index + 1}"
+        self.client = client
+        self.requests = TokenBucket(rpm)
+        self.daily_requests = TokenBucket(rpd, window=86400.0)
+        self.tokens = TokenBucket(tpm)
+        self.cooldown_until = 0.0
+        self.breaker = CircuitBreaker()
+        self.inflight = 0
+        self.total_requests = 0
+        self.total_tokens = 0
+        self.throttled = 0
+        self.failures = 0
+        self.last_error = None
+
+    def is_cooling(self, now: float) -> bool:
+        return now < self.cooldown_until
+
+    def headroom(self, now: float) -> float:
+        """0.0 (habis / cooldown) sampai 1.0 (kuota penuh)."""
+        if self.is_cooling(now) or not self.breaker.allows(now):
+            return 0.0
+        return min(self.requests.headroom(now), self.daily_requests.headroom(now), self.tokens.headroom(now))
+
+    def steady_headroom(self, now: float) -> float:
+        """
+        Headroom untuk model policy: cooldown pendek (<= ERROR_COOLDOWN, misal satu error sesaat)
+        tidak dihitung sebagai kuota habis, supaya tidak langsung dianggap beban berat.
+        """
+        if self.cooldown_until - now > ERROR_COOLDOWN or not self.breaker.allows(now):
+            return 0.0
+        return min(self.requests.headroom(now), self.daily_requests.headroom(now), self.tokens.headroom(now))
+
+    def snapshot(self, now: float) -> dict:
+        return {
+            "key": self.label,
+            "headroom": round(self.headroom(now), 3),
+            "requests_available": round(self.requests.available(now), 1),
+            "requests_capacity": self.requests.capacity,
+            "daily_requests_available": round(self.daily_requests.available(now), 1),
+            "daily_requests_capacity": self.daily_requests.capacity,
+            "tokens_available": round(self.tokens.available(now), 1),
+            "tokens_capacity": self.tokens.capacity,
+            "inflight": self.inflight,
+            "cooldown_remaining": round(max(self.cooldown_until - now, 0.0), 2),
+            "circuit": self.breaker.state,
+            "circuit_trips": self.breaker.trips,
+            "total_requests": self.total_requests,
+            "total_tokens": self.total_tokens,
+            "throttled": self.throttled,
+            "failures": self.failures,
+            "last_error": self.last_error,
+        }
+
+
+class KeyPool:
+    """
+    Scheduler untuk N API key Groq. Setiap call dikirim ke key dengan sisa kuota
+    (headroom) terbesar; key yang kena rate limit di-cooldown sesuai Retry-After.
+    """
+
+    def __init__(self):
+        self.keys: List[KeyState] = []
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, api_key: str, client):
+        self.keys.append(KeyState(len(self.keys), api_key, client))
+
+    def acquire(self, estimated_tokens: int, exclude=(), ready_only: bool = False) -> Optional[KeyState]:
+        """
+        Pilih key terbaik & langsung reservasi kuotanya (1 request + perkiraan token).
+        Key dengan circuit breaker open atau yang sudah penuh (MAX_INFLIGHT_PER_KEY) dilewati. ready_only=True: key yang sedang cooldown
+        juga dilewati (dipakai untuk hedged request, yang tidak boleh menunggu).
+        """
+        now = time.monotonic()
+        candidates = [
+            k for k in self.keys
+            if k.index not in exclude and k.breaker.allows(now) and k.inflight < MAX_INFLIGHT_PER_KEY
+            and not (ready_only and k.is_cooling(now))
+        ]
+        if not candidates:
+            return None
+        # Key yang tidak cooldown diutamakan; kalau semua cooldown, pilih yang paling cepat selesai
+        best = max(
+            candidates,
+            key=lambda k: (not k.is_cooling(now), k.headroom(now), -k.cooldown_until, -k.inflight)
+        )
+        best.requests.consume(1, now)
+        best.daily_requests.consume(1, now)
+        best.tokens.consume(estimated_tokens, now)
+        best.breaker.on_acquire(now)
+        best.inflight += 1
+        best.total_requests += 1
+        return best
+
+    def release(self, key: KeyState):
+        key.inflight = max(key.inflight - 1, 0)
+        key.breaker.on_release()
+
+    def record_success(self, key: KeyState, headers, estimated_tokens: int, used_tokens: Optional[int]):
+        key.breaker.record_success()
+        if used_tokens is not None:
+            key.total_tokens += used_tokens
+            # Koreksi reservasi dengan pemakaian token sebenarnya
+            key.tokens.consume(used_tokens - estimated_tokens)
+        self._sync_headers(key, headers)
+
+    def record_throttle(self, key: KeyState, headers, error: Exception):
+        key.throttled += 1
+        key.last_error = str(error)[:200]
+        # 429 = key sehat tapi kuota habis: diatur cooldown, bukan circuit breaker
+        key.breaker.record_success()
+        self._sync_headers(key, headers)
+        retry_after = parse_duration(_header(headers, "retry-after"))
+        if retry_after is None:
+            retry_after = self._throttle_wait(key, headers)
+        key.cooldown_until = max(key.cooldown_until, time.monotonic() + retry_after)
+
+    @staticmethod
+    def _throttle_wait(key: KeyState, headers) -> float:
+        """
+        Lama cooldown 429 tanpa Retry-After. reset-requests adalah jendela HARIAN: hanya dipakai jika
+        kuota harian benar-benar habis (remaining-requests == 0). Selain itu pakai reset-tokens
+        (jendela per menit) atau waktu isi ulang bucket RPM lokal.
+        """
+        if _number(_header(headers, "x-ratelimit-remaining-requests")) == 0:
+            daily_reset = parse_duration(_header(headers, "x-ratelimit-reset-requests"))
+            if daily_reset:
+                return daily_reset
+        return max(
+            parse_duration(_header(headers, "x-ratelimit-reset-tokens")) or 0.0,
+            key.requests.wait_time(1.0),
+        ) or DEFAULT_COOLDOWN
+
+    def record_failure(self, key: KeyState, error: Exception):
+        now = time.monotonic()
+        key.failures += 1
+        key.last_error = str(error)[:200]
+        key.cooldown_until = max(key.cooldown_until, now + ERROR_COOLDOWN)
+        if key.breaker.record_failure(now):
+            print(f"⚠️ {key.label} circuit breaker OPEN selama {key.breaker.reset_timeout:g} detik "
+                  f"({key.breaker.consecutive_failures} gagal beruntun).")
+
+    def _sync_headers(self, key: KeyState, headers):
+        if not headers:
+            return
+        # Header *-requests Groq = kuota harian, bukan per menit
+        key.daily_requests.sync(
+            _number(_header(headers, "x-ratelimit-limit-requests")),
+            _number(_header(headers, "x-ratelimit-remaining-requests")),
+            parse_duration(_header(headers, "x-ratelimit-reset-requests")),
+        )
+        key.tokens.sync(
+            _number(_header(headers, "x-ratelimit-limit-tokens")),
+            _number(_header(headers, "x-ratelimit-remaining-tokens")),
+            parse_duration(_header(headers, "x-ratelimit-reset-tokens")),
+        )
+
+    def snapshot(self) -> List[Dict]:
+        now = time.monotonic()
+        return [k.snapshot(now) for k in self.keys]
+
+
+def _header(headers, name: str):
+    if headers is None:
+        return None
+    try:
+        return headers.get(name)
+    except Exception:
+        return None
+
+
+def _number(value) -> Optional[float]:
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
+
+
+def load_api_keys() -> List[str]:
+    """
+    Ambil semua API key dari .env:
+    GROQ_API_KEYS (dipisah koma) + GROQ_API_KEY + GROQ_API_KEY_BACKUP (tanpa duplikat).
+    """
+    keys = [k.strip() for k in os.getenv("GROQ_API_KEYS", "").split(",") if k.strip()]
+    for name in ("GROQ_API_KEY", "GROQ_API_KEY_BACKUP"):
+        value = os.getenv(name)
+        if value and value.strip() not in keys:
+            keys.append(value.strip())
+    return keys
@@ -0,0 +1,117 @@
+# app/services/keyword_matcher.py
+from collections import deque
+from typing import Dict, List, NamedTuple
+
+# Keyword pendek (<3 huruf) seperti "C", "R", "Go" wajib diapit spasi
+# agar tidak match "Car" atau "Goat"
+SHORT_KEYWORD_LEN = 3
+
+
+class KeywordMatch(NamedTuple):
+    keyword: str   # Keyword asli dari CSV (case asli)
+    start: int     # Posisi awal di teks user
+    end: int       # Posisi akhir (eksklusif) di teks user
+
+
+class KeywordMatcher:
+    """
+    Automaton Aho-Corasick untuk mencari semua keyword skill dalam satu kali
+    jalan di atas teks user. Biaya pencarian tergantung panjang pesan dan
+    jumlah match, bukan jumlah keyword di CSV.
+    """
+
+    def __init__(self, keywords: List[str]):
+        # State 0 = root. goto[state] = {char: next_state}
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        # Pattern (lowercase) yang berakhir tepat di state ini
+        self._out: List[List[str]] = [[]]
+        # State terdekat lewat rantai fail yang punya output (dictionary suffix link)
+        self._dict_link: List[int] = [0]
+        # Pattern lowercase -> daftar keyword asli (tanpa duplikat)
+        self._originals: Dict[str, List[str]] = {}
+
+        for k in keywords:
+            if not isinstance(k, str) or not k:
+                continue
+            pattern = k.lower()
+            originals = self._originals.setdefault(pattern, [])
+            if k in originals:
+                continue
+            if not originals:
+                self._insert(pattern)
+            originals.append(k)
+
+        self._build_links()
+
+    def __len__(self):
+        return len(self._originals)
+
+    def _insert(self, pattern: str):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+                self._dict_link.append(0)
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state].append(pattern)
+
+    def _build_links(self):
+        # BFS: fail link tiap state = suffix terpanjang yang juga prefix pattern lain
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                f = self._fail[state]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                fail_state = self._fail[nxt]
+                self._dict_link[nxt] = fail_state if self._out[fail_state] else self._dict_link[fail_state]
+
+    def find_matches(self, text: str) -> List[KeywordMatch]:
+        """Mengembalikan semua keyword yang muncul di teks beserta posisinya."""
+        # Tambah spasi di kiri-kanan supaya kata pendek di awal/akhir kalimat tetap terdeteksi
+        padded = " " + text.lower() + " "
+        last = len(padded) - 1
+        goto, fail, out, dict_link = self._goto, self._fail, self._out, self._dict_link
+        matches = []
+
+        state = 0
+        for i, ch in enumerate(padded):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+
+            hit = state if out[state] else dict_link[state]
+            while hit:
+                for pattern in out[hit]:
+                    start = i - len(pattern) + 1
+                    if len(pattern) < SHORT_KEYWORD_LEN:
+                        if start == 0 or i == last:
+                            continue
+                        if padded[start - 1] != " " or padded[i + 1] != " ":
+                            continue
+                    # Geser posisi karena ada spasi tambahan di depan
+                    span_start = max(start - 1, 0)
+                    span_end = min(i, len(text))
+                    for original in self._originals[pattern]:
+                        matches.append(KeywordMatch(original, span_start, span_end))
+                hit = dict_link[hit]
+
+        matches.sort(key=lambda m: (m.start, -m.end))
+        return matches
+
+    def find_keywords(self, text: str) -> List[str]:
+        """Daftar keyword unik (urut kemunculan pertama) yang ada di teks."""
+        seen = {}
+        for m in self.find_matches(text):
+            seen.setdefault(m.keyword, None)
+        return list(seen)
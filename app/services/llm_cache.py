@@ -0,0 +1,314 @@
+# app/services/llm_cache.py
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Backend: "memory" (LRU + TTL) atau "sqlite" (tahan restart)
+CACHE_BACKEND = os.getenv("LLM_CACHE_BACKEND", "memory")
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", os.path.join(CACHE_DIR, "llm_cache.sqlite3"))
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+# Batas cosine similarity untuk semantic tier (0 = matikan semantic tier)
+SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0.92"))
+SEMANTIC_MAX_ENTRIES = int(os.getenv("LLM_CACHE_SEMANTIC_MAX_ENTRIES", "500"))
+
+# TTL (detik) per method LLMEngine. 0 = tidak di-cache.
+# Override lewat env, contoh: LLM_CACHE_TTL_CASUAL_CHAT=300
+DEFAULT_TTLS = {
+    "process_user_intent": 3600,
+    "casual_chat": 600,
+    "generate_question": 300,
+    "analyze_psych_result": 3600,
+    "evaluate_answer": 0,
+    "analyze_progress": 0,
+}
+# Method yang boleh pakai semantic tier (jawaban mirip untuk pertanyaan yang mirip).
+# Default kosong: semantic tier opsional, aktifkan lewat env, contoh:
+# LLM_CACHE_SEMANTIC_METHODS=casual_chat,process_user_intent
+DEFAULT_SEMANTIC_METHODS = {m.strip() for m in os.getenv("LLM_CACHE_SEMANTIC_METHODS", "").split(",") if m.strip()}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def method_ttl(method: str) -> float:
+    env_value = os.getenv(f"LLM_CACHE_TTL_{method.upper()}")
+    if env_value is not None:
+        return float(env_value)
+    return float(DEFAULT_TTLS.get(method, 0))
+
+
+def normalize_text(text) -> str:
+    """Lowercase + rapikan spasi supaya "Halo " dan "halo" dianggap sama."""
+    return " ".join(str(text).lower().split())
+
+
+def make_key(method: str, messages, model: str, temperature, response_format=None) -> str:
+    payload = json.dumps({
+        "method": method,
+        "model": model,
+        "temperature": temperature,
+        "response_format": response_format,
+        "messages": [[m.get("role"), normalize_text(m.get("content", ""))] for m in messages],
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# ==========================================
+# BACKEND
+# ==========================================
+
+class MemoryCacheBackend:
+    """LRU + TTL di memori proses."""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.time():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._data[key] = (value, time.time() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SQLiteCacheBackend:
+    """Cache di disk (SQLite) supaya jawaban tetap ada setelah restart."""
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.evictions = 0
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, last_used REAL NOT NULL)"
+            )
+            self._conn.commit()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                return None
+            self._conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: float):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl, now),
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+            if count > self.max_entries:
+                # Buang yang expired dulu, lalu yang paling lama tidak dipakai (LRU)
+                self._conn.execute("DELETE FROM llm_cache WHERE expires_at < ?", (now,))
+                overflow = self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0] - self.max_entries
+                if overflow > 0:
+                    self._conn.execute(
+                        "DELETE FROM llm_cache WHERE key IN "
+                        "(SELECT key FROM llm_cache ORDER BY last_used ASC LIMIT ?)", (overflow,)
+                    )
+                    self.evictions += overflow
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+
+def create_backend(name: str = CACHE_BACKEND):
+    if name == "sqlite":
+        try:
+            return SQLiteCacheBackend()
+        except Exception as e:
+            print(f"⚠️ Gagal membuka cache SQLite, pakai memori: {e}")
+    return MemoryCacheBackend()
+
+
+# ==========================================
+# CACHE LAYER (EXACT + SEMANTIC)
+# ==========================================
+
+class LLMCache:
+    """
+    Cache jawaban LLM dua tingkat:
+    1. Exact: hash dari (method, model, temperature, format, pesan yang dinormalisasi).
+    2. Semantic (opsional, default mati): pesan user terakhir divektorkan dengan TF-IDF yang
+       sama dengan model rekomendasi; jika konteks lainnya identik, cosine >= threshold DAN
+       kata di luar vocab katalog sama persis, jawaban lama dipakai ulang. Tanpa syarat
+       terakhir "karir javascript" dan "tes javascript" dianggap identik (cosine 1.0) karena
+       "karir"/"tes" tidak ada di vocab katalog.
+    """
+
+    def __init__(self, backend=None, semantic_threshold: float = SEMANTIC_THRESHOLD,
+                 semantic_methods=DEFAULT_SEMANTIC_METHODS):
+        self.backend = backend if backend is not None else create_backend()
+        self.semantic_threshold = semantic_threshold
+        self.semantic_methods = set(semantic_methods)
+        self.vectorizer = None
+        self._vocabulary = None
+        # Partisi semantic: hash konteks (semua pesan kecuali pesan user terakhir) -> entri
+        self._semantic: "OrderedDict[str, list]" = OrderedDict()
+        self._semantic_lock = threading.Lock()
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def attach_vectorizer(self, vectorizer):
+        """Dipanggil saat model TF-IDF selesai di-load / di-reload (listener model_registry di main.py)."""
+        with self._semantic_lock:
+            # Vektor dari vectorizer lama beda vocab & dimensi: tier semantic dikosongkan
+            if vectorizer is not self.vectorizer and self._semantic:
+                print(f"🔄 Semantic cache dikosongkan ({sum(len(v) for v in self._semantic.values())} entri): vectorizer berganti.")
+                self._semantic.clear()
+            self.vectorizer = vectorizer
+            # Vectorizer hashing (ingest katalog) tidak punya vocab: semua kata ikut di vektor
+            self._vocabulary = getattr(vectorizer, "vocabulary_", None)
+
+    def _count(self, method: str, field: str):
+        bucket = self.stats.setdefault(method, {"exact_hits": 0, "semantic_hits": 0, "misses": 0})
+        bucket[field] += 1
+
+    def _semantic_enabled(self, method: str) -> bool:
+        return (
+            self.vectorizer is not None
+            and self.semantic_threshold > 0
+            and method in self.semantic_methods
+        )
+
+    def _semantic_parts(self, method, messages, model, temperature, response_format):
+        if not messages or messages[-1].get("role") != "user":
+            return None, None
+        partition = make_key(method, messages[:-1], model, temperature, response_format)
+        text = normalize_text(messages[-1].get("content", ""))
+        try:
+            vec = self.vectorizer.transform([text])
+        except Exception:
+            return None, None
+        # Pesan tanpa kata yang dikenal vocab (misal "Halo") tidak bisa dibandingkan
+        if vec.nnz == 0:
+            return partition, None
+        # Kata di luar vocab tidak ikut di vektor -> harus sama persis agar jawaban boleh dipakai ulang
+        vocabulary = self._vocabulary
+        oov = frozenset(t for t in _TOKEN_RE.findall(text) if vocabulary is not None and t not in vocabulary)
+        return partition, (vec, oov)
+
+    def get(self, method: str, messages, model: str, temperature, response_format=None) -> Optional[str]:
+        ttl = method_ttl(method)
+        if ttl <= 0:
+            return None
+
+        value = self.backend.get(make_key(method, messages, model, temperature, response_format))
+        if value is not None:
+            self._count(method, "exact_hits")
+            return value
+
+        if self._semantic_enabled(method):
+            partition, vec = self._semantic_parts(method, messages, model, temperature, response_format)
+            if vec is not None:
+                value = self._semantic_lookup(partition, vec)
+                if value is not None:
+                    self._count(method, "semantic_hits")
+                    return value
+
+        self._count(method, "misses")
+        return None
+
+    def set(self, method: str, messages, model: str, temperature, value: str, response_format=None):
+        ttl = method_ttl(method)
+        if ttl <= 0 or value is None:
+            return
+        self.backend.set(make_key(method, messages, model, temperature, response_format), value, ttl)
+
+        if self._semantic_enabled(method):
+            partition, vec = self._semantic_parts(method, messages, model, temperature, response_format)
+            if vec is not None:
+                with self._semantic_lock:
+                    entries = self._semantic.setdefault(partition, [])
+                    entries.append((*vec, value, time.time() + ttl))
+                    self._semantic.move_to_end(partition)
+                    self._trim_semantic()
+
+    def _semantic_lookup(self, partition: str, query) -> Optional[str]:
+        now = time.time()
+        with self._semantic_lock:
+            entries = self._semantic.get(partition)
+            if not entries:
+                return None
+            entries[:] = [e for e in entries if e[3] >= now]
+            vec, oov = query
+            best_score, best_value = 0.0, None
+            for cached_vec, cached_oov, value, _ in entries:
+                # Entri yang dibuat bersamaan dengan reload vectorizer bisa beda dimensi
+                if cached_oov != oov or cached_vec.shape != vec.shape:
+                    continue
+                # Vektor TF-IDF sudah ter-normalisasi L2, jadi dot product = cosine
+                score = float(vec.multiply(cached_vec).sum())
+                if score > best_score:
+                    best_score, best_value = score, value
+            if best_score >= self.semantic_threshold:
+                return best_value
+            return None
+
+    def _trim_semantic(self):
+        total = sum(len(v) for v in self._semantic.values())
+        while total > SEMANTIC_MAX_ENTRIES and self._semantic:
+            partition, entries = next(iter(self._semantic.items()))
+            entries.pop(0)
+            total -= 1
+            if not entries:
+                del self._semantic[partition]
+
+    def snapshot(self) -> dict:
+        totals = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        for bucket in self.stats.values():
+            for field, value in bucket.items():
+                totals[field] += value
+        lookups = sum(totals.values())
+        hits = totals["exact_hits"] + totals["semantic_hits"]
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "evictions": getattr(self.backend, "evictions", 0),
+            "semantic_entries": sum(len(v) for v in self._semantic.values()),
+            "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+            "totals": totals,
+            "per_method": self.stats,
+            "ttls": {m: method_ttl(m) for m in DEFAULT_TTLS},
+        }
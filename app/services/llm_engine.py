@@ -1,57 +1,381 @@
-import os
+import asyncio
+import inspect
 import json
-from groq import AsyncGroq
+import os
+import time
+from groq import AsyncGroq, RateLimitError
 from dotenv import load_dotenv
 
 load_dotenv()
 
+# Import setelah load_dotenv agar limit per key dari .env ikut terbaca
+from app.services.key_pool import KeyPool, estimate_tokens, load_api_keys
+from app.services.llm_cache import LLMCache, make_key
+from app.services.singleflight import SingleFlight
+from app.services.deadlines import HEDGE_MIN_SAMPLES, LatencyTracker, LLMTimeoutError, hedge_methods, method_timeout
+from app.services.model_policy import ModelPolicy, TierDecision, note_degraded
+from app.services import local_responses
+from app.services.admission import ADMISSION_RETRY_AFTER, AdmissionController, AdmissionRejected
+from app.services.metrics import LLM_FAILOVERS, LLM_TOKENS, UPSTREAM_SECONDS, record_stage, timed
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Penilaian batch: beberapa jawaban digabung dalam 1 prompt selama muat di budget token ini
+EVAL_BATCH_MAX_ITEMS = int(os.getenv("EVAL_BATCH_MAX_ITEMS", "5"))
+EVAL_BATCH_TOKEN_BUDGET = int(os.getenv("EVAL_BATCH_TOKEN_BUDGET", "3000"))
+EVAL_ERROR = {"score": 0, "feedback": "Error menilai.", "is_correct": False}
+
 class LLMEngine:
     def __init__(self):
-        self.clients = []
-        
-        key1 = os.getenv("GROQ_API_KEY")
-        if key1:
-            try:
-                self.clients.append(AsyncGroq(api_key=key1))
-            except Exception as e:
-                print(f"⚠️ Gagal memuat Token Utama: {e}")
+        # Semua key dikelola scheduler: call dikirim ke key dengan kuota paling longgar
+        self.key_pool = KeyPool()
 
-        key2 = os.getenv("GROQ_API_KEY_BACKUP")
-        if key2:
+        for i, api_key in enumerate(load_api_keys()):
             try:
-                self.clients.append(AsyncGroq(api_key=key2))
+                # max_retries=0: retry & failover diatur sendiri oleh key pool
+                self.key_pool.add(api_key, AsyncGroq(api_key=api_key, max_retries=0))
             except Exception as e:
-                print(f"⚠️ Gagal memuat Token Backup: {e}")
+                print(f"⚠️ Gagal memuat Token ke-{i+1}: {e}")
+            
+        # Cache jawaban (exact + semantic), backend & TTL diatur lewat .env
+        self.cache = LLMCache()
+        # Call identik yang sedang berjalan bersamaan cukup dikirim sekali ke Groq
+        self.singleflight = SingleFlight()
+        # Budget waktu per method, hedged request & statistik latency upstream
+        self.latency = LatencyTracker()
+        self.hedge_methods = hedge_methods()
+        self.upstream_stats = {"hedged": 0, "hedge_wins": 0, "hedge_skipped": 0, "timeouts": 0}
+        # Pemilihan model per method (tier utama / cadangan / template lokal), lihat app/data/model_policy.json
+        self.policy = ModelPolicy.load()
+        # Batas call upstream bersamaan per key + antrean prioritas (kelebihan ditolak 429/503)
+        self.admission = AdmissionController(self.key_pool)
             
-        print(f"✅ LLM Engine (Async) siap dengan {len(self.clients)} Client aktif.")
+        print(f"✅ LLM Engine (Async) siap dengan {len(self.key_pool)} Client aktif.")
+
+    # --- MODEL POLICY ---
+    def _load_signals(self, method: str) -> dict:
+        now = time.monotonic()
+        return {
+            "queue_depth": sum(k.inflight for k in self.key_pool.keys) + self.admission.queue_depth(),
+            "capacity": self.admission.capacity(now),
+            "latency_p90": self.latency.percentile(method, 0.9, min_samples=HEDGE_MIN_SAMPLES),
+            "headroom": max((k.steady_headroom(now) for k in self.key_pool.keys), default=0.0),
+        }
+
+    def _select_tier(self, method: str, local_available: bool = False) -> TierDecision:
+        """Pilih model untuk call ini. Keputusan degraded dicatat ke trace request (ChatResponse)."""
+        decision = self.policy.decide(method, self._load_signals(method), local_available)
+        if decision.degraded:
+            note_degraded(method, decision.tier, decision.reason)
+        return decision
+
+    def _local_on_error(self, method: str, error: Exception) -> bool:
+        """
+        True jika method boleh dijawab template lokal setelah semua call ke Groq gagal
+        (termasuk ditolak admission control).
+        """
+        if not self.policy.local_allowed(method):
+            return False
+        note_degraded(method, "local", f"error: {str(error)[:80]}")
+        return True
+
+    async def _execute_with_retry(self, messages, model, temperature=0.5, response_format=None, method=None, use_cache=True):
+        """
+        Mengirim request Async ke key dengan headroom terbesar.
+        Jika key kena rate limit / error, key tersebut di-cooldown dan request pindah ke key lain.
+        Jawaban untuk prompt yang sama (atau mirip) diambil dari cache jika ada, dan
+        prompt identik yang sedang berjalan bersamaan hanya dikirim sekali (singleflight).
+        use_cache=False = minta jawaban baru: tanpa cache dan tanpa digabung.
+        """
+        cache_method = method if use_cache and method else None
+        if cache_method:
+            cached = self.cache.get(cache_method, messages, model, temperature, response_format)
+            if cached is not None:
+                return cached
+
+        if cache_method and self.singleflight.enabled(cache_method):
+            flight_key = make_key(cache_method, messages, model, temperature, response_format)
+            return await self.singleflight.do(
+                cache_method, flight_key,
+                lambda: self._fetch_and_cache(messages, model, temperature, response_format, method, cache_method)
+            )
+        return await self._fetch_and_cache(messages, model, temperature, response_format, method, cache_method)
+
+    async def _fetch_and_cache(self, messages, model, temperature, response_format, method, cache_method):
+        content = await self._call_upstream(messages, model, temperature, response_format, method)
 
-    async def _execute_with_retry(self, messages, model, temperature=0.5, response_format=None):
+        if cache_method and self._is_cacheable(content, response_format):
+            self.cache.set(cache_method, messages, model, temperature, content, response_format)
+        return content
+
+    @staticmethod
+    def _is_cacheable(content, response_format) -> bool:
+        # Jangan simpan output JSON yang rusak, nanti error-nya ikut ter-cache
+        if not content:
+            return False
+        if response_format and response_format.get("type") == "json_object":
+            try:
+                json.loads(content)
+            except ValueError:
+                return False
+        return True
+
+    async def _call_upstream(self, messages, model, temperature, response_format, method=None):
         """
-        Mencoba request Async secara bergantian.
+        Kirim ke Groq dengan budget waktu per method (deadline total, termasuk failover).
+        Jika method boleh di-hedge dan call pertama lebih lambat dari latency persentil
+        method tersebut, call kedua dikirim ke key lain; jawaban pertama yang sukses dipakai.
         """
-        if not self.clients:
+        if not len(self.key_pool):
             raise Exception("Tidak ada API Key Groq yang terdeteksi di .env!")
 
-        last_error = Exception("Unknown Error")
+        # Antre di admission control dulu (bisa raise AdmissionRejected)
+        await self.admission.acquire(method)
+        try:
+            return await self._call_admitted(messages, model, temperature, response_format, method)
+        finally:
+            self.admission.release()
+
+    async def _call_admitted(self, messages, model, temperature, response_format, method):
+        loop = asyncio.get_running_loop()
+        budget = method_timeout(method)
+        deadline = loop.time() + budget
+        last_error = None
+        estimated = estimate_tokens(messages)
+        tried = set()
+        can_hedge = method in self.hedge_methods and len(self.key_pool) > 1
+
+        while len(tried) < len(self.key_pool) and loop.time() < deadline:
+            key = self.key_pool.acquire(estimated, exclude=tried)
+            if key is None:
+                break
+            if tried:
+                LLM_FAILOVERS.inc(method=method)
+            tried.add(key.index)
+
+            attempts = {asyncio.ensure_future(
+                self._attempt(key, messages, model, temperature, response_format, method, estimated)
+            ): key}
+            hedge_at = loop.time() + self.latency.hedge_delay(method) if can_hedge else None
+
+            while attempts:
+                wake_at = deadline if hedge_at is None else min(deadline, hedge_at)
+                done, _ = await asyncio.wait(
+                    attempts, timeout=max(wake_at - loop.time(), 0), return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    if hedge_at is not None and loop.time() < deadline:
+                        hedge_at = None
+                        hedge = self._start_hedge(tried, messages, model, temperature, response_format, method, estimated)
+                        if hedge is not None:
+                            attempts[hedge[0]] = hedge[1]
+                        continue
+
+                    # Deadline habis: batalkan semua call, key yang lambat dihitung gagal (circuit breaker)
+                    await self._cancel_attempts(attempts)
+                    for slow_key in attempts.values():
+                        self.key_pool.record_failure(slow_key, LLMTimeoutError(f"timeout {budget:g}s"))
+                    self.upstream_stats["timeouts"] += 1
+                    print(f"⚠️ {method or 'LLM'} timeout setelah {budget:g} detik.")
+                    raise LLMTimeoutError(f"{method or 'LLM'} tidak selesai dalam {budget:g} detik")
+
+                for task in done:
+                    winner_key = attempts.pop(task)
+                    if task.exception() is None:
+                        if len(tried) > 1 and winner_key.index != key.index:
+                            self.upstream_stats["hedge_wins"] += 1
+                        await self._cancel_attempts(attempts)
+                        return task.result()
+                    last_error = task.exception()
+
+        if loop.time() >= deadline:
+            self.upstream_stats["timeouts"] += 1
+            raise LLMTimeoutError(f"{method or 'LLM'} tidak selesai dalam {budget:g} detik")
+        print("❌ Semua Token Gagal/Habis.")
+        raise last_error or self._no_key_available()
+
+    def _no_key_available(self) -> AdmissionRejected:
+        """Lolos admission tapi tidak ada key yang bisa dipakai (semua penuh / circuit open)."""
+        return AdmissionRejected(503, ADMISSION_RETRY_AFTER, "Tidak ada API key yang siap dipakai.")
+
+    def _start_hedge(self, tried, messages, model, temperature, response_format, method, estimated):
+        """
+        Kirim call kedua (hedge) jika admission masih longgar dan ada key yang siap
+        (tidak cooldown, circuit tidak open). Return (task, key) atau None.
+        Slot admission hedge dilepas saat call selesai.
+        """
+        if not self.admission.try_acquire_hedge():
+            self.upstream_stats["hedge_skipped"] += 1
+            return None
+        hedge_key = self.key_pool.acquire(estimated, exclude=tried, ready_only=True)
+        if hedge_key is None:
+            self.admission.release()
+            self.upstream_stats["hedge_skipped"] += 1
+            return None
+        tried.add(hedge_key.index)
+        self.upstream_stats["hedged"] += 1
+        task = asyncio.ensure_future(
+            self._attempt(hedge_key, messages, model, temperature, response_format, method, estimated)
+        )
+        task.add_done_callback(lambda _: self.admission.release())
+        return task, hedge_key
+
+    @staticmethod
+    async def _cancel_attempts(attempts: dict):
+        for task in attempts:
+            task.cancel()
+        await asyncio.gather(*attempts, return_exceptions=True)
+
+    async def _attempt(self, key, messages, model, temperature, response_format, method, estimated):
+        """Satu call ke satu key. Hasil (sukses / rate limit / gagal) dicatat ke key pool & metrics."""
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            raw = await key.client.chat.completions.with_raw_response.create(
+                messages=messages,
+                model=model,
+                temperature=temperature,
+                response_format=response_format
+            )
+            completion = raw.parse()
+            if inspect.isawaitable(completion):
+                completion = await completion
+
+            usage = getattr(completion, "usage", None)
+            self.key_pool.record_success(key, raw.headers, estimated, getattr(usage, "total_tokens", None))
+            self.latency.record(method, time.perf_counter() - started)
+            self._record_usage(method, model, usage)
+            outcome = "ok"
+            return completion.choices[0].message.content
+
+        except RateLimitError as e:
+            print(f"⚠️ {key.label} kena rate limit. Error: {e}")
+            self.key_pool.record_throttle(key, getattr(e.response, "headers", None), e)
+            outcome = "throttled"
+            raise
+
+        except asyncio.CancelledError:
+            # Kalah hedge / deadline habis: dicatat oleh pemanggil
+            outcome = "cancelled"
+            raise
+
+        except Exception as e:
+            print(f"⚠️ {key.label} Gagal. Error: {e}")
+            self.key_pool.record_failure(key, e)
+            raise
+
+        finally:
+            self.key_pool.release(key)
+            self._record_upstream(method, key, outcome, time.perf_counter() - started)
+
+    @staticmethod
+    def _record_upstream(method, key, outcome: str, seconds: float):
+        key_name = f"key-{key.index + 1}"
+        UPSTREAM_SECONDS.observe(seconds, method=method or "unknown", key=key_name, outcome=outcome)
+        record_stage(f"upstream.{key_name}", seconds)
+
+    @staticmethod
+    def _record_usage(method, model, usage):
+        if usage is None:
+            return
+        for kind in ("prompt", "completion"):
+            tokens = getattr(usage, f"{kind}_tokens", None)
+            if tokens:
+                LLM_TOKENS.inc(tokens, method=method or "unknown", model=model, kind=kind)
+
+    async def _stream_with_retry(self, messages, model, temperature=0.5, method=None, use_cache=True):
+        """
+        Versi streaming dari _execute_with_retry (async generator potongan teks).
+        Pindah key hanya boleh sebelum token pertama terkirim ke user.
+        """
+        cache_method = method if use_cache and method else None
+        if cache_method:
+            cached = self.cache.get(cache_method, messages, model, temperature)
+            if cached is not None:
+                yield cached
+                return
+
+        if not len(self.key_pool):
+            raise Exception("Tidak ada API Key Groq yang terdeteksi di .env!")
+
+        await self.admission.acquire(method)
+        try:
+            async for token in self._stream_admitted(messages, model, temperature, method, cache_method):
+                yield token
+        finally:
+            self.admission.release()
+
+    async def _stream_admitted(self, messages, model, temperature, method, cache_method):
+        last_error = None
+        estimated = estimate_tokens(messages)
+        tried = set()
+
+        while len(tried) < len(self.key_pool):
+            key = self.key_pool.acquire(estimated, exclude=tried)
+            if key is None:
+                break
+            if tried:
+                LLM_FAILOVERS.inc(method=method)
+            tried.add(key.index)
+            parts = []
+            started = time.perf_counter()
+            # Tetap "cancelled" jika stream ditutup pemanggil (user disconnect)
+            outcome = "cancelled"
 
-        for i, client in enumerate(self.clients):
             try:
-                completion = await client.chat.completions.create(
+                # Budget waktu method berlaku sampai stream mulai (header diterima)
+                stream = await asyncio.wait_for(key.client.chat.completions.create(
                     messages=messages,
                     model=model,
                     temperature=temperature,
-                    response_format=response_format
-                )
-                return completion.choices[0].message.content
+                    stream=True
+                ), timeout=method_timeout(method))
+                used_tokens = None
+                usage = None
+                async for chunk in stream:
+                    if chunk.choices:
+                        token = chunk.choices[0].delta.content
+                        if token:
+                            parts.append(token)
+                            yield token
+                    # Groq mengirim usage di chunk terakhir (x_groq.usage)
+                    chunk_usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+                    if chunk_usage is not None:
+                        usage = chunk_usage
+                        used_tokens = getattr(usage, "total_tokens", None)
+
+                self.key_pool.record_success(key, None, estimated, used_tokens)
+                self._record_usage(method, model, usage)
+                outcome = "ok"
+                content = "".join(parts)
+                if cache_method and self._is_cacheable(content, None):
+                    self.cache.set(cache_method, messages, model, temperature, content)
+                return
+
+            except RateLimitError as e:
+                print(f"⚠️ {key.label} kena rate limit (stream). Error: {e}")
+                self.key_pool.record_throttle(key, getattr(e.response, "headers", None), e)
+                outcome = "throttled"
+                last_error = e
 
             except Exception as e:
-                print(f"⚠️ Token ke-{i+1} Gagal. Error: {e}")
+                print(f"⚠️ {key.label} Gagal (stream). Error: {e}")
+                self.key_pool.record_failure(key, e)
+                outcome = "error"
                 last_error = e
-                continue
+
+            finally:
+                self.key_pool.release(key)
+                self._record_upstream(method, key, outcome, time.perf_counter() - started)
+
+            # Token sudah terkirim sebagian: tidak bisa diulang dari awal di key lain
+            if parts:
+                raise last_error
         
         print("❌ Semua Token Gagal/Habis.")
-        raise last_error
+        raise last_error or self._no_key_available()
 
+    @timed("llm.process_user_intent")
     async def process_user_intent(self, user_text: str, available_skills: list):
         skills_str = "\n".join([f"- {s}" for s in available_skills])
         
@@ -89,22 +413,27 @@ class LLMEngine:
         }}
         """
         
+        decision = self._select_tier("process_user_intent")
         try:
             response_content = await self._execute_with_retry(
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_text}
                 ],
-                model="llama-3.3-70b-versatile",
+                model=decision.model,
                 temperature=0.0,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                method="process_user_intent"
             )
             return json.loads(response_content)
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"Error Router: {e}")
             return {"action": "CASUAL_CHAT", "detected_skills": []}
 
-    async def generate_question(self, topics: list, level: str):
+    @timed("llm.generate_question")
+    async def generate_question(self, topics: list, level: str, use_cache: bool = True):
         topics_str = ", ".join(topics)
         prompt = f"""
         Buatkan 1 soal esai pendek dengan konsep how, what, why untuk menguji pemahaman user
@@ -121,18 +450,24 @@ class LLMEngine:
             }}
         }}
         """
+        decision = self._select_tier("generate_question")
         try:
             response_content = await self._execute_with_retry(
                 messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
+                model=decision.model,
                 temperature=0.5,
-                response_format={"type": "json_object"}
+                response_format={"type": "json_object"},
+                method="generate_question",
+                use_cache=use_cache
             )
             return json.loads(response_content)
+        except AdmissionRejected:
+            raise
         except Exception as e:
             print(f"ERROR Generate: {e}")
             return {"question_text": f"Error generate soal.{e}", "grading_rubric": {}}
 
+    @timed("llm.evaluate_answer")
     async def evaluate_answer(self, user_answer: str, question_context: dict):
         prompt = f"""
         Bertindaklah sebagai Dosen AI yang menilai jawaban mahasiswa.
@@ -152,20 +487,121 @@ class LLMEngine:
             "is_correct": true
         }}
         """
+        decision = self._select_tier("evaluate_answer")
         try:
             response_content = await self._execute_with_retry(
                 messages=[{"role": "user", "content": prompt}],
-                model="llama-3.3-70b-versatile",
-                response_format={"type": "json_object"}
+                model=decision.model,
+                response_format={"type": "json_object"},
+                method="evaluate_answer"
             )
             
-            return json.loads(response_content)
-        except:
+            return self._clean_evaluation(json.loads(response_content))
+        except AdmissionRejected:
+            raise
+        except Exception as e:
             print(f"ERROR Evaluate answer: {e}")
-            return {"score": 0, "feedback": "Error menilai.", "is_correct": False}
+            return dict(EVAL_ERROR)
 
-    async def casual_chat(self, user_text: str, history: list = [], keyword_context: str = "", dataset_status: str = "NOT_FOUND"):
+    @staticmethod
+    def _clean_evaluation(item) -> dict:
+        """Validasi 1 hasil penilaian dari LLM. Raise ValueError jika formatnya rusak."""
+        if not isinstance(item, dict) or not isinstance(item.get("feedback"), str) \
+                or not isinstance(item.get("is_correct"), bool):
+            raise ValueError(f"Format penilaian tidak valid: {item!r}")
+        return {
+            "score": max(0, min(100, int(item["score"]))),
+            "feedback": item["feedback"],
+            "is_correct": item["is_correct"],
+        }
+
+    @staticmethod
+    def _pack_answers(items: list) -> list:
+        """Kelompokkan index jawaban per prompt (maks EVAL_BATCH_MAX_ITEMS & EVAL_BATCH_TOKEN_BUDGET)."""
+        packs, current, budget = [], [], 0
+        for i, (answer, context) in enumerate(items):
+            cost = estimate_tokens([{"content": json.dumps(context) + answer}])
+            if current and (len(current) >= EVAL_BATCH_MAX_ITEMS or budget + cost > EVAL_BATCH_TOKEN_BUDGET):
+                packs.append(current)
+                current, budget = [], 0
+            current.append(i)
+            budget += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    async def _evaluate_pack(self, items: list) -> list:
+        """
+        Nilai beberapa jawaban dalam 1 call. Item yang hasilnya hilang / rusak dinilai ulang
+        satu per satu, jadi 1 output jelek tidak menggagalkan item lain.
+        """
+        if len(items) == 1:
+            return [await self.evaluate_answer(*items[0])]
+
+        numbered = [
+            {"id": i + 1, "soal_konteks": context, "jawaban_mahasiswa": answer}
+            for i, (answer, context) in enumerate(items)
+        ]
+        prompt = f"""
+        Bertindaklah sebagai Dosen AI yang menilai jawaban mahasiswa.
+        Ada {len(items)} jawaban, nilai MASING-MASING secara terpisah.
+        
+        Daftar Soal & Jawaban: {json.dumps(numbered, ensure_ascii=False)}
+        
+        Tugas untuk setiap id:
+        1. Beri skor 0-100.
+        2. Beri feedback singkat & ramah (Bahasa Indonesia).
+        3. Tentukan apakah jawaban BENAR secara konsep (is_correct).
         
+        Output JSON (satu entri per id, urutan sama):
+        {{
+            "results": [
+                {{"id": 1, "score": 85, "feedback": "Penjelasanmu bagus, tapi kurang detail di bagian...", "is_correct": true}}
+            ]
+        }}
+        """
+        decision = self._select_tier("evaluate_answer_batch")
+        parsed = {}
+        try:
+            response_content = await self._execute_with_retry(
+                messages=[{"role": "user", "content": prompt}],
+                model=decision.model,
+                response_format={"type": "json_object"},
+                method="evaluate_answer_batch"
+            )
+            for entry in json.loads(response_content).get("results", []):
+                try:
+                    parsed[int(entry["id"]) - 1] = self._clean_evaluation(entry)
+                except Exception:
+                    continue
+        except AdmissionRejected:
+            raise
+        except Exception as e:
+            print(f"⚠️ Batch evaluate gagal ({e}), nilai satu per satu.")
+
+        missing = [i for i in range(len(items)) if i not in parsed]
+        if missing:
+            print(f"🔄 {len(missing)}/{len(items)} jawaban dinilai ulang satu per satu.")
+            redo = await asyncio.gather(*(self.evaluate_answer(*items[i]) for i in missing))
+            parsed.update(zip(missing, redo))
+        return [parsed[i] for i in range(len(items))]
+
+    @timed("llm.evaluate_answers")
+    async def evaluate_answers(self, items: list) -> list:
+        """
+        Nilai banyak jawaban sekaligus. items = [(user_answer, question_context), ...].
+        Jawaban digabung per prompt sesuai budget token, tiap kelompok dikirim bersamaan.
+        Hasil berurutan sesuai input.
+        """
+        packs = self._pack_answers(items)
+        results = await asyncio.gather(*(self._evaluate_pack([items[i] for i in pack]) for pack in packs))
+        out = [None] * len(items)
+        for pack, evaluations in zip(packs, results):
+            for i, evaluation in zip(pack, evaluations):
+                out[i] = evaluation
+        return out
+
+    def _build_casual_messages(self, user_text: str, history: list, keyword_context: str, dataset_status: str):
         if dataset_status == "FOUND":
             system_instruction = f"""
             [STATUS: VALID]
@@ -217,22 +653,59 @@ class LLMEngine:
         for msg in history[-5:]:
             messages.append({"role": msg['role'], "content": msg['content']})
         messages.append({"role": "user", "content": user_text})
+        return messages
+
+    @timed("llm.casual_chat")
+    async def casual_chat(self, user_text: str, history: list = [], keyword_context: str = "", dataset_status: str = "NOT_FOUND"):
+        decision = self._select_tier("casual_chat", local_available=True)
+        if decision.local:
+            return local_responses.casual_chat(user_text, keyword_context, dataset_status)
+        messages = self._build_casual_messages(user_text, history, keyword_context, dataset_status)
         
         try:
             return await self._execute_with_retry(
                 messages=messages,
-                model="llama-3.3-70b-versatile", 
-                temperature=0.3
+                model=decision.model, 
+                temperature=0.3,
+                method="casual_chat"
             )
         except Exception as e:
             print(f"ERROR Casual chat: {e}")
+            if self._local_on_error("casual_chat", e):
+                return local_responses.casual_chat(user_text, keyword_context, dataset_status)
+            if isinstance(e, AdmissionRejected):
+                raise
             return f"Maaf, otak saya sedang error. (Error: {str(e)})"
+
+    @timed("llm.stream_casual_chat")
+    async def stream_casual_chat(self, user_text: str, history: list = [], keyword_context: str = "", dataset_status: str = "NOT_FOUND"):
+        """Sama seperti casual_chat, tapi jawaban dikirim per potongan token (async generator)."""
+        decision = self._select_tier("casual_chat", local_available=True)
+        if decision.local:
+            yield local_responses.casual_chat(user_text, keyword_context, dataset_status)
+            return
+        messages = self._build_casual_messages(user_text, history, keyword_context, dataset_status)
+        
+        sent = False
+        try:
+            async for token in self._stream_with_retry(
+                messages=messages,
+                model=decision.model,
+                temperature=0.3,
+                method="casual_chat"
+            ):
+                sent = True
+                yield token
+        except Exception as e:
+            print(f"ERROR Casual chat (stream): {e}")
+            # Template hanya jika belum ada token terkirim (tidak dicampur dengan jawaban setengah jadi)
+            if not sent and self._local_on_error("casual_chat", e):
+                yield local_responses.casual_chat(user_text, keyword_context, dataset_status)
+            else:
+                yield f"Maaf, otak saya sedang error. (Error: {str(e)})"
         
 
-    async def analyze_psych_result(self, role: str, traits: list[str]):
-        """
-        Membuat penjelasan psikologis kenapa user cocok di role tersebut.
-        """
+    def _build_psych_messages(self, role: str, traits: list[str]):
         traits_str = "\n".join(traits)
         
         prompt = f"""
@@ -252,18 +725,47 @@ class LLMEngine:
         Contoh Output:
         "Wah, kamu punya bakat alami jadi AI Engineer! Kebiasaanmu yang suka menganalisis fakta dan mencari review mendalam menunjukkan kamu punya pola pikir analitis yang kuat, modal penting buat ngolah data!"
         """
-        
+        return [{"role": "user", "content": prompt}]
+
+    @timed("llm.analyze_psych_result")
+    async def analyze_psych_result(self, role: str, traits: list[str]):
+        """
+        Membuat penjelasan psikologis kenapa user cocok di role tersebut.
+        """
+        decision = self._select_tier("analyze_psych_result", local_available=True)
+        if decision.local:
+            return local_responses.psych_result(role, traits)
         try:
             return await self._execute_with_retry(
-                messages=[{"role": "user", "content": prompt}],
-                model="llama-3.1-8b-instant",
-                temperature=0.7
+                messages=self._build_psych_messages(role, traits),
+                model=decision.model,
+                temperature=0.7,
+                method="analyze_psych_result"
             )
-        except:
+        except Exception as e:
             print(f"ERROR Psych Analyze: {e}")
+            if self._local_on_error("analyze_psych_result", e):
+                return local_responses.psych_result(role, traits)
+            if isinstance(e, AdmissionRejected):
+                raise
             return f"Kamu cocok jadi {role}!"
 
-    async def analyze_progress(self, user_name: str, progress_data: dict):
+    @timed("llm.draft_psych_analysis")
+    async def draft_psych_analysis(self, role: str, traits: list[str]) -> str:
+        """
+        Satu varian analisis untuk tabel psych (psych_table). Tanpa cache (tiap varian berbeda),
+        tanpa degradasi ke template lokal; error diteruskan ke pemanggil.
+        Dibuat sekali lalu dipakai ulang, jadi selalu pakai tier "quality".
+        """
+        return await self._execute_with_retry(
+            messages=self._build_psych_messages(role, traits),
+            model=self.policy.tiers.get("quality", "llama-3.3-70b-versatile"),
+            temperature=0.9,
+            method="analyze_psych_result",
+            use_cache=False
+        )
+
+    def _build_progress_messages(self, progress_data: dict):
         data_str = json.dumps(progress_data, indent=2)
 
         system_msg = {
@@ -289,16 +791,55 @@ class LLMEngine:
             Gaya Bahasa: Gaul, motivasi tinggi, pakai emoji (🚀, 🎉, 🔥).
             """
         }
+        return [system_msg]
+
+    @timed("llm.analyze_progress")
+    async def analyze_progress(self, user_name: str, progress_data: dict):
+        decision = self._select_tier("analyze_progress", local_available=True)
+        if decision.local:
+            return local_responses.progress_report(progress_data)
+        messages = self._build_progress_messages(progress_data)
         
         try:
             return await self._execute_with_retry(
-                messages=[system_msg],
-                model="llama-3.1-8b-instant", 
-                temperature=0.7
+                messages=messages,
+                model=decision.model, 
+                temperature=0.7,
+                method="analyze_progress"
             )
         except Exception as e:
             print(f"ERROR Analyze Progress: {e}")
+            if self._local_on_error("analyze_progress", e):
+                return local_responses.progress_report(progress_data)
+            if isinstance(e, AdmissionRejected):
+                raise
             return f"Error generate progress: {str(e)}"
 
+    @timed("llm.stream_analyze_progress")
+    async def stream_analyze_progress(self, user_name: str, progress_data: dict):
+        """Sama seperti analyze_progress, tapi laporan dikirim per potongan token (async generator)."""
+        decision = self._select_tier("analyze_progress", local_available=True)
+        if decision.local:
+            yield local_responses.progress_report(progress_data)
+            return
+        messages = self._build_progress_messages(progress_data)
+        
+        sent = False
+        try:
+            async for token in self._stream_with_retry(
+                messages=messages,
+                model=decision.model,
+                temperature=0.7,
+                method="analyze_progress"
+            ):
+                sent = True
+                yield token
+        except Exception as e:
+            print(f"ERROR Analyze Progress (stream): {e}")
+            if not sent and self._local_on_error("analyze_progress", e):
+                yield local_responses.progress_report(progress_data)
+            else:
+                yield f"Error generate progress: {str(e)}"
+
             
 llm_engine = LLMEngine()
\ No newline at end of file
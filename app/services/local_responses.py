@@ -0,0 +1,64 @@
+# app/services/local_responses.py
+"""
+Jawaban template tanpa LLM, dipakai model_policy saat beban tinggi (tier "local")
+atau saat semua call ke Groq gagal. Isinya mengikuti format prompt aslinya.
+"""
+from typing import List
+
+FEATURE_HINT = "Sambil menunggu, kamu bisa coba **Ujian/Tes** sub skill, cek **progres**, atau minta **rekomendasi belajar** ya! 🚀"
+
+
+def casual_chat(user_text: str, keyword_context: str = "", dataset_status: str = "NOT_FOUND") -> str:
+    if dataset_status == "FOUND" and keyword_context and keyword_context != "NONE":
+        return (
+            f"Mora lagi menerima banyak pertanyaan nih 🙏 Topik **{keyword_context}** ada di silabus kita, "
+            f"jadi kamu bisa langsung uji pemahamanmu lewat Ujian/Tes atau lihat rekomendasi course-nya. "
+            f"Coba tanyakan lagi sebentar lagi untuk penjelasan konsepnya ya! 😊"
+        )
+    return f"Maaf, Mora lagi sibuk sebentar 🙏 {FEATURE_HINT}"
+
+
+def psych_result(role: str, traits: List[str]) -> str:
+    habits = [t.replace("- Lebih suka:", "").strip().rstrip(".") for t in traits][:2]
+    if not habits:
+        return f"Kamu cocok jadi **{role}**! Yuk mulai eksplorasi skill-skill dasarnya. 🚀"
+    habit_text = " dan ".join(h[0].lower() + h[1:] for h in habits)
+    return (
+        f"Kamu cocok jadi **{role}**! Kebiasaanmu yang suka {habit_text} "
+        f"menunjukkan pola pikir yang pas untuk role ini. Yuk mulai eksplorasi skill-skill dasarnya! 🚀"
+    )
+
+
+def progress_report(progress_data: dict) -> str:
+    name = progress_data.get("user_name") or "kamu"
+    courses = progress_data.get("active_courses") or []
+    done = [c for c in courses if _percent(c) >= 100]
+    ongoing = sorted((c for c in courses if _percent(c) < 100), key=_percent, reverse=True)
+
+    lines = [f"Hai **{name}**! 👋 Ini ringkasan progres belajarmu:", "", "🏆 **Highlights**"]
+    if done:
+        lines += [f"- **{_course_name(c)}** selesai 🎉" for c in done[:3]]
+    updates = progress_data.get("skill_updates") or []
+    if updates:
+        lines.append(f"- Ada **{len(updates)}** update skill terbaru 🔥")
+    if not done and not updates:
+        lines.append("- Kamu sudah mulai, itu langkah paling penting! 🔥")
+
+    lines += ["", "🚧 **Next Focus**"]
+    if ongoing:
+        lines += [f"- **{_course_name(c)}** ({_percent(c):g}%)" for c in ongoing[:3]]
+    else:
+        lines.append("- Pilih course berikutnya dari rekomendasi belajar")
+    lines += ["", "Gas terus, konsisten sedikit demi sedikit! 🚀"]
+    return "\n".join(lines)
+
+
+def _percent(course: dict) -> float:
+    try:
+        return float(course.get("progress_percent", 0) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _course_name(course: dict) -> str:
+    return str(course.get("course_name") or course.get("name") or "Course")
@@ -0,0 +1,214 @@
+# app/services/metrics.py
+"""
+Instrumentasi ringan tanpa dependency tambahan.
+
+- Counter & Histogram berlabel, dirender ke format teks Prometheus (/metrics).
+- stage(name): timing per tahap. Durasi masuk ke histogram mora_stage_duration_seconds
+  dan ke daftar timing request aktif (contextvar), yang dikirim balik sebagai header
+  Server-Timing oleh middleware di main.py.
+- Collector: fungsi yang dipanggil saat scrape untuk angka yang sudah dihitung modul lain
+  (statistik cache, key pool, admission, dll).
+"""
+import functools
+import inspect
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Header Server-Timing di setiap response (matikan jika tidak ingin membocorkan detail internal)
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING_ENABLED", "1") == "1"
+
+# Bucket latency (detik): dari operasi lokal (ms) sampai call LLM yang lama
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0)
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name, self.help, self.labelnames = name, help_text, tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # per label: [jumlah per bucket..., sum, count]
+        self.values: Dict[LabelKey, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            row = self.values.get(key)
+            if row is None:
+                row = self.values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    row[i] += 1
+                    break
+            row[-2] += value
+            row[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, row in sorted(self.values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                labels = _format_labels(self.labelnames + ("le",), key + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {row[-2]!r}")
+            lines.append(f"{self.name}_count{labels} {row[-1]}")
+        return lines
+
+
+# Sampel collector: (nama metric, tipe, help, [(dict label, nilai), ...])
+Sample = Tuple[str, str, str, List[Tuple[dict, float]]]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.metrics: Dict[str, object] = {}
+        self.collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.metrics.setdefault(name, Counter(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.metrics.setdefault(name, Histogram(name, help_text, labelnames, buckets))
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            try:
+                samples = list(collector())
+            except Exception as e:
+                print(f"⚠️ Collector metrics error: {e}")
+                continue
+            for name, kind, help_text, rows in samples:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for labels, value in rows:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Instance global
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    "mora_stage_duration_seconds", "Durasi per tahap pemrosesan (keyword, method LLM, scoring, dll).", ("stage",))
+HTTP_SECONDS = registry.histogram(
+    "mora_http_request_duration_seconds", "Durasi request HTTP per endpoint.", ("method", "path", "status"))
+UPSTREAM_SECONDS = registry.histogram(
+    "mora_llm_upstream_seconds", "Durasi call HTTP ke Groq per key.", ("method", "key", "outcome"))
+LLM_TOKENS = registry.counter(
+    "mora_llm_tokens_total", "Token terpakai menurut field usage dari Groq.", ("method", "model", "kind"))
+LLM_FAILOVERS = registry.counter(
+    "mora_llm_failovers_total", "Pindah ke key lain setelah call ke key sebelumnya gagal.", ("method",))
+
+
+# ==========================================
+# TIMING PER REQUEST (Server-Timing)
+# ==========================================
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def start_request_timing() -> List[Tuple[str, float]]:
+    """Panggil di awal request. Task turunan (asyncio.gather, to_thread) ikut menulis ke list yang sama."""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def record_stage(name: str, seconds: float):
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, stage=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+@contextmanager
+def stage(name: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started)
+
+
+def timed(name: str):
+    """Decorator stage() untuk coroutine function & async generator (durasi sampai stream habis)."""
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def gen_wrapper(*args, **kwargs):
+                with stage(name):
+                    async for item in func(*args, **kwargs):
+                        yield item
+            return gen_wrapper
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with stage(name):
+                return await func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing_header(timings: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Gabungkan tahap bernama sama (misal beberapa generate_question paralel): durasi dijumlah."""
+    merged: Dict[str, List[float]] = {}
+    for name, seconds in timings:
+        bucket = merged.setdefault(name, [0.0, 0])
+        bucket[0] += seconds
+        bucket[1] += 1
+    parts = []
+    for name, (seconds, count) in merged.items():
+        desc = f';desc="x{count}"' if count > 1 else ""
+        parts.append(f"{name};dur={seconds * 1000:.1f}{desc}")
+    if total is not None:
+        parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
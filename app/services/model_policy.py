@@ -0,0 +1,146 @@
+# app/services/model_policy.py
+import json
+import os
+from contextvars import ContextVar
+from typing import Dict, List, NamedTuple, Optional
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# File kebijakan model per method (tier utama, tier cadangan, boleh jawaban lokal atau tidak)
+POLICY_PATH = os.getenv("MODEL_POLICY_PATH", os.path.join(os.path.dirname(__file__), "..", "data", "model_policy.json"))
+LOCAL_TIER = "local"
+
+DEFAULT_POLICY = {
+    "tiers": {"quality": "llama-3.3-70b-versatile", "fast": "llama-3.1-8b-instant"},
+    # queue_depth null = batas antrean mengikuti kapasitas: queue_depth_factor x (key sehat x MAX_INFLIGHT_PER_KEY)
+    "thresholds": {"queue_depth": None, "queue_depth_factor": 1.5, "latency_p90_seconds": 8.0,
+                   "min_headroom": 0.15, "severe_factor": 2.0},
+    "methods": {},
+}
+
+
+class TierDecision(NamedTuple):
+    method: str
+    tier: str
+    model: Optional[str]     # None jika tier "local" (jawaban template tanpa LLM)
+    degraded: bool
+    reason: Optional[str]
+
+    @property
+    def local(self) -> bool:
+        return self.tier == LOCAL_TIER
+
+
+# ==========================================
+# TRACE DEGRADASI PER REQUEST
+# ==========================================
+# List keputusan "degraded" selama satu request (diisi LLMEngine, dibaca endpoint)
+_degradation_trace: ContextVar[Optional[List[dict]]] = ContextVar("degradation_trace", default=None)
+
+
+def start_degradation_trace() -> List[dict]:
+    """Panggil di awal endpoint. Task turunan (asyncio.gather) ikut menulis ke list yang sama."""
+    trace: List[dict] = []
+    _degradation_trace.set(trace)
+    return trace
+
+
+def note_degraded(method: str, tier: str, reason: Optional[str]):
+    trace = _degradation_trace.get()
+    if trace is not None:
+        trace.append({"method": method, "tier": tier, "reason": reason})
+
+
+def summarize_trace(trace: List[dict]) -> Optional[str]:
+    if not trace:
+        return None
+    return "; ".join(f"{item['method']} -> {item['tier']} ({item['reason']})" for item in trace)
+
+
+# ==========================================
+# POLICY
+# ==========================================
+
+class ModelPolicy:
+    """
+    Pemilihan model per method LLMEngine. Dalam kondisi normal dipakai tier utama;
+    jika antrean upstream, latency p90, atau sisa kuota (headroom) melewati batas,
+    pindah ke tier cadangan (model lebih cepat) atau jawaban template lokal.
+    """
+
+    def __init__(self, config: dict):
+        self.tiers: Dict[str, str] = dict(config.get("tiers", {}))
+        self.thresholds = {**DEFAULT_POLICY["thresholds"], **config.get("thresholds", {})}
+        self.methods: Dict[str, dict] = dict(config.get("methods", {}))
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def load(cls, path: str = POLICY_PATH) -> "ModelPolicy":
+        try:
+            with open(path) as f:
+                config = json.load(f)
+            print(f"✅ Model policy dimuat dari {os.path.basename(path)} ({len(config.get('methods', {}))} method).")
+        except Exception as e:
+            print(f"⚠️ Gagal membaca model policy ({e}), pakai default.")
+            config = DEFAULT_POLICY
+        return cls(config)
+
+    def _method_config(self, method: str) -> dict:
+        return self.methods.get(method) or {"primary": "quality", "fallback": "fast"}
+
+    def _decision(self, method: str, tier: str, degraded: bool, reason: Optional[str]) -> TierDecision:
+        bucket = self.stats.setdefault(method, {})
+        bucket[tier] = bucket.get(tier, 0) + 1
+        model = None if tier == LOCAL_TIER else self.tiers.get(tier, tier)
+        return TierDecision(method, tier, model, degraded, reason)
+
+    def queue_limit(self, signals: dict) -> float:
+        """Batas antrean upstream: angka tetap dari policy, atau turunan dari kapasitas admission."""
+        th = self.thresholds
+        if th.get("queue_depth"):
+            return th["queue_depth"]
+        return max(th["queue_depth_factor"] * signals.get("capacity", 0), 1.0)
+
+    def pressure(self, signals: dict) -> List[str]:
+        """Daftar alasan beban tinggi (kosong = normal)."""
+        th = self.thresholds
+        reasons = []
+        if signals.get("queue_depth", 0) >= self.queue_limit(signals):
+            reasons.append(f"queue_depth={signals['queue_depth']}")
+        latency = signals.get("latency_p90")
+        if latency is not None and latency >= th["latency_p90_seconds"]:
+            reasons.append(f"latency_p90={latency:.1f}s")
+        if signals.get("headroom", 1.0) < th["min_headroom"]:
+            reasons.append(f"headroom={signals['headroom']:.2f}")
+        return reasons
+
+    def decide(self, method: str, signals: dict, local_available: bool = True) -> TierDecision:
+        """local_available=False: method tidak punya template lokal, tier "local" dilewati."""
+        cfg = self._method_config(method)
+        primary = cfg.get("primary", "quality")
+        reasons = self.pressure(signals)
+        if not reasons:
+            return self._decision(method, primary, False, None)
+
+        reason = ", ".join(reasons)
+        th = self.thresholds
+        # Beban berat: kuota semua key habis atau antrean jauh di atas batas
+        severe = (
+            signals.get("headroom", 1.0) <= 0
+            or signals.get("queue_depth", 0) >= self.queue_limit(signals) * th["severe_factor"]
+        )
+        if cfg.get("local") and local_available and (severe or not cfg.get("fallback")):
+            return self._decision(method, LOCAL_TIER, True, reason)
+        if cfg.get("fallback"):
+            return self._decision(method, cfg["fallback"], True, reason)
+        return self._decision(method, primary, False, None)
+
+    def local_allowed(self, method: str) -> bool:
+        return bool(self._method_config(method).get("local"))
+
+    def snapshot(self) -> dict:
+        return {
+            "tiers": self.tiers,
+            "thresholds": self.thresholds,
+            "methods": self.methods,
+            "decisions": self.stats,
+        }
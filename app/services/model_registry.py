@@ -0,0 +1,345 @@
+# app/services/model_registry.py
+import asyncio
+import csv
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from app.services.artifact_store import (
+    BASE_NAME, CATALOG_DIR, COMPACT_DIR, DATASET_NAME, MANIFEST_NAME, PICKLE_DIR, PICKLE_FILES,
+    build_from_pickles, load_artifacts, model_dirs, read_manifest, stale_reason,
+)
+from app.services.course_catalog import CourseCatalog, memory_report
+from app.services.keyword_matcher import KeywordMatcher
+from app.services.retrieval_index import RetrievalIndex, SegmentedIndex, build_index
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Format artefak model: "auto" (compact jika ada, selain itu pickle), "compact", atau "pickle"
+ARTIFACT_FORMAT = os.getenv("ARTIFACT_FORMAT", "auto")
+# Interval (detik) cek perubahan file model / keyword di disk. 0 = watcher mati (reload manual saja)
+MODEL_WATCH_INTERVAL = float(os.getenv("MODEL_WATCH_INTERVAL", "0"))
+KEYWORDS_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "Skill Keywords.csv")
+
+
+class ModelReloadError(Exception):
+    """Bundle baru gagal dibangun; bundle lama tetap dipakai."""
+
+
+class ModelBundle(NamedTuple):
+    """
+    Satu set model yang dipakai bersama oleh request (tidak pernah diubah setelah dibuat).
+    Handler cukup mengambil `model_registry.current` sekali di awal request, jadi reload
+    di tengah jalan tidak membuat request memakai katalog baru dengan matrix lama.
+    """
+    version: int
+    fingerprint: str
+    catalog: Optional[CourseCatalog]
+    tfidf: object
+    matrix: object
+    # None = scoring brute force (RETRIEVAL_MODE=brute). SegmentedIndex jika ada delta ingest katalog;
+    # `matrix` tetap matrix basis (baris delta hanya ada di index & catalog)
+    index: Optional[Union[RetrievalIndex, SegmentedIndex]]
+    keywords: List[str]
+    keyword_matcher: KeywordMatcher
+    artifact: Optional[dict]
+    catalog_memory: Optional[dict]
+    loaded_at: float
+    load_ms: float
+    timings: Dict[str, float]            # lama load per bagian (ms): models, keywords
+    errors: Dict[str, str]               # bagian yang gagal di-load (hanya saat startup)
+
+    @property
+    def ready(self) -> bool:
+        return self.catalog is not None
+
+    def info(self) -> dict:
+        return {
+            "version": self.version,
+            "fingerprint": self.fingerprint[:12],
+            "courses": len(self.catalog) if self.catalog is not None else 0,
+            "keywords": len(self.keywords),
+            "artifact": self.artifact,
+            "catalog_memory": self.catalog_memory,
+            "retrieval": self.index.info() if self.index is not None else {"mode": "brute"},
+            "loaded_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.loaded_at)) if self.loaded_at else None,
+            "load_ms": self.load_ms,
+        }
+
+
+EMPTY_BUNDLE = ModelBundle(
+    version=0, fingerprint="", catalog=None, tfidf=None, matrix=None, index=None,
+    keywords=[], keyword_matcher=KeywordMatcher([]), artifact=None, catalog_memory=None,
+    loaded_at=0.0, load_ms=0.0, timings={}, errors={},
+)
+
+
+# ==========================================
+# LOADER
+# ==========================================
+
+def source_fingerprint() -> str:
+    """Hash dari (path, mtime, ukuran) semua file sumber model & keyword (git + hasil rebuild katalog)."""
+    paths = [KEYWORDS_PATH, os.path.join(PICKLE_DIR, DATASET_NAME), os.path.join(CATALOG_DIR, BASE_NAME)]
+    for src_dir, compact_dir in ((PICKLE_DIR, COMPACT_DIR), (CATALOG_DIR, os.path.join(CATALOG_DIR, "compact"))):
+        paths.append(os.path.join(compact_dir, MANIFEST_NAME))
+        paths += [os.path.join(src_dir, name) for name in PICKLE_FILES]
+    parts = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            parts.append(f"{path}:{stat.st_mtime_ns}:{stat.st_size}")
+        except OSError:
+            parts.append(f"{path}:-")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def load_course_models(artifact_format: str = ARTIFACT_FORMAT) -> dict:
+    """
+    Load katalog + vectorizer + matrix (compact dulu, fallback ke pickle). Raise jika gagal.
+    Katalog hasil rebuild ingest (CATALOG_DIR) dipakai jika masih sesuai dengan dataset git.
+    """
+    pickle_dir, compact_dir, origin = model_dirs()
+    # 1. Format compact (memory-map, dibagi antar worker). Fallback ke pickle jika tidak ada / rusak
+    if artifact_format in ("auto", "compact"):
+        try:
+            # Pickle sumber (git-tracked) berubah sejak compact dibangun -> bangun ulang dulu,
+            # supaya git pull / export notebook tidak diam-diam melayani katalog lama
+            stale = stale_reason(read_manifest(compact_dir), pickle_dir)
+            if stale:
+                print(f"⚠️ Artefak compact basi ({stale}), dibangun ulang dari pickle.")
+                build_from_pickles(pickle_dir, compact_dir)
+            catalog, tfidf, matrix, manifest = load_artifacts(compact_dir)
+            print(f"✅ Models Loaded (compact v{manifest['format_version']}, hash {manifest['bundle_hash'][:12]}) from: {compact_dir}")
+            return {
+                "catalog": catalog, "tfidf": tfidf, "matrix": matrix,
+                "catalog_memory": memory_report(catalog),
+                "artifact": {"format": "compact", "bundle_hash": manifest['bundle_hash'], "source": origin},
+            }
+        except Exception as e:
+            print(f"⚠️ Artefak compact tidak dipakai ({e}), fallback ke pickle.")
+
+    # pickle (dan pandas untuk DataFrame di dalamnya) hanya di-import jika jalur ini dipakai
+    import pickle
+
+    with open(os.path.join(pickle_dir, 'courses_df.pkl'), 'rb') as f:
+        df = pickle.load(f)
+    with open(os.path.join(pickle_dir, 'tfidf_vectorizer.pkl'), 'rb') as f:
+        tfidf = pickle.load(f)
+    with open(os.path.join(pickle_dir, 'tfidf_matrix.pkl'), 'rb') as f:
+        matrix = pickle.load(f)
+
+    # Parse tutorial_list & level_name sekali di sini, DataFrame tidak disimpan
+    catalog = CourseCatalog.from_dataframe(df)
+    mem = memory_report(catalog, df)
+    del df
+    print(f"📦 Katalog {mem['courses']} course: {mem['catalog_bytes'] / 1024:.1f} KB (DataFrame: {mem['dataframe_bytes'] / 1024:.1f} KB)")
+    print(f"✅ Models Loaded Successfully from: {pickle_dir}")
+    return {
+        "catalog": catalog, "tfidf": tfidf, "matrix": matrix,
+        "catalog_memory": mem,
+        "artifact": {"format": "pickle", "bundle_hash": None, "source": origin},
+    }
+
+
+def load_keywords(path: str = KEYWORDS_PATH) -> List[str]:
+    # Modul csv bawaan: hasil sama dengan pd.read_csv(...)['keyword'].dropna(), tanpa import pandas
+    with open(path, newline='', encoding='utf-8') as f:
+        return [row['keyword'] for row in csv.DictReader(f) if row.get('keyword')]
+
+
+# ==========================================
+# REGISTRY
+# ==========================================
+
+class ModelRegistry:
+    """
+    Pemegang bundle model yang sedang dipakai + mekanisme hot reload.
+    - Bundle baru dibangun penuh di thread terpisah, baru kemudian ditukar (satu assignment).
+    - Request yang sedang jalan tetap memakai bundle lama sampai selesai.
+    - Jika bundle baru gagal dibangun, bundle lama tetap dipakai.
+    """
+
+    def __init__(self):
+        self.current: ModelBundle = EMPTY_BUNDLE
+        self._build_lock = threading.Lock()
+        self._listeners: List[Callable[[ModelBundle], None]] = []
+        self._overlays: List[Callable[[ModelBundle], ModelBundle]] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"reloads": 0, "reload_failures": 0, "last_error": None}
+
+    def on_reload(self, callback: Callable[[ModelBundle], None]):
+        """Daftarkan fungsi yang dipanggil setiap bundle baru mulai dipakai."""
+        self._listeners.append(callback)
+
+    def add_overlay(self, overlay: Callable[[ModelBundle], ModelBundle]):
+        """
+        Daftarkan fungsi yang menurunkan bundle dari bundle hasil load disk (misal delta
+        ingest katalog yang belum masuk artefak). Dipanggil di akhir setiap build.
+        """
+        self._overlays.append(overlay)
+
+    def build(self, strict: bool) -> ModelBundle:
+        """
+        Bangun bundle baru dari disk. strict=False (startup): bagian yang gagal diganti kosong
+        seperti sebelumnya. strict=True (reload): gagal sedikit = ModelReloadError.
+        """
+        started = time.perf_counter()
+        fingerprint = source_fingerprint()
+        timings, errors = {}, {}
+        parts = {"catalog": None, "tfidf": None, "matrix": None, "catalog_memory": None, "artifact": None}
+        try:
+            parts.update(load_course_models())
+        except Exception as e:
+            if strict:
+                raise ModelReloadError(f"Gagal load model rekomendasi: {e}") from e
+            errors["models"] = str(e)
+            print(f"❌ Error Loading Models: {e}")
+            print(f"👉 Pastikan folder 'model_artifacts' ada di: {os.path.dirname(PICKLE_DIR)}")
+        timings["models"] = round((time.perf_counter() - started) * 1000, 1)
+
+        # Inverted index untuk top-k rekomendasi (lihat RETRIEVAL_MODE)
+        index_started = time.perf_counter()
+        index = None
+        try:
+            index = build_index(parts["matrix"])
+        except Exception as e:
+            if strict:
+                raise ModelReloadError(f"Gagal membangun retrieval index: {e}") from e
+            print(f"⚠️ Retrieval index gagal dibangun, pakai brute force: {e}")
+        if index is not None:
+            timings["index"] = round((time.perf_counter() - index_started) * 1000, 1)
+            print(f"✅ Retrieval index: {index.n_docs} course x {index.n_terms} term "
+                  f"({index.memory_bytes() / 1024:.1f} KB, {timings['index']} ms).")
+
+        keywords_started = time.perf_counter()
+        keywords = []
+        try:
+            keywords = load_keywords()
+        except Exception as e:
+            if strict:
+                raise ModelReloadError(f"Gagal memuat dataset keyword: {e}") from e
+            errors["keywords"] = str(e)
+            print(f"⚠️ Gagal memuat dataset keyword: {e}")
+        # Bangun automaton sekali per bundle, bukan di setiap request
+        matcher = KeywordMatcher(keywords)
+        timings["keywords"] = round((time.perf_counter() - keywords_started) * 1000, 1)
+        print(f"✅ Berhasil memuat {len(keywords)} keywords skill ({len(matcher)} pola unik).")
+
+        bundle = ModelBundle(
+            version=self.current.version + 1,
+            fingerprint=fingerprint,
+            keywords=keywords,
+            keyword_matcher=matcher,
+            index=index,
+            loaded_at=time.time(),
+            load_ms=round((time.perf_counter() - started) * 1000, 1),
+            timings=timings,
+            errors=errors,
+            **parts,
+        )
+        for overlay in self._overlays:
+            try:
+                bundle = overlay(bundle)
+            except Exception as e:
+                if strict:
+                    raise ModelReloadError(f"Gagal menerapkan overlay model: {e}") from e
+                print(f"⚠️ Overlay model gagal, pakai bundle dari disk saja: {e}")
+        return bundle
+
+    def _swap(self, bundle: ModelBundle):
+        self.current = bundle
+        for callback in self._listeners:
+            try:
+                callback(bundle)
+            except Exception as e:
+                print(f"⚠️ Listener reload model error: {e}")
+
+    def publish(self, derive: Callable[[ModelBundle], Optional[ModelBundle]]) -> ModelBundle:
+        """
+        Pasang bundle turunan dari bundle aktif (dipakai ingest katalog). derive dipanggil di
+        bawah lock build, jadi tidak pernah balapan dengan reload. None = tidak ada perubahan.
+        """
+        with self._build_lock:
+            bundle = derive(self.current)
+            if bundle is not None:
+                self._swap(bundle)
+            return self.current
+
+    def load(self) -> ModelBundle:
+        """Load awal saat startup (tidak pernah raise)."""
+        with self._build_lock:
+            bundle = self.build(strict=False)
+            self._swap(bundle)
+        return bundle
+
+    def reload_sync(self, force: bool = True) -> Optional[ModelBundle]:
+        """
+        Bangun & pasang bundle baru. Return None jika file sumber tidak berubah (force=False).
+        Raise ModelReloadError jika gagal atau reload lain sedang berjalan.
+        """
+        if not self._build_lock.acquire(blocking=False):
+            raise ModelReloadError("Reload lain sedang berjalan.")
+        try:
+            if not force and source_fingerprint() == self.current.fingerprint:
+                return None
+            try:
+                bundle = self.build(strict=True)
+            except ModelReloadError as e:
+                self.stats["reload_failures"] += 1
+                self.stats["last_error"] = str(e)
+                print(f"⚠️ {e} (tetap pakai model versi {self.current.version})")
+                raise
+            self._swap(bundle)
+            self.stats["reloads"] += 1
+            self.stats["last_error"] = None
+        finally:
+            self._build_lock.release()
+        print(f"🔄 Model di-reload: versi {bundle.version} ({len(bundle.catalog)} course, "
+              f"{len(bundle.keywords)} keyword, {bundle.load_ms} ms).")
+        return bundle
+
+    async def reload(self, force: bool = True) -> Optional[ModelBundle]:
+        """Versi async: build dijalankan di thread supaya event loop tetap melayani request."""
+        return await asyncio.to_thread(self.reload_sync, force)
+
+    # --- WATCHER ---
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload(force=False)
+            except asyncio.CancelledError:
+                raise
+            except ModelReloadError:
+                pass
+            except Exception as e:
+                print(f"⚠️ Model watcher error: {e}")
+
+    def start_watcher(self, interval: float = MODEL_WATCH_INTERVAL):
+        if interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._watch(interval))
+        print(f"✅ Model watcher aktif (cek tiap {interval:g} detik).")
+
+    async def stop_watcher(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> dict:
+        return {
+            "serving": self.current.info(),
+            "watcher": self._task is not None,
+            "reloading": self._build_lock.locked(),
+            **self.stats,
+        }
+
+
+# Instance global
+model_registry = ModelRegistry()
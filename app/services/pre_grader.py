@@ -0,0 +1,332 @@
+# app/services/pre_grader.py
+"""
+Pre-grader lokal untuk jawaban ujian (tanpa LLM).
+
+Jawaban yang jelas kosong / "tidak tahu" / menyalin soal / sama sekali tidak menyentuh
+rubrik langsung dinilai gagal di sini. Sisanya (yang butuh penilaian konsep) tetap
+dikirim ke llm_engine.evaluate_answer. Pre-grader tidak pernah meluluskan jawaban.
+
+Default berjalan di shadow mode (keputusan lokal hanya dicatat, nilai tetap dari LLM).
+Matikan shadow mode (PREGRADE_SHADOW_MODE=0) hanya setelah kalibrasi pada sampel berlabel
+menunjukkan false_fail == 0.
+
+Kalibrasi (bandingkan keputusan lokal dengan skor LLM pada sampel tersimpan):
+    python -m app.services.pre_grader calibrate [--sample app/data/grading_sample.jsonl] [--label] [--write]
+Sampel dari trafik (PREGRADE_SAMPLE_RATE > 0) ditulis ke cache/grading_sample.jsonl, bukan ke app/data.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+from typing import List, NamedTuple, Optional
+
+from app.services.llm_engine import llm_engine
+from app.services.model_registry import model_registry
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+PREGRADE_ENABLED = os.getenv("PREGRADE_ENABLED", "1") == "1"
+# Shadow mode: keputusan lokal hanya dicatat & dibandingkan, nilai tetap dari LLM.
+# Default aktif sampai `calibrate` pada sampel berlabel menunjukkan false_fail == 0
+PREGRADE_SHADOW_MODE = os.getenv("PREGRADE_SHADOW_MODE", "1") == "1"
+# Jawaban di bawah jumlah kata ini tanpa satu pun keyword rubrik = gagal
+PREGRADE_MIN_WORDS = int(os.getenv("PREGRADE_MIN_WORDS", "4"))
+# Jawaban pendek (< kata ini) tanpa keyword & kemiripan TF-IDF di bawah batas = gagal
+PREGRADE_SHORT_WORDS = int(os.getenv("PREGRADE_SHORT_WORDS", "15"))
+PREGRADE_MIN_SIMILARITY = float(os.getenv("PREGRADE_MIN_SIMILARITY", "0.05"))
+# Kemiripan kata dengan teks soal di atas batas ini = dianggap menyalin soal
+PREGRADE_COPY_SIMILARITY = float(os.getenv("PREGRADE_COPY_SIMILARITY", "0.85"))
+# Simpan sebagian jawaban yang dinilai LLM sebagai sampel kalibrasi (0 = mati)
+PREGRADE_SAMPLE_RATE = float(os.getenv("PREGRADE_SAMPLE_RATE", "0"))
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+SAMPLE_PATH = os.getenv("PREGRADE_SAMPLE_PATH", os.path.join(CACHE_DIR, "grading_sample.jsonl"))
+# Sampel berlabel yang ikut di repo (default untuk `calibrate`)
+SEED_SAMPLE_PATH = os.path.join(os.path.dirname(__file__), "..", "data", "grading_sample.jsonl")
+# Skor LLM minimal agar jawaban dianggap lulus (sama dengan /exam/submit)
+PASS_SCORE = 70
+
+FAIL, LLM = "fail", "llm"
+
+# "Tidak tahu" hanya jika SELURUH jawaban (tanpa tanda baca) berisi frasa itu + kata pengisi.
+# "tidak bisa diterapkan pada data acak" adalah jawaban, bukan "tidak tahu".
+_FILLER = r"(?:saya|aku|gue|gw|maaf|jujur|kak|masih|sih|deh|nih|ya|yah|banget|sama sekali|jawabannya)"
+_DONT_KNOW_CORE = (
+    r"(?:(?:tidak|gak|ga|nggak|ngga|enggak|belum|kurang) ?(?:tahu|tau|paham|ngerti|mengerti)"
+    r"|gatau|gktau|gatahu|entah|idk|dunno|no idea|pass|skip|i don ?t know)"
+)
+DONT_KNOW = re.compile(rf"(?:{_FILLER} )*{_DONT_KNOW_CORE}(?: {_FILLER})*")
+WORD = re.compile(r"\w+")
+# Simbol / kode ("O(log n)", "a[i] = x", "x => x * 2"): keyword rubrik tidak mewakili jawaban seperti ini
+SYMBOL = re.compile(r"[^\w\s.,!?'\"-]")
+
+FEEDBACK = {
+    "empty": "Jawabanmu masih kosong. Coba tulis penjelasanmu dulu ya, sedikit pun tidak apa-apa! 😊",
+    "dont_know": "Tidak apa-apa belum tahu! Coba pelajari lagi materinya, lalu jawab dengan kata-katamu sendiri ya. 💪",
+    "copy_question": "Sepertinya jawabanmu masih menyalin soal. Coba jelaskan dengan kata-katamu sendiri ya!",
+    "too_short": "Jawabanmu terlalu singkat dan belum menyentuh poin utama. Coba jelaskan lebih lengkap ya!",
+    "off_topic": "Jawabanmu belum membahas poin utama yang ditanyakan. Coba fokus ke konsep intinya ya!",
+}
+
+
+class PreGrade(NamedTuple):
+    decision: str            # "fail" = selesai lokal, "llm" = kirim ke LLM
+    score: int               # perkiraan skor lokal (0-100)
+    reason: Optional[str]    # kunci FEEDBACK jika gagal
+    words: int
+    coverage: float          # porsi keyword rubrik yang muncul di jawaban
+    similarity: Optional[float]  # cosine TF-IDF jawaban vs rubrik (None jika model belum dimuat)
+
+    @property
+    def settled(self) -> bool:
+        return self.decision == FAIL
+
+    def as_evaluation(self) -> dict:
+        return {"score": self.score, "feedback": FEEDBACK[self.reason], "is_correct": False}
+
+
+def _normalize(text: str) -> str:
+    return " ".join(str(text or "").lower().split())
+
+
+def _keywords(rubric: dict) -> List[str]:
+    keywords = rubric.get("keywords") or []
+    if isinstance(keywords, str):
+        keywords = keywords.split(",")
+    return [_normalize(k) for k in keywords if _normalize(k)]
+
+
+def keyword_coverage(answer: str, tokens: set, keywords: List[str]) -> float:
+    if not keywords:
+        return 0.0
+    # Keyword pendek ("C", "R", "Go") harus kata utuh, sisanya cukup substring ("normalisasi" di "dinormalisasi")
+    hits = sum(1 for k in keywords if (k in tokens if len(k) < 3 else k in answer))
+    return hits / len(keywords)
+
+
+def tfidf_similarity(answer: str, reference: str) -> Optional[float]:
+    tfidf = model_registry.current.tfidf
+    if tfidf is None or not reference:
+        return None
+    vecs = tfidf.transform([answer, reference])
+    return float((vecs[0] @ vecs[1].T).toarray()[0, 0])
+
+
+def _question_text(question_context: dict) -> Optional[str]:
+    """Teks soal asli dari context penilaian ("REFER TO CONTEXT" = tidak ada)."""
+    question = question_context.get("question_text")
+    return None if question == "REFER TO CONTEXT" else question
+
+
+def word_overlap(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class PreGrader:
+    """
+    Penilai lokal di depan /exam/submit: keyword coverage, panjang jawaban, dan kemiripan
+    TF-IDF ke rubrik (vectorizer yang sama dengan rekomendasi). Hanya memutuskan "gagal";
+    jawaban yang tidak jelas gagal diteruskan ke LLM.
+    """
+
+    def __init__(self):
+        self.stats = {
+            "local_fail": 0, "llm": 0, "by_reason": {},
+            "shadow_compared": 0, "shadow_fail": 0, "shadow_fail_but_passed": 0,
+        }
+
+    # --- GRADE ---
+    def grade(self, user_answer: str, rubric: dict, question_text: Optional[str] = None) -> PreGrade:
+        rubric = rubric if isinstance(rubric, dict) else {}
+        answer = _normalize(user_answer)
+        tokens = WORD.findall(answer)
+        token_set = set(tokens)
+        keywords = _keywords(rubric)
+        coverage = keyword_coverage(answer, token_set, keywords)
+        reference = " ".join(keywords + [_normalize(rubric.get("explanation_focus"))]).strip()
+        similarity = tfidf_similarity(answer, reference) if tokens else None
+
+        def result(decision, reason=None):
+            score = 0 if reason in ("empty", "dont_know", "copy_question") else \
+                min(int(round((0.6 * coverage + 0.4 * (similarity or 0.0)) * 100)), 30)
+            return PreGrade(decision, score, reason, len(tokens), round(coverage, 3),
+                            None if similarity is None else round(similarity, 3))
+
+        if not tokens:
+            return result(FAIL, "empty")
+        if coverage == 0 and DONT_KNOW.fullmatch(" ".join(tokens)):
+            return result(FAIL, "dont_know")
+        question = _normalize(question_text)
+        if question and word_overlap(token_set, set(WORD.findall(question))) >= PREGRADE_COPY_SIMILARITY:
+            return result(FAIL, "copy_question")
+        # Aturan berbasis keyword/TF-IDF saja tidak dipakai untuk jawaban bersimbol / kode
+        if SYMBOL.search(answer):
+            return result(LLM)
+        if coverage == 0 and len(tokens) < PREGRADE_MIN_WORDS:
+            return result(FAIL, "too_short")
+        if coverage == 0 and len(tokens) < PREGRADE_SHORT_WORDS \
+                and similarity is not None and similarity < PREGRADE_MIN_SIMILARITY:
+            return result(FAIL, "off_topic")
+        return result(LLM)
+
+    def _count(self, pre: PreGrade):
+        if pre.settled:
+            self.stats["local_fail"] += 1
+            self.stats["by_reason"][pre.reason] = self.stats["by_reason"].get(pre.reason, 0) + 1
+        else:
+            self.stats["llm"] += 1
+
+    # --- EVALUATE (pengganti llm_engine.evaluate_answer di endpoint) ---
+    def _pre_grade(self, user_answer: str, question_context: dict) -> Optional[PreGrade]:
+        if not PREGRADE_ENABLED:
+            return None
+        try:
+            return self.grade(user_answer, question_context.get("grading_rubric") or {}, _question_text(question_context))
+        except Exception as e:
+            print(f"⚠️ Pre-grader error: {e}")
+            return None
+
+    async def evaluate(self, user_answer: str, question_context: dict) -> dict:
+        return (await self.evaluate_many([(user_answer, question_context)]))[0]
+
+    async def evaluate_many(self, items: list) -> list:
+        """items = [(user_answer, question_context), ...]; yang jelas gagal tidak dikirim ke LLM."""
+        pres = [self._pre_grade(answer, context) for answer, context in items]
+        for pre in pres:
+            if pre is not None:
+                self._count(pre)
+
+        if PREGRADE_SHADOW_MODE:
+            pending = list(range(len(items)))
+        else:
+            pending = [i for i, pre in enumerate(pres) if pre is None or not pre.settled]
+
+        results = [None if i in pending else pres[i].as_evaluation() for i in range(len(items))]
+        if pending:
+            evaluations = await llm_engine.evaluate_answers([items[i] for i in pending])
+            for i, evaluation in zip(pending, evaluations):
+                results[i] = evaluation
+                if pres[i] is not None:
+                    self._observe(items[i], pres[i], evaluation)
+        return results
+
+    def _observe(self, item: tuple, pre: PreGrade, evaluation: dict):
+        if PREGRADE_SHADOW_MODE:
+            self.stats["shadow_compared"] += 1
+            if pre.settled:
+                self.stats["shadow_fail"] += 1
+                if evaluation.get("score", 0) >= PASS_SCORE:
+                    self.stats["shadow_fail_but_passed"] += 1
+                    print(f"🔍 [Shadow] Pre-grader gagalkan ({pre.reason}) tapi LLM skor {evaluation.get('score')}: "
+                          f"'{str(item[0])[:60]}'")
+        if PREGRADE_SAMPLE_RATE > 0 and random.random() < PREGRADE_SAMPLE_RATE:
+            self.record_sample(item[0], item[1].get("grading_rubric") or {}, evaluation, _question_text(item[1]))
+
+    def record_sample(self, user_answer: str, rubric: dict, evaluation: dict,
+                      question_text: Optional[str] = None, path: str = SAMPLE_PATH):
+        entry = {"user_answer": user_answer, "question_text": question_text, "rubric": rubric,
+                 "llm_score": evaluation.get("score"), "llm_is_correct": evaluation.get("is_correct")}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except Exception as e:
+            print(f"⚠️ Gagal menyimpan sampel kalibrasi: {e}")
+
+    def snapshot(self) -> dict:
+        decided = self.stats["local_fail"] + self.stats["llm"]
+        shadow_fail = self.stats["shadow_fail"]
+        return {
+            "enabled": PREGRADE_ENABLED,
+            "shadow_mode": PREGRADE_SHADOW_MODE,
+            "local_rate": round(self.stats["local_fail"] / decided, 3) if decided else 0.0,
+            "shadow_false_fail_rate": round(self.stats["shadow_fail_but_passed"] / shadow_fail, 3) if shadow_fail else None,
+            **self.stats,
+        }
+
+
+# Instance global
+pre_grader = PreGrader()
+
+
+# ==========================================
+# KALIBRASI
+# ==========================================
+
+def load_sample(path: str = SEED_SAMPLE_PATH) -> List[dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def label_sample(entries: List[dict]) -> int:
+    """Isi llm_score untuk entri sampel yang belum punya (butuh API key Groq)."""
+    missing = [e for e in entries if e.get("llm_score") is None]
+    if not missing:
+        return 0
+    contexts = [(e["user_answer"], {"question_text": e.get("question_text") or "REFER TO CONTEXT",
+                                    "grading_rubric": e.get("rubric") or {}})
+                for e in missing]
+    evaluations = await llm_engine.evaluate_answers(contexts)
+    for entry, evaluation in zip(missing, evaluations):
+        entry["llm_score"] = evaluation.get("score")
+        entry["llm_is_correct"] = evaluation.get("is_correct")
+    return len(missing)
+
+
+def calibration_report(entries: List[dict], grader: Optional[PreGrader] = None) -> dict:
+    """
+    Bandingkan keputusan pre-grader dengan skor LLM. Angka terpenting: false_fail
+    (pre-grader menggagalkan jawaban yang oleh LLM diluluskan) harus 0.
+    """
+    grader = grader or pre_grader
+    labeled = [e for e in entries if e.get("llm_score") is not None]
+    report = {"sample": len(entries), "labeled": len(labeled), "local_fail": 0, "sent_to_llm": 0,
+              "false_fail": 0, "by_reason": {}, "false_fail_examples": []}
+    llm_scores_of_fails = []
+    for entry in labeled:
+        pre = grader.grade(entry["user_answer"], entry.get("rubric") or {}, entry.get("question_text"))
+        if not pre.settled:
+            report["sent_to_llm"] += 1
+            continue
+        report["local_fail"] += 1
+        bucket = report["by_reason"].setdefault(pre.reason, {"count": 0, "max_llm_score": 0})
+        bucket["count"] += 1
+        bucket["max_llm_score"] = max(bucket["max_llm_score"], entry["llm_score"])
+        llm_scores_of_fails.append(entry["llm_score"])
+        if entry["llm_score"] >= PASS_SCORE:
+            report["false_fail"] += 1
+            report["false_fail_examples"].append({"user_answer": entry["user_answer"][:120],
+                                                  "reason": pre.reason, "llm_score": entry["llm_score"]})
+    if labeled:
+        report["local_rate"] = round(report["local_fail"] / len(labeled), 3)
+    if llm_scores_of_fails:
+        report["mean_llm_score_of_local_fails"] = round(sum(llm_scores_of_fails) / len(llm_scores_of_fails), 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kalibrasi pre-grader lokal terhadap skor LLM.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    calibrate = sub.add_parser("calibrate", help="Laporan keputusan pre-grader vs skor LLM pada sampel")
+    calibrate.add_argument("--sample", default=SEED_SAMPLE_PATH,
+                           help="File sampel (sampel dari trafik ada di PREGRADE_SAMPLE_PATH)")
+    calibrate.add_argument("--label", action="store_true", help="Nilai entri yang belum punya llm_score lewat LLM")
+    calibrate.add_argument("--write", action="store_true", help="Simpan llm_score hasil --label ke file sampel")
+    args = parser.parse_args()
+
+    model_registry.load()
+    entries = load_sample(args.sample)
+    if args.label:
+        labeled = asyncio.run(label_sample(entries))
+        print(f"🔄 {labeled} entri sampel dinilai LLM.")
+        if args.write and labeled:
+            with open(args.sample, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+    print(json.dumps(calibration_report(entries), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
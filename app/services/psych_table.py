@@ -0,0 +1,275 @@
+# app/services/psych_table.py
+"""
+Tabel analisis tes psikologi yang dihitung di muka.
+
+Jawaban tes hanya A/B/kosong untuk tiap soal, jadi semua pola jawaban bisa
+di-enumerasi (3^jumlah soal, termasuk jawaban parsial). Untuk tiap pola
+(winner + trait) disimpan beberapa varian teks analisis dari LLM; /psych/submit
+tinggal memilih salah satu tanpa call ke Groq.
+
+Tabel disimpan ke disk bersama fingerprint PSYCH_QUESTIONS. Jika soal berubah,
+tabel lama dibuang dan dibangun ulang otomatis di background.
+
+Build offline:  python -m app.services.psych_table build
+"""
+import argparse
+import asyncio
+import hashlib
+import itertools
+import json
+import os
+import random
+from typing import Dict, List, Optional, Tuple
+
+from app.services.admission import background_work
+from app.services.llm_engine import llm_engine
+from app.services.psych_service import PSYCH_QUESTIONS, psych_service
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+PSYCH_TABLE_ENABLED = os.getenv("PSYCH_TABLE_ENABLED", "1") == "1"
+# Jumlah varian teks per pola jawaban (dipilih acak supaya tidak monoton)
+PSYCH_TABLE_VARIANTS = int(os.getenv("PSYCH_TABLE_VARIANTS", "3"))
+# Jeda antar generate di background (detik) & jeda setelah gagal
+PSYCH_TABLE_INTERVAL = float(os.getenv("PSYCH_TABLE_INTERVAL", "2"))
+PSYCH_TABLE_ERROR_BACKOFF = float(os.getenv("PSYCH_TABLE_ERROR_BACKOFF", "30"))
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+TABLE_PATH = os.getenv("PSYCH_TABLE_PATH", os.path.join(CACHE_DIR, "psych_table.json"))
+# Batas percobaan per pola (varian yang sama persis tidak disimpan dua kali)
+MAX_ATTEMPTS_PER_VARIANT = 3
+# Naikkan jika prompt analyze_psych_result berubah (tabel lama ikut dibuang)
+PROMPT_VERSION = 1
+
+
+def questions_fingerprint(questions=None) -> str:
+    questions = PSYCH_QUESTIONS if questions is None else questions
+    raw = json.dumps({"prompt": PROMPT_VERSION, "questions": questions}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def pattern_key(user_answers: Dict[int, str]) -> str:
+    """Kunci pola jawaban, contoh "1A,2B,4A" (soal tanpa jawaban valid dilewati, "-" jika kosong semua)."""
+    parts = []
+    for q in PSYCH_QUESTIONS:
+        choice = user_answers.get(q["id"])
+        if choice and choice in q["role_mapping"]:
+            parts.append(f"{q['id']}{choice}")
+    return ",".join(parts) or "-"
+
+
+def all_patterns() -> List[Tuple[str, Dict[int, str]]]:
+    """
+    Semua pola jawaban (lengkap & parsial). Pola lengkap di depan karena paling sering
+    dikirim, lalu makin sedikit jawaban makin belakang.
+    """
+    choices = [[None] + sorted(q["role_mapping"]) for q in PSYCH_QUESTIONS]
+    patterns = []
+    for combo in itertools.product(*choices):
+        answers = {q["id"]: c for q, c in zip(PSYCH_QUESTIONS, combo) if c is not None}
+        patterns.append((pattern_key(answers), answers))
+    patterns.sort(key=lambda item: -len(item[1]))
+    return patterns
+
+
+class PsychTable:
+    """
+    Tabel {pola jawaban: varian analisis}. Worker asyncio di background melengkapi
+    pola yang variannya masih kurang; selama belum lengkap /psych/submit memanggil LLM
+    seperti biasa untuk pola tersebut.
+    """
+
+    def __init__(self, path: str = TABLE_PATH, variants: int = PSYCH_TABLE_VARIANTS):
+        self.path = path
+        self.variants = max(variants, 1)
+        self.fingerprint = questions_fingerprint()
+        self.entries: Dict[str, dict] = {}
+        self._task = None
+        self._dirty = False
+        self.stats = {"hits": 0, "misses": 0, "generated": 0, "failed": 0, "rebuilds": 0}
+
+    # --- LOOKUP ---
+    def _check_fingerprint(self):
+        """PSYCH_QUESTIONS berubah (misal diubah saat runtime): buang tabel, worker membangun ulang."""
+        current = questions_fingerprint()
+        if current != self.fingerprint:
+            print(f"🔄 PSYCH_QUESTIONS berubah ({self.fingerprint} -> {current}), tabel analisis dibangun ulang.")
+            self.fingerprint = current
+            self.entries = {}
+            self._dirty = True
+            self.stats["rebuilds"] += 1
+
+    def lookup(self, user_answers: Dict[int, str]) -> Optional[str]:
+        self._check_fingerprint()
+        entry = self.entries.get(pattern_key(user_answers))
+        if not entry or not entry["variants"]:
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        return random.choice(entry["variants"])
+
+    async def analyze(self, user_answers: Dict[int, str], result: dict) -> str:
+        """Pengganti llm_engine.analyze_psych_result di /psych/submit."""
+        if PSYCH_TABLE_ENABLED:
+            text = self.lookup(user_answers)
+            if text is not None:
+                return text
+        return await llm_engine.analyze_psych_result(result["winner"], result["traits"])
+
+    # --- BUILD ---
+    def _needs_variants(self, key: str) -> bool:
+        entry = self.entries.get(key)
+        if entry is None:
+            return True
+        return len(entry["variants"]) < self.variants \
+            and entry.get("attempts", 0) < self.variants * MAX_ATTEMPTS_PER_VARIANT
+
+    def _neediest_pattern(self) -> Optional[Tuple[str, Dict[int, str]]]:
+        return next(((key, answers) for key, answers in all_patterns() if self._needs_variants(key)), None)
+
+    def coverage(self) -> Tuple[int, int]:
+        patterns = all_patterns()
+        complete = sum(1 for key, _ in patterns
+                       if len(self.entries.get(key, {}).get("variants", [])) >= self.variants)
+        return complete, len(patterns)
+
+    async def build_once(self) -> bool:
+        """Generate 1 varian untuk pola yang paling kurang. Return False jika gagal."""
+        self._check_fingerprint()
+        target = self._neediest_pattern()
+        if target is None:
+            return True
+        key, answers = target
+        result = psych_service.calculate_result(answers)
+        try:
+            with background_work():
+                text = await llm_engine.draft_psych_analysis(result["winner"], result["traits"])
+        except Exception as e:
+            self.stats["failed"] += 1
+            print(f"⚠️ Generate analisis psych {key} gagal: {e}")
+            return False
+        text = (text or "").strip().strip('"').strip()
+        if not text:
+            self.stats["failed"] += 1
+            return False
+
+        entry = self.entries.setdefault(key, {"winner": result["winner"], "traits": result["traits"], "variants": []})
+        entry["attempts"] = entry.get("attempts", 0) + 1
+        self._dirty = True
+        if text not in entry["variants"]:
+            entry["variants"].append(text)
+            self.stats["generated"] += 1
+        return True
+
+    async def build_all(self):
+        if not len(llm_engine.key_pool):
+            print("⚠️ Psych table tidak dibangun: tidak ada API Key Groq.")
+            return
+        while self._neediest_pattern() is not None:
+            if not await self.build_once():
+                await asyncio.sleep(PSYCH_TABLE_ERROR_BACKOFF)
+        self.save()
+
+    async def _run(self):
+        while True:
+            try:
+                if self._neediest_pattern() is None:
+                    self.save()
+                    # Tabel lengkap: cukup cek berkala apakah soal berubah
+                    await asyncio.sleep(PSYCH_TABLE_ERROR_BACKOFF)
+                    self._check_fingerprint()
+                    continue
+                ok = await self.build_once()
+                if self._dirty and self.stats["generated"] % 10 == 0:
+                    self.save()
+                await asyncio.sleep(PSYCH_TABLE_INTERVAL if ok else PSYCH_TABLE_ERROR_BACKOFF)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Psych table build error: {e}")
+                await asyncio.sleep(PSYCH_TABLE_ERROR_BACKOFF)
+
+    def start(self):
+        if not PSYCH_TABLE_ENABLED or self._task is not None:
+            return
+        if not len(llm_engine.key_pool):
+            print("⚠️ Psych table tidak dibangun: tidak ada API Key Groq.")
+            return
+        self._task = asyncio.create_task(self._run())
+        complete, total = self.coverage()
+        print(f"✅ Psych table aktif ({complete}/{total} pola lengkap, {self.variants} varian per pola).")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save()
+
+    # --- PERSISTENCE ---
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Gagal membaca psych table: {e}")
+            return
+        if stored.get("fingerprint") != self.fingerprint:
+            print("🔄 PSYCH_QUESTIONS berubah sejak tabel analisis dibuat, tabel dibangun ulang.")
+            self.stats["rebuilds"] += 1
+            return
+        self.entries = stored.get("patterns", {})
+        complete, total = self.coverage()
+        print(f"✅ Psych table dimuat dari disk: {complete}/{total} pola lengkap.")
+
+    def save(self):
+        if not self._dirty:
+            return
+        payload = {"fingerprint": self.fingerprint, "variants": self.variants, "patterns": self.entries}
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️ Gagal menyimpan psych table: {e}")
+
+    def snapshot(self) -> dict:
+        complete, total = self.coverage()
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "running": self._task is not None,
+            "fingerprint": self.fingerprint,
+            "patterns": total,
+            "complete_patterns": complete,
+            "variants_per_pattern": self.variants,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            **self.stats,
+        }
+
+
+# Instance global
+psych_table = PsychTable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bangun tabel analisis tes psikologi (butuh API key Groq).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Lengkapi semua pola jawaban lalu simpan ke disk")
+    sub.add_parser("status", help="Tampilkan kelengkapan tabel")
+    args = parser.parse_args()
+
+    psych_table.load()
+    if args.command == "build":
+        asyncio.run(psych_table.build_all())
+    complete, total = psych_table.coverage()
+    print(f"✅ {complete}/{total} pola lengkap ({psych_table.variants} varian), fingerprint {psych_table.fingerprint}")
+
+
+if __name__ == "__main__":
+    main()
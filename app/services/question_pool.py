@@ -0,0 +1,254 @@
+# app/services/question_pool.py
+import asyncio
+import hashlib
+import json
+import os
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from app.services.admission import background_work
+from app.services.llm_engine import llm_engine
+from app.services.skill_manager import skill_manager
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+POOL_ENABLED = os.getenv("QUESTION_POOL_ENABLED", "1") == "1"
+# Jumlah stok soal per (sub_skill, level)
+POOL_BUCKET_SIZE = int(os.getenv("QUESTION_POOL_SIZE", "3"))
+# Jeda antar generate di background (detik) supaya tidak menghabiskan kuota Groq
+POOL_REFILL_INTERVAL = float(os.getenv("QUESTION_POOL_REFILL_INTERVAL", "2"))
+# Jeda setelah gagal generate (misal semua key kena rate limit)
+POOL_ERROR_BACKOFF = float(os.getenv("QUESTION_POOL_ERROR_BACKOFF", "30"))
+# Berapa soal terakhir per bucket yang diingat agar tidak muncul ulang
+POOL_RECENT_LIMIT = int(os.getenv("QUESTION_POOL_RECENT_LIMIT", "30"))
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+POOL_PATH = os.getenv("QUESTION_POOL_PATH", os.path.join(CACHE_DIR, "question_pool.json"))
+
+BucketKey = Tuple[str, str]
+
+
+class QuestionGenerationError(Exception):
+    """Generate soal langsung ke LLM gagal (payload error / soal tanpa rubric)."""
+
+
+def _question_hash(question: dict) -> str:
+    text = " ".join(str(question.get("question_text", "")).lower().split())
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+class QuestionPool:
+    """
+    Stok soal ujian siap pakai per (sub_skill id, level).
+    - Request mengambil soal dari stok (instan); soal yang sudah diambil keluar dari stok
+      sehingga user tidak mendapat soal yang sama.
+    - Worker asyncio di background mengisi ulang bucket yang stoknya paling sedikit.
+    - Stok disimpan ke disk (JSON) supaya tetap ada setelah restart.
+    """
+
+    def __init__(self, path: str = POOL_PATH, bucket_size: int = POOL_BUCKET_SIZE):
+        self.path = path
+        self.bucket_size = bucket_size
+        self.topics: Dict[BucketKey, list] = {}
+        self.buckets: Dict[BucketKey, deque] = {}
+        self.recent: Dict[BucketKey, deque] = {}
+        self.stats = {"served_from_pool": 0, "live_fallback": 0, "generated": 0, "rejected": 0}
+        self._dirty = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self.refresh_buckets()
+        self._dirty = False
+        # Bucket ikut diperbarui saat Sub_skill.json di-reload
+        skill_manager.on_reload(self.refresh_buckets)
+
+    def refresh_buckets(self):
+        """Daftar bucket diambil dari Sub_skill.json (semua role x sub_skill x level)."""
+        topics = {}
+        for role in skill_manager.data:
+            for skill in role['sub_skills']:
+                for level, level_data in skill['levels'].items():
+                    topics[(skill['id'], level)] = level_data['exam_topics']
+        for key in topics:
+            # Topik berubah = stok lama tidak relevan lagi
+            if key in self.topics and self.topics[key] != topics[key]:
+                self.buckets[key].clear()
+            self.buckets.setdefault(key, deque())
+            self.recent.setdefault(key, deque(maxlen=POOL_RECENT_LIMIT))
+        for key in list(self.buckets):
+            if key not in topics:
+                del self.buckets[key]
+                self.recent.pop(key, None)
+        self.topics = topics
+        self._dirty = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # --- SERVE ---
+    def take(self, skill_id: str, level: str) -> Optional[dict]:
+        bucket = self.buckets.get((skill_id, level))
+        if not bucket:
+            return None
+        question = bucket.popleft()
+        self._dirty = True
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return question
+
+    async def get_question(self, skill_id: str, level: str, topics: list) -> dict:
+        """
+        Ambil soal dari stok; jika bucket kosong baru generate langsung ke LLM.
+        Raise QuestionGenerationError jika hasil generate bukan soal yang valid.
+        """
+        question = self.take(skill_id, level)
+        if question is not None:
+            self.stats["served_from_pool"] += 1
+            return question
+        self.stats["live_fallback"] += 1
+        question = await llm_engine.generate_question(topics, level)
+        if not self._is_valid(question):
+            # generate_question mengembalikan {"question_text": "Error generate soal...", "grading_rubric": {}}
+            raise QuestionGenerationError(str(question.get("question_text", ""))[:200]
+                                          if isinstance(question, dict) else "payload bukan dict")
+        # Diingat supaya refill berikutnya tidak membuat soal yang sama
+        self.recent.setdefault((skill_id, level), deque(maxlen=POOL_RECENT_LIMIT)).append(_question_hash(question))
+        return question
+
+    # --- REFILL ---
+    @staticmethod
+    def _is_valid(question) -> bool:
+        return (
+            isinstance(question, dict)
+            and bool(question.get("question_text"))
+            and bool(question.get("grading_rubric"))
+        )
+
+    def _neediest_bucket(self) -> Optional[BucketKey]:
+        key, bucket = min(self.buckets.items(), key=lambda item: len(item[1]), default=(None, None))
+        if key is None or len(bucket) >= self.bucket_size:
+            return None
+        return key
+
+    async def refill_once(self) -> bool:
+        """Generate 1 soal untuk bucket yang paling kosong. Return False jika gagal."""
+        key = self._neediest_bucket()
+        if key is None:
+            return True
+        skill_id, level = key
+        # Bypass cache supaya soal baru benar-benar berbeda.
+        # Prioritas admission paling rendah: request user selalu didahulukan
+        with background_work():
+            question = await llm_engine.generate_question(self.topics[key], level, use_cache=False)
+        if not self._is_valid(question):
+            return False
+
+        q_hash = _question_hash(question)
+        stocked = {_question_hash(q) for q in self.buckets[key]}
+        if q_hash in stocked or q_hash in self.recent[key]:
+            self.stats["rejected"] += 1
+            return True
+
+        self.buckets[key].append(question)
+        self.recent[key].append(q_hash)
+        self.stats["generated"] += 1
+        self._dirty = True
+        return True
+
+    async def _run(self):
+        while True:
+            try:
+                if self._neediest_bucket() is None:
+                    self.save()
+                    # Semua bucket penuh: tunggu sampai ada soal yang diambil
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+                ok = await self.refill_once()
+                if self._dirty:
+                    self.save()
+                await asyncio.sleep(POOL_REFILL_INTERVAL if ok else POOL_ERROR_BACKOFF)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Question pool refill error: {e}")
+                await asyncio.sleep(POOL_ERROR_BACKOFF)
+
+    def start(self):
+        if not POOL_ENABLED or self._task is not None:
+            return
+        if not len(llm_engine.key_pool):
+            print("⚠️ Question pool tidak jalan: tidak ada API Key Groq.")
+            return
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        print(f"✅ Question pool aktif ({len(self.buckets)} bucket x {self.bucket_size} soal).")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.save()
+
+    # --- PERSISTENCE ---
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r') as f:
+                stored = json.load(f)
+        except Exception as e:
+            print(f"⚠️ Gagal membaca question pool: {e}")
+            return
+        loaded = 0
+        for item in stored.get("buckets", []):
+            key = (item["skill_id"], item["level"])
+            # Bucket yang sudah tidak ada di Sub_skill.json diabaikan
+            if key not in self.buckets:
+                continue
+            for question in item.get("questions", [])[:self.bucket_size]:
+                if self._is_valid(question):
+                    self.buckets[key].append(question)
+                    loaded += 1
+            self.recent[key].extend(item.get("recent", []))
+        print(f"✅ Question pool dimuat dari disk: {loaded} soal.")
+
+    def save(self):
+        if not self._dirty:
+            return
+        payload = {
+            "buckets": [
+                {
+                    "skill_id": skill_id,
+                    "level": level,
+                    "questions": list(self.buckets[(skill_id, level)]),
+                    "recent": list(self.recent[(skill_id, level)]),
+                }
+                for skill_id, level in self.buckets
+            ]
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(payload, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            print(f"⚠️ Gagal menyimpan question pool: {e}")
+
+    def snapshot(self) -> dict:
+        stocked = sum(len(b) for b in self.buckets.values())
+        empty = sum(1 for b in self.buckets.values() if not b)
+        return {
+            "running": self._task is not None,
+            "buckets": len(self.buckets),
+            "bucket_size": self.bucket_size,
+            "stocked": stocked,
+            "empty_buckets": empty,
+            **self.stats,
+        }
+
+
+# Instance global
+question_pool = QuestionPool()
@@ -0,0 +1,286 @@
+# app/services/rec_table.py
+"""
+Tabel rekomendasi yang dihitung di muka untuk setiap skill yang dikenal.
+
+Query /recommendations hampir selalu nama skill pendek ("SQL", "Python") yang ada di
+Skill Keywords.csv atau nama sub_skill di Sub_skill.json. Untuk setiap teks skill itu
+(lowercase, sama dengan input TF-IDF di endpoint) dan setiap level target (1-3) disimpan
+kandidat top-TOP_CANDIDATES yang sudah lolos MIN_MATCH_SCORE & level <= target, urut skor.
+Endpoint tinggal lookup + filter completed_courses; skill yang tidak dikenal tetap
+di-scoring live (hasil akhirnya identik).
+
+Tabel terikat pada satu bundle model (version). Bundle berganti (reload, ingest katalog)
+atau Sub_skill.json berubah -> tabel dibangun ulang di thread background; selama itu
+semua gap di-scoring live. Tabel untuk bundle dari disk disimpan ke cache (npz) supaya
+restart tidak perlu menghitung ulang.
+
+Build / cek offline:  python -m app.services.rec_table build|status
+"""
+import argparse
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.services.model_registry import ModelBundle, model_registry
+from app.services.retrieval_index import PAD_SCORE, SegmentedIndex, top_k
+from app.services.skill_manager import skill_manager
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+REC_TABLE_ENABLED = os.getenv("REC_TABLE_ENABLED", "1") == "1"
+CACHE_DIR = os.getenv("MORA_CACHE_DIR", os.path.join(os.path.dirname(__file__), "..", "..", "cache"))
+TABLE_PATH = os.getenv("REC_TABLE_PATH", os.path.join(CACHE_DIR, "rec_table.npz"))
+# Jumlah kandidat teratas per gap & batas minimal kemiripan teks (dipakai juga scoring live)
+TOP_CANDIDATES = 14
+MIN_MATCH_SCORE = 0.1
+LEVELS = (1, 2, 3)
+# Query per batch saat build (membatasi array skor brute force: batch x n_course)
+BUILD_CHUNK = 256
+
+
+class TableSnapshot(NamedTuple):
+    bundle_version: int
+    fingerprint: Optional[str]   # None = bundle hasil ingest (tidak disimpan ke disk)
+    keys: Dict[str, int]         # teks skill lowercase -> baris tabel
+    rows: np.ndarray             # int32 [n_key, 3, k] index baris katalog, -1 = kosong
+    scores: np.ndarray           # float64 [n_key, 3, k], PAD_SCORE = kosong
+    build_ms: float
+
+
+def collect_keys(bundle: ModelBundle) -> List[str]:
+    """Semua teks skill yang dikenal: keyword CSV + nama sub_skill, lowercase, tanpa duplikat."""
+    names = list(bundle.keywords)
+    names += [skill['name'] for role in skill_manager.data for skill in role['sub_skills']]
+    return list(dict.fromkeys(n.lower() for n in names if isinstance(n, str) and n.strip()))
+
+
+def table_fingerprint(bundle: ModelBundle, keys: Sequence[str]) -> Optional[str]:
+    if not bundle.fingerprint or isinstance(bundle.index, SegmentedIndex):
+        return None
+    raw = "|".join([bundle.fingerprint, str(TOP_CANDIDATES), repr(MIN_MATCH_SCORE), *keys])
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+
+def live_candidates(bundle: ModelBundle, texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Scoring TF-IDF live (jalur lama): top-k mentah per teks, belum difilter level."""
+    vecs = bundle.tfidf.transform(texts)
+    return top_k(bundle.index, vecs, bundle.matrix, TOP_CANDIDATES, MIN_MATCH_SCORE)
+
+
+class RecommendationTable:
+    def __init__(self, path: str = TABLE_PATH, enabled: bool = REC_TABLE_ENABLED):
+        self.path = path
+        self.enabled = enabled
+        self.table: Optional[TableSnapshot] = None
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._pending = False
+        self._running = False
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "builds": 0, "loaded_from_disk": 0, "last_error": None}
+
+    # --- BUILD ---
+    def build(self, bundle: ModelBundle) -> Optional[TableSnapshot]:
+        """Hitung tabel untuk bundle ini (atau muat dari disk jika fingerprint sama)."""
+        if bundle.catalog is None:
+            return None
+        started = time.perf_counter()
+        keys = collect_keys(bundle)
+        fingerprint = table_fingerprint(bundle, keys)
+        table = self._load(bundle, fingerprint)
+        if table is not None:
+            table = table._replace(build_ms=round((time.perf_counter() - started) * 1000, 1))
+            self.table = table
+            self.stats["loaded_from_disk"] += 1
+            return table
+
+        level_codes = np.asarray(bundle.catalog.level_codes)
+        row_chunks, score_chunks = [], []
+        for start in range(0, len(keys), BUILD_CHUNK):
+            top_idx, top_scores = live_candidates(bundle, keys[start:start + BUILD_CHUNK])
+            cand_lvls = level_codes[top_idx]
+            chunk_rows, chunk_scores = [], []
+            for level in LEVELS:
+                # Filter yang sama dengan endpoint, lalu kandidat yang lolos digeser ke depan (urutan tetap)
+                keep = (top_scores >= MIN_MATCH_SCORE) & (cand_lvls <= level)
+                order = np.argsort(~keep, axis=1, kind='stable')
+                kept = np.take_along_axis(keep, order, axis=1)
+                chunk_rows.append(np.where(kept, np.take_along_axis(top_idx, order, axis=1), -1))
+                chunk_scores.append(np.where(kept, np.take_along_axis(top_scores, order, axis=1), PAD_SCORE))
+            row_chunks.append(np.stack(chunk_rows, axis=1).astype(np.int32))
+            score_chunks.append(np.stack(chunk_scores, axis=1).astype(np.float64))
+        width = min(TOP_CANDIDATES, len(bundle.catalog))
+        rows = np.concatenate(row_chunks) if row_chunks else np.full((0, len(LEVELS), width), -1, dtype=np.int32)
+        scores = np.concatenate(score_chunks) if score_chunks else np.zeros((0, len(LEVELS), width))
+
+        table = TableSnapshot(
+            bundle_version=bundle.version, fingerprint=fingerprint,
+            keys={key: i for i, key in enumerate(keys)}, rows=rows, scores=scores,
+            build_ms=round((time.perf_counter() - started) * 1000, 1),
+        )
+        self.table = table
+        self.stats["builds"] += 1
+        self._save(table)
+        print(f"✅ Tabel rekomendasi: {len(keys)} skill x {len(LEVELS)} level "
+              f"({(rows.nbytes + scores.nbytes) / 1024:.0f} KB, {table.build_ms} ms, model v{bundle.version}).")
+        return table
+
+    def schedule(self, *_):
+        """Bangun ulang untuk bundle terbaru di thread background (perubahan beruntun digabung)."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending = True
+            if self._running:
+                return
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name="rec-table", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._pending:
+                    self._running = False
+                    return
+                self._pending = False
+            try:
+                self.build(model_registry.current)
+                self.stats["last_error"] = None
+            except Exception as e:
+                self.stats["last_error"] = str(e)
+                print(f"⚠️ Tabel rekomendasi gagal dibangun (scoring live tetap jalan): {e}")
+
+    def wait(self, timeout: Optional[float] = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    # --- LOOKUP ---
+    def candidates(self, bundle: ModelBundle, texts: List[str],
+                   target_levels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (top_idx, top_scores) per gap dengan bentuk sama seperti top_k. Gap yang dikenal diambil
+        dari tabel (sudah difilter skor & level), sisanya di-scoring live.
+        """
+        table = self.table
+        if table is None or table.bundle_version != bundle.version:
+            if table is not None:
+                self.stats["stale"] += len(texts)
+            return live_candidates(bundle, texts)
+
+        width = table.rows.shape[2]
+        top_idx = np.zeros((len(texts), width), dtype=np.int64)
+        top_scores = np.full((len(texts), width), PAD_SCORE, dtype=np.float64)
+        missing = []
+        for g, text in enumerate(texts):
+            key = table.keys.get(text)
+            if key is None:
+                missing.append(g)
+                continue
+            level = min(max(int(target_levels[g]), LEVELS[0]), LEVELS[-1]) - 1
+            rows = table.rows[key, level]
+            top_idx[g] = np.maximum(rows, 0)
+            top_scores[g] = table.scores[key, level]
+        self.stats["hits"] += len(texts) - len(missing)
+        self.stats["misses"] += len(missing)
+        if missing:
+            live_idx, live_scores = live_candidates(bundle, [texts[g] for g in missing])
+            top_idx[missing, :live_idx.shape[1]] = live_idx
+            top_scores[missing, :live_scores.shape[1]] = live_scores
+        return top_idx, top_scores
+
+    def candidates_each(self, bundle: ModelBundle, texts: List[str],
+                        target_levels: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Fallback jika candidates() untuk satu batch gagal: scoring per gap, gap yang error dilewati
+        (baris berisi PAD_SCORE sehingga tersaring di endpoint), gap lain tetap direkomendasikan.
+        """
+        rows = []
+        for g, text in enumerate(texts):
+            try:
+                top_idx, top_scores = self.candidates(bundle, [text], target_levels[g:g + 1])
+                rows.append((top_idx[0], top_scores[0]))
+            except Exception as e:
+                print(f"Error scoring skill '{text}': {e}")
+                rows.append(None)
+        width = max((len(r[0]) for r in rows if r is not None), default=0)
+        top_idx = np.zeros((len(texts), width), dtype=np.int64)
+        top_scores = np.full((len(texts), width), PAD_SCORE, dtype=np.float64)
+        for g, row in enumerate(rows):
+            if row is not None:
+                top_idx[g, :len(row[0])], top_scores[g, :len(row[1])] = row
+        return top_idx, top_scores
+
+    # --- PERSISTENCE ---
+    def _load(self, bundle: ModelBundle, fingerprint: Optional[str]) -> Optional[TableSnapshot]:
+        if fingerprint is None or not os.path.exists(self.path):
+            return None
+        try:
+            with np.load(self.path) as stored:
+                if str(stored["fingerprint"]) != fingerprint:
+                    return None
+                keys = [str(k) for k in stored["keys"]]
+                rows, scores = stored["rows"], stored["scores"]
+        except Exception as e:
+            print(f"⚠️ Gagal membaca tabel rekomendasi: {e}")
+            return None
+        if int(rows.max(initial=-1)) >= len(bundle.catalog):
+            return None
+        print(f"✅ Tabel rekomendasi dimuat dari disk: {len(keys)} skill.")
+        return TableSnapshot(bundle.version, fingerprint, {key: i for i, key in enumerate(keys)}, rows, scores, 0.0)
+
+    def _save(self, table: TableSnapshot):
+        if table.fingerprint is None:
+            return
+        keys = sorted(table.keys, key=table.keys.get)
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            tmp_path = self.path + ".tmp.npz"
+            np.savez(tmp_path, fingerprint=np.array(table.fingerprint), keys=np.array(keys),
+                     rows=table.rows, scores=table.scores)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"⚠️ Gagal menyimpan tabel rekomendasi: {e}")
+
+    def snapshot(self) -> dict:
+        table = self.table
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            "enabled": self.enabled,
+            "skills": len(table.keys) if table else 0,
+            "model_version": table.bundle_version if table else None,
+            "fresh": table is not None and table.bundle_version == model_registry.current.version,
+            "bytes": table.rows.nbytes + table.scores.nbytes if table else 0,
+            "build_ms": table.build_ms if table else None,
+            "building": self._running,
+            "hit_ratio": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+            **self.stats,
+        }
+
+
+# Instance global
+rec_table = RecommendationTable()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tabel rekomendasi precomputed per (skill, level).")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Hitung tabel untuk model di disk lalu simpan ke cache")
+    sub.add_parser("status", help="Muat tabel dari cache (jika cocok) dan tampilkan ringkasannya")
+    args = parser.parse_args()
+
+    bundle = model_registry.load()
+    if args.command == "build" and os.path.exists(rec_table.path):
+        os.remove(rec_table.path)
+    table = rec_table.build(bundle)
+    if table is None:
+        raise SystemExit("❌ Model rekomendasi tidak bisa dimuat.")
+    print(f"✅ {len(table.keys)} skill, {(table.rows.nbytes + table.scores.nbytes) / 1024:.0f} KB, "
+          f"fingerprint {table.fingerprint}, build {table.build_ms} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+# app/services/retrieval_index.py
+"""
+Top-k retrieval atas TF-IDF matrix tanpa menghitung skor untuk seluruh katalog.
+
+Brute force (jalur lama): skor = vecs @ matrix.T -> array padat gaps x n_course, lalu
+argpartition. Biayanya O(n_course) per gap, berapa pun jumlah course yang relevan.
+
+RetrievalIndex: inverted index per term (posting list urut course, plus salinan urut bobot
+= "impact order") dan bobot maksimum per term. Pencarian memakai MaxScore:
+1. Ambang awal theta: skor penuh k course teratas dari term dengan batas atas terbesar
+   (skor course ke-k dari himpunan ini <= skor ke-k sebenarnya), minimal min_score.
+2. Term diurutkan menurut batas atas (bobot query x bobot maksimum term). Term yang jumlah
+   batas atasnya < theta adalah "non-essential": course yang hanya muncul di term-term itu
+   pasti skornya < theta, jadi tidak mungkin masuk top-k.
+3. Kandidat = gabungan posting term essential; skornya dihitung lengkap (term non-essential
+   dicari dengan searchsorted di posting list).
+Query satu term (kasus paling umum, misal "python") langsung diambil dari impact order.
+Query yang total posting-nya pendek (<= EXHAUSTIVE_POSTINGS) langsung diakumulasi penuh.
+
+Hasil sama dengan brute force: urutan skor turun, seri dipecah dengan index baris terkecil.
+Course dengan skor < min_score tidak dikembalikan (di endpoint memang dibuang oleh filter).
+"""
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# "index" = inverted index (default), "brute" = skor semua course seperti dulu
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "index")
+# Total panjang posting query di bawah ini dihitung penuh tanpa MaxScore
+EXHAUSTIVE_POSTINGS = int(os.getenv("RETRIEVAL_EXHAUSTIVE_POSTINGS", "512"))
+
+# Slack pembulatan float saat membandingkan jumlah batas atas dengan theta
+_EPS = 1e-9
+# Skor isian untuk slot kosong (< MIN_MATCH_SCORE berapa pun, jadi selalu ikut tersaring)
+PAD_SCORE = -1.0
+
+
+def _rank(rows: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """k teratas: skor turun, seri -> index baris terkecil. Hanya kandidat (bukan seluruh katalog) yang diurutkan."""
+    if len(rows) > k:
+        kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+        # Semua yang seri dengan skor ke-k ikut dipertimbangkan supaya pemecah seri deterministik
+        mask = scores >= kth
+        rows, scores = rows[mask], scores[mask]
+    order = np.lexsort((rows, -scores))[:k]
+    return rows[order], scores[order]
+
+
+def brute_force_top_k(vecs, matrix, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Jalur lama: skor semua course lalu ambil k teratas per gap.
+    Return (top_idx, top_scores) berbentuk gaps x min(k, n_course), urut skor turun.
+    """
+    scores = (vecs @ matrix.T).toarray()
+    n_docs = scores.shape[1]
+    k = min(k, n_docs)
+    rows = np.arange(n_docs)
+    top_idx = np.zeros((scores.shape[0], k), dtype=np.int64)
+    top_scores = np.zeros((scores.shape[0], k), dtype=scores.dtype)
+    for g, row_scores in enumerate(scores):
+        top_idx[g], top_scores[g] = _rank(rows, row_scores, k)
+    return top_idx, top_scores
+
+
+class RetrievalIndex:
+    """Inverted index read-only atas TF-IDF matrix (baris = course, kolom = term)."""
+    __slots__ = ('n_docs', 'n_terms', 'ptr', 'docs', 'weights', 'impact_docs', 'impact_weights', 'term_max')
+
+    def __init__(self, matrix):
+        csc = matrix.tocsc()
+        csc.sort_indices()
+        self.n_docs, self.n_terms = csc.shape
+        self.ptr = csc.indptr.astype(np.int64)
+        # Posting per term urut index course (untuk searchsorted)
+        self.docs = csc.indices.astype(np.int32)
+        self.weights = csc.data.astype(np.float64)
+        # Posting yang sama urut bobot turun (seri -> course terkecil) untuk ambil top-k satu term
+        term_of = np.repeat(np.arange(self.n_terms), np.diff(self.ptr))
+        order = np.lexsort((self.docs, -self.weights, term_of))
+        self.impact_docs = self.docs[order]
+        self.impact_weights = self.weights[order]
+        self.term_max = np.zeros(self.n_terms, dtype=np.float64)
+        nonempty = np.flatnonzero(np.diff(self.ptr))
+        self.term_max[nonempty] = self.impact_weights[self.ptr[nonempty]]
+
+    def __len__(self):
+        return self.n_docs
+
+    def memory_bytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in
+                   ('ptr', 'docs', 'weights', 'impact_docs', 'impact_weights', 'term_max'))
+
+    def info(self) -> dict:
+        return {"mode": "index", "index_bytes": self.memory_bytes()}
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = self.ptr[term], self.ptr[term + 1]
+        return self.docs[start:end], self.weights[start:end]
+
+    def _score(self, rows: np.ndarray, terms: np.ndarray, qweights: np.ndarray) -> np.ndarray:
+        """Skor lengkap untuk course `rows` (urut naik)."""
+        scores = np.zeros(len(rows), dtype=np.float64)
+        for term, qw in zip(terms, qweights):
+            docs, weights = self._postings(term)
+            pos = np.searchsorted(docs, rows)
+            pos_clipped = np.minimum(pos, len(docs) - 1)
+            hit = (pos < len(docs)) & (docs[pos_clipped] == rows)
+            scores[hit] += qw * weights[pos_clipped[hit]]
+        return scores
+
+    def search(self, terms: np.ndarray, qweights: np.ndarray, k: int,
+               min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (rows, scores) untuk satu query sparse (index term + bobot), skor >= min_score."""
+        empty = (np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64))
+        valid = (terms < self.n_terms) & (qweights > 0)
+        terms, qweights = terms[valid], qweights[valid]
+        upper = qweights * self.term_max[terms]
+        if k <= 0 or not len(terms) or upper.sum() + _EPS < min_score:
+            return empty
+
+        if len(terms) == 1:
+            start = self.ptr[terms[0]]
+            n = min(k, self.ptr[terms[0] + 1] - start)
+            rows = self.impact_docs[start:start + n].astype(np.int64)
+            scores = self.impact_weights[start:start + n] * qweights[0]
+            keep = scores >= min_score
+            return rows[keep], scores[keep]
+
+        lengths = self.ptr[terms + 1] - self.ptr[terms]
+        if lengths.sum() <= EXHAUSTIVE_POSTINGS:
+            # Posting pendek: akumulasi semua langsung lebih murah daripada pruning
+            postings = [self._postings(t) for t in terms]
+            rows, inverse = np.unique(np.concatenate([docs for docs, _ in postings]), return_inverse=True)
+            contrib = np.concatenate([qw * weights for (_, weights), qw in zip(postings, qweights)])
+            scores = np.bincount(inverse, weights=contrib, minlength=len(rows))
+            keep = scores >= min_score
+            return _rank(rows[keep].astype(np.int64), scores[keep], k)
+
+        # 1. Ambang awal dari k course teratas term dengan batas atas terbesar
+        best = int(np.argmax(upper))
+        start = self.ptr[terms[best]]
+        seed = np.sort(self.impact_docs[start:start + min(k, self.ptr[terms[best] + 1] - start)])
+        theta = min_score
+        if len(seed) >= k:
+            theta = max(theta, np.sort(self._score(seed, terms, qweights))[-k])
+
+        # 2. MaxScore: term non-essential = prefix (batas atas terkecil) yang jumlahnya < theta
+        ascending = np.argsort(upper, kind='stable')
+        prefix = np.cumsum(upper[ascending])
+        n_non_essential = int(np.searchsorted(prefix + _EPS, theta, side='left'))
+        essential = terms[ascending[n_non_essential:]]
+
+        # 3. Kandidat = gabungan posting term essential, skor dihitung lengkap
+        rows = np.unique(np.concatenate([self._postings(t)[0] for t in essential]))
+        scores = self._score(rows, terms, qweights)
+        keep = scores >= min_score
+        rows, scores = _rank(rows[keep].astype(np.int64), scores[keep], k)
+        return rows, scores
+
+    def search_many(self, vecs, k: int, min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k untuk setiap baris `vecs` (CSR, hasil tfidf.transform). Bentuk keluaran sama dengan
+        brute_force_top_k; slot kosong diisi baris 0 dengan skor PAD_SCORE.
+        """
+        vecs = vecs.tocsr()
+        k = min(k, self.n_docs)
+        top_idx = np.zeros((vecs.shape[0], k), dtype=np.int64)
+        top_scores = np.full((vecs.shape[0], k), PAD_SCORE, dtype=np.float64)
+        for g in range(vecs.shape[0]):
+            start, end = vecs.indptr[g], vecs.indptr[g + 1]
+            rows, scores = self.search(vecs.indices[start:end], vecs.data[start:end], k, min_score)
+            top_idx[g, :len(rows)] = rows
+            top_scores[g, :len(rows)] = scores
+        return top_idx, top_scores
+
+
+class SegmentedIndex:
+    """
+    Index basis + segmen delta hasil ingest katalog (lihat catalog_ingest).
+    Baris 0..n_base-1 = basis, baris n_base.. = delta. Baris basis yang dihapus / diganti
+    versi baru (tombstone) tidak pernah dikembalikan. Delta kecil, jadi di-scan brute force.
+    """
+    __slots__ = ('base', 'base_matrix', 'n_base', 'tombstones', 'n_dead', 'delta_matrix', 'n_delta', 'n_docs')
+
+    def __init__(self, base: Optional[RetrievalIndex], base_matrix, tombstones: np.ndarray, delta_matrix):
+        self.base = base                    # None = basis di-scan brute force (RETRIEVAL_MODE=brute)
+        self.base_matrix = base_matrix
+        self.n_base = base_matrix.shape[0]
+        self.tombstones = tombstones        # bool[n_base]
+        self.n_dead = int(tombstones.sum())
+        self.delta_matrix = delta_matrix    # CSR n_delta x n_term (boleh None)
+        self.n_delta = 0 if delta_matrix is None else delta_matrix.shape[0]
+        self.n_docs = self.n_base + self.n_delta
+
+    def info(self) -> dict:
+        base = self.base.info() if self.base is not None else {"mode": "brute"}
+        return {**base, "delta_rows": self.n_delta, "tombstones": self.n_dead}
+
+    def search_many(self, vecs, k: int, min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Sama dengan RetrievalIndex.search_many, atas gabungan basis (tanpa tombstone) + delta."""
+        k = min(k, self.n_docs)
+        # Minta lebih banyak dari basis supaya tetap ada k baris hidup setelah tombstone dibuang
+        base_idx, base_scores = top_k(self.base, vecs, self.base_matrix, min(k + self.n_dead, self.n_base), min_score)
+        base_scores = np.where(self.tombstones[base_idx], PAD_SCORE, base_scores)
+        rows, scores = base_idx, base_scores
+        if self.n_delta:
+            delta_idx, delta_scores = brute_force_top_k(vecs, self.delta_matrix, k)
+            rows = np.hstack([rows, delta_idx + self.n_base])
+            scores = np.hstack([scores, delta_scores])
+
+        top_idx = np.zeros((rows.shape[0], k), dtype=np.int64)
+        top_scores = np.full((rows.shape[0], k), PAD_SCORE, dtype=np.float64)
+        for g in range(rows.shape[0]):
+            live = scores[g] > PAD_SCORE
+            ranked_rows, ranked_scores = _rank(rows[g][live], scores[g][live], k)
+            top_idx[g, :len(ranked_rows)] = ranked_rows
+            top_scores[g, :len(ranked_rows)] = ranked_scores
+        return top_idx, top_scores
+
+
+def build_index(matrix, mode: str = RETRIEVAL_MODE):
+    """Bangun index kecuali RETRIEVAL_MODE=brute (None = endpoint pakai brute force)."""
+    if matrix is None or mode == "brute":
+        return None
+    return RetrievalIndex(matrix)
+
+
+def top_k(index, vecs, matrix, k: int, min_score: float = 0.0) -> Tuple[np.ndarray, np.ndarray]:
+    """Pintu masuk dari endpoint: index jika ada, selain itu brute force."""
+    if index is not None:
+        return index.search_many(vecs, k, min_score)
+    return brute_force_top_k(vecs, matrix, k)
+
+
+def recall_at_k(expected: List[np.ndarray], actual: List[np.ndarray]) -> float:
+    """Rata-rata |hasil index ∩ hasil brute force| / |hasil brute force| per query."""
+    ratios = [len(set(a.tolist()) & set(e.tolist())) / len(e) for e, a in zip(expected, actual) if len(e)]
+    return float(np.mean(ratios)) if ratios else 1.0
@@ -0,0 +1,75 @@
+# app/services/singleflight.py
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict
+
+# --- KONFIGURASI (bisa diubah lewat .env) ---
+# Method LLMEngine yang boleh digabung jika prompt-nya identik & sedang berjalan bersamaan.
+# generate_question sengaja tidak ikut: soal yang dibuat bersamaan sebaiknya berbeda.
+# Override lewat env, contoh: LLM_COALESCE_METHODS=process_user_intent,casual_chat (kosong = mati)
+DEFAULT_COALESCE_METHODS = {
+    "process_user_intent",
+    "casual_chat",
+    "evaluate_answer",
+    "analyze_psych_result",
+    "analyze_progress",
+}
+
+
+def coalesce_methods() -> set:
+    env_value = os.getenv("LLM_COALESCE_METHODS")
+    if env_value is None:
+        return set(DEFAULT_COALESCE_METHODS)
+    return {m.strip() for m in env_value.split(",") if m.strip()}
+
+
+class SingleFlight:
+    """
+    Menggabungkan call LLM identik yang sedang berjalan bersamaan (singleflight).
+    Call pertama (leader) benar-benar dikirim ke Groq; call lain dengan key yang sama
+    menunggu hasil (atau error) yang sama, tanpa request upstream tambahan.
+    """
+
+    def __init__(self, methods=None):
+        self.methods = coalesce_methods() if methods is None else set(methods)
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def enabled(self, method) -> bool:
+        return method in self.methods
+
+    def _count(self, method: str, field: str):
+        bucket = self.stats.setdefault(method, {"leaders": 0, "coalesced": 0})
+        bucket[field] += 1
+
+    async def do(self, method: str, key: str, factory: Callable[[], Awaitable]):
+        task = self._inflight.get(key)
+        if task is None:
+            self._count(method, "leaders")
+            # Dijalankan sebagai task: jika request leader dibatalkan (user disconnect),
+            # call upstream tetap selesai untuk request lain yang ikut menunggu
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, k=key: self._finish(k, t))
+        else:
+            self._count(method, "coalesced")
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Hindari warning "exception was never retrieved" jika semua penunggu sudah batal
+        if not task.cancelled():
+            task.exception()
+
+    def snapshot(self) -> dict:
+        leaders = sum(b["leaders"] for b in self.stats.values())
+        coalesced = sum(b["coalesced"] for b in self.stats.values())
+        return {
+            "methods": sorted(self.methods),
+            "inflight": len(self._inflight),
+            "leaders": leaders,
+            "coalesced": coalesced,
+            "coalesce_rate": round(coalesced / (leaders + coalesced), 3) if leaders + coalesced else 0.0,
+            "per_method": self.stats,
+        }
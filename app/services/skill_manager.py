@@ -1,34 +1,253 @@
-import json
-import os
-
-# Lokasi file JSON
-JSON_PATH = os.path.join(os.path.dirname(__file__), "../data/Sub_skill.json")
-
-class SkillManager:
-    def __init__(self):
-        self.data = self._load_data()
-
-    def _load_data(self):
-        with open(JSON_PATH, 'r') as f:
-            return json.load(f)
-
-    def get_role_data(self, role_name: str):
-        """Mengambil data skill berdasarkan role (AI Engineer / Web Dev)"""
-        for role in self.data:
-            if role['role_name'].lower() == role_name.lower():
-                return role
-        return None
-
-    def get_skill_details(self, role_name: str, skill_id: str):
-        """Mengambil detail satu skill spesifik"""
-        role_data = self.get_role_data(role_name)
-        if not role_data:
-            return None
-        
-        for skill in role_data['sub_skills']:
-            if skill['id'] == skill_id:
-                return skill
-        return None
-
-# Instance global
-skill_manager = SkillManager()
\ No newline at end of file
+import asyncio
+import json
+import os
+import re
+import threading
+from collections import defaultdict
+
+# Lokasi file JSON
+JSON_PATH = os.path.join(os.path.dirname(__file__), "../data/Sub_skill.json")
+# Seberapa sering (detik) watcher di background cek apakah Sub_skill.json berubah di disk (0 = mati)
+RELOAD_CHECK_INTERVAL = float(os.getenv("SKILL_RELOAD_CHECK_INTERVAL", "5"))
+# Skor minimal (Dice coefficient trigram) agar sebutan skill dianggap cocok
+FUZZY_MIN_SCORE = float(os.getenv("SKILL_FUZZY_MIN_SCORE", "0.45"))
+NGRAM_SIZE = 3
+
+# Kata umum di nama sub_skill yang tidak boleh dipakai sendirian untuk mapping skill.
+# Hanya menyaring alias satu kata; frasa ("machine learning") tetap jadi alias.
+GENERIC_SKILL_WORDS = {
+    "for", "and", "the", "data", "science", "core", "logic", "fundamentals", "analysis",
+    "systems", "system", "web", "architecture", "optimization", "automation", "deployment",
+    "manipulation", "interactivity", "learning", "machine", "series", "time", "language",
+    "natural", "processing", "computer", "performance", "components", "testing",
+}
+
+
+_CONNECTORS = {"for", "and", "the", "of"}
+
+
+def _ngrams(text: str):
+    padded = f"  {' '.join(text.lower().split())} "
+    return {padded[i:i + NGRAM_SIZE] for i in range(len(padded) - NGRAM_SIZE + 1)}
+
+
+def _skill_aliases(skill: dict):
+    """Nama lain sebuah sub_skill: nama lengkap, tanpa kurung, singkatan, id, kata khas, potongan frasa."""
+    name = skill['name']
+    aliases = {name.lower(), skill['id'].replace('_', ' ')}
+    # "Natural Language Processing (NLP)" -> "natural language processing", "nlp"
+    for part in re.findall(r"\(([^)]+)\)", name):
+        aliases.add(part.lower())
+    aliases.add(re.sub(r"\s*\([^)]*\)", "", name).lower())
+    for word in re.findall(r"[a-z0-9+#]+", name.lower()):
+        if len(word) >= 2 and word not in GENERIC_SKILL_WORDS:
+            aliases.add(word)
+    words = re.findall(r"[a-z0-9+#]+", re.sub(r"\s*\([^)]*\)", "", name).lower())
+    # Potongan frasa nama: "machine learning", "time series", "natural language" (tanpa kata sambung di ujung)
+    for size in range(2, len(words)):
+        for start in range(len(words) - size + 1):
+            phrase = words[start:start + size]
+            if phrase[0] not in _CONNECTORS and phrase[-1] not in _CONNECTORS:
+                aliases.add(" ".join(phrase))
+    return aliases
+
+
+class SkillResolver:
+    """
+    Index n-gram karakter untuk semua sub_skill dalam satu role.
+    Dipakai untuk memetakan sebutan skill bebas ("python", "Computer Vison", "NLP")
+    ke id sub_skill beserta skornya.
+    """
+
+    def __init__(self, sub_skills: list):
+        self.skills = sub_skills
+        self.aliases = []                      # [(alias, index skill, jumlah n-gram)]
+        self.index = defaultdict(list)         # n-gram -> [index alias]
+        self.patterns = []                     # [(regex alias, index skill)] untuk cari di kalimat
+        for skill_idx, skill in enumerate(sub_skills):
+            for alias in _skill_aliases(skill):
+                grams = _ngrams(alias)
+                alias_idx = len(self.aliases)
+                self.aliases.append((alias, skill_idx, len(grams)))
+                for gram in grams:
+                    self.index[gram].append(alias_idx)
+                self.patterns.append(
+                    (re.compile(r"(?<![a-z0-9])" + re.escape(alias) + r"(?![a-z0-9])"), skill_idx)
+                )
+
+    def score(self, mention: str):
+        """Skor tiap sub_skill untuk satu sebutan: {index skill: skor 0-1}."""
+        mention_lower = mention.lower().strip()
+        if not mention_lower:
+            return {}
+        scores = {}
+        # Aturan lama: nama skill ada di sebutan (atau sebaliknya) = cocok penuh
+        for skill_idx, skill in enumerate(self.skills):
+            name = skill['name'].lower()
+            if name in mention_lower or mention_lower in name:
+                scores[skill_idx] = 1.0
+
+        grams = _ngrams(mention_lower)
+        overlap = defaultdict(int)
+        for gram in grams:
+            for alias_idx in self.index.get(gram, ()):
+                overlap[alias_idx] += 1
+        for alias_idx, shared in overlap.items():
+            _, skill_idx, alias_size = self.aliases[alias_idx]
+            dice = 2.0 * shared / (len(grams) + alias_size)
+            if dice > scores.get(skill_idx, 0.0):
+                scores[skill_idx] = dice
+        return scores
+
+    def resolve(self, mentions, min_score: float = FUZZY_MIN_SCORE):
+        """List sebutan skill -> list (id sub_skill, skor) tanpa duplikat, urut sesuai sebutan."""
+        resolved = {}
+        for mention in mentions:
+            scores = self.score(mention)
+            if not scores:
+                continue
+            exact = [idx for idx, sc in scores.items() if sc >= 1.0]
+            if exact:
+                picked = [(idx, 1.0) for idx in exact]
+            else:
+                best = max(scores, key=scores.get)
+                picked = [(best, scores[best])] if scores[best] >= min_score else []
+            for idx, sc in picked:
+                skill_id = self.skills[idx]['id']
+                if skill_id not in resolved:
+                    resolved[skill_id] = round(sc, 3)
+        return list(resolved.items())
+
+    def find_in_text(self, text: str):
+        """Sub_skill yang disebut di dalam sebuah kalimat (alias utuh), urut sesuai data."""
+        text = " ".join(text.lower().split())
+        found = []
+        for pattern, skill_idx in self.patterns:
+            if skill_idx not in found and pattern.search(text):
+                found.append(skill_idx)
+        return [self.skills[idx] for idx in sorted(found)]
+
+    def strip_mentions(self, text: str) -> str:
+        """Kalimat tanpa semua sebutan skill (alias terpanjang dulu): sisa kata yang belum terpetakan."""
+        text = " ".join(text.lower().split())
+        for pattern, _ in sorted(self.patterns, key=lambda item: -len(item[0].pattern)):
+            text = pattern.sub(" ", text)
+        return " ".join(text.split())
+
+
+class _SkillIndex:
+    """Snapshot data + index (diganti utuh saat reload, tidak pernah diubah sebagian)."""
+
+    def __init__(self, data: list, mtime: float):
+        self.data = data
+        self.mtime = mtime
+        self.roles = {role['role_name'].lower(): role for role in data}
+        self.skills = {
+            (role['role_name'].lower(), skill['id']): skill
+            for role in data for skill in role['sub_skills']
+        }
+        self.resolvers = {name: SkillResolver(role['sub_skills']) for name, role in self.roles.items()}
+
+
+class SkillManager:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._task = None
+        self._index = self._build_index()
+
+    def _load_data(self):
+        with open(JSON_PATH, 'r') as f:
+            return json.load(f)
+
+    def _build_index(self):
+        mtime = os.path.getmtime(JSON_PATH)
+        return _SkillIndex(self._load_data(), mtime)
+
+    @property
+    def data(self):
+        return self._index.data
+
+    # --- RELOAD ---
+    def on_reload(self, callback):
+        """Daftarkan fungsi yang dipanggil setiap Sub_skill.json berhasil di-reload."""
+        self._listeners.append(callback)
+
+    def reload(self, force: bool = False) -> bool:
+        """Bangun ulang index jika Sub_skill.json berubah. Return True jika ada reload."""
+        with self._lock:
+            try:
+                if not force and os.path.getmtime(JSON_PATH) == self._index.mtime:
+                    return False
+                new_index = self._build_index()
+            except Exception as e:
+                # JSON rusak / sedang ditulis: tetap pakai index lama
+                print(f"⚠️ Gagal reload Sub_skill.json: {e}")
+                return False
+            self._index = new_index
+        print(f"🔄 Sub_skill.json di-reload ({len(new_index.skills)} sub skill).")
+        for callback in self._listeners:
+            try:
+                callback()
+            except Exception as e:
+                print(f"⚠️ Listener reload skill error: {e}")
+        return True
+
+    # --- WATCHER (di luar jalur request) ---
+    async def _watch(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                # Dijalankan di event loop: listener (question pool, rec table) sama seperti reload manual
+                self.reload()
+            except Exception as e:
+                print(f"⚠️ Skill watcher error: {e}")
+
+    def start_watcher(self, interval: float = RELOAD_CHECK_INTERVAL):
+        if interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._watch(interval))
+        print(f"✅ Skill watcher aktif (cek Sub_skill.json tiap {interval:g} detik).")
+
+    async def stop_watcher(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # --- LOOKUP (O(1)) ---
+    def get_role_data(self, role_name: str):
+        """Mengambil data skill berdasarkan role (AI Engineer / Web Dev)"""
+        return self._index.roles.get((role_name or "").lower())
+
+    def get_skill_details(self, role_name: str, skill_id: str):
+        """Mengambil detail satu skill spesifik"""
+        return self._index.skills.get(((role_name or "").lower(), skill_id))
+
+    # --- RESOLVER ---
+    def resolve_skill_ids(self, role_name: str, mentions) -> list:
+        """Petakan sebutan skill bebas (hasil router) ke list id sub_skill di role tersebut."""
+        resolver = self._index.resolvers.get((role_name or "").lower())
+        if resolver is None:
+            return []
+        return [skill_id for skill_id, _ in resolver.resolve(mentions)]
+
+    def find_skills_in_text(self, role_name: str, text: str) -> list:
+        """Cari sub_skill (dict) yang disebut langsung di pesan user."""
+        resolver = self._index.resolvers.get((role_name or "").lower())
+        if resolver is None:
+            return []
+        return resolver.find_in_text(text)
+
+    def unmapped_text(self, role_name: str, text: str) -> str:
+        """Sisa pesan user setelah semua sebutan sub_skill di role tersebut dibuang."""
+        resolver = self._index.resolvers.get((role_name or "").lower())
+        if resolver is None:
+            return " ".join(text.lower().split())
+        return resolver.strip_mentions(text)
+
+# Instance global
+skill_manager = SkillManager()
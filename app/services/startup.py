@@ -0,0 +1,75 @@
+# app/services/startup.py
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+# Status subsystem
+PENDING, LOADING, READY, FAILED, SKIPPED = "pending", "loading", "ready", "failed", "skipped"
+
+
+class StartupTracker:
+    """
+    Mencatat status & lama tiap fase startup (import, model, keyword, intent router, ...).
+    Dipakai oleh /healthz & /readyz dan untuk log breakdown waktu cold start.
+    """
+
+    def __init__(self):
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.subsystems: Dict[str, dict] = {}
+        self.ready_at_ms: Optional[float] = None
+
+    def register(self, name: str, required: bool = True):
+        """required=True: /readyz baru 200 setelah subsystem ini READY."""
+        self.subsystems.setdefault(name, {"status": PENDING, "required": required, "ms": None, "error": None})
+
+    def record(self, name: str, status: str, ms: Optional[float] = None, error: Optional[str] = None):
+        self.register(name, required=False)
+        item = self.subsystems[name]
+        item["status"] = status
+        if ms is not None:
+            item["ms"] = round(ms, 1)
+        item["error"] = error
+        self._check_ready()
+
+    @contextmanager
+    def phase(self, name: str):
+        """Ukur satu fase. Exception ditandai FAILED lalu diteruskan ke pemanggil."""
+        self.record(name, LOADING)
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.record(name, FAILED, (time.perf_counter() - started) * 1000, str(e))
+            raise
+        self.record(name, READY, (time.perf_counter() - started) * 1000)
+
+    def _check_ready(self):
+        if self.ready_at_ms is None and self.ready:
+            self.ready_at_ms = round((time.perf_counter() - self._t0) * 1000, 1)
+
+    @property
+    def ready(self) -> bool:
+        required = [item for item in self.subsystems.values() if item["required"]]
+        return bool(required) and all(item["status"] == READY for item in required)
+
+    def loading(self, name: str) -> bool:
+        """True jika subsystem belum selesai di-load (belum READY / FAILED)."""
+        item = self.subsystems.get(name)
+        return item is not None and item["status"] in (PENDING, LOADING)
+
+    def breakdown(self) -> str:
+        parts = [f"{name} {item['ms']} ms" for name, item in self.subsystems.items() if item["ms"] is not None]
+        return " | ".join(parts)
+
+    def snapshot(self) -> dict:
+        return {
+            "ready": self.ready,
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "ready_after_ms": self.ready_at_ms,
+            "subsystems": self.subsystems,
+        }
+
+
+# Instance global
+startup_tracker = StartupTracker()
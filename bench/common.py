@@ -0,0 +1,105 @@
+# bench/common.py
+"""Helper bersama benchmark: persentil, simpan/baca baseline, deteksi regresi."""
+import json
+import os
+import platform
+import time
+from typing import Dict, List, Optional
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+# Toleransi sebelum dianggap regresi (benchmark di mesin yang sama tetap punya noise).
+# Load test jauh lebih berisik (latency acak fake Groq + scheduling antar proses) -> lebih longgar.
+TOLERANCES = {
+    "micro": (float(os.getenv("BENCH_LATENCY_TOLERANCE", "0.25")), float(os.getenv("BENCH_THROUGHPUT_TOLERANCE", "0.2"))),
+    "load": (float(os.getenv("BENCH_LOAD_LATENCY_TOLERANCE", "0.6")), float(os.getenv("BENCH_LOAD_THROUGHPUT_TOLERANCE", "0.35"))),
+}
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def summarize_ms(samples: List[float]) -> Dict[str, Optional[float]]:
+    """samples dalam detik -> ringkasan dalam ms."""
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+    return {
+        "p50_ms": ms(percentile(samples, 0.5)),
+        "p95_ms": ms(percentile(samples, 0.95)),
+        "p99_ms": ms(percentile(samples, 0.99)),
+        "max_ms": ms(max(samples) if samples else None),
+    }
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "cpus": os.cpu_count(), "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S")}
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_section(section: str, results: dict, path: str = BASELINE_PATH):
+    """Tulis satu bagian ("micro" / "load") ke file baseline, bagian lain tidak diubah."""
+    baseline = load_baseline(path)
+    baseline[section] = {"environment": environment(), "results": results}
+    with open(path, "w") as f:
+        json.dump(baseline, f, indent=2, ensure_ascii=False)
+        f.write("\n")
+
+
+def write_results(name: str, results: dict) -> str:
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2, ensure_ascii=False)
+    return path
+
+
+def compare(section: str, results: Dict[str, dict], path: str = BASELINE_PATH) -> List[str]:
+    """
+    Bandingkan hasil dengan baseline. Metric *_ms: regresi jika naik melebihi toleransi latency;
+    metric throughput_rps: regresi jika turun melebihi toleransi throughput (lihat TOLERANCES).
+    """
+    latency_tolerance, throughput_tolerance = TOLERANCES.get(section, TOLERANCES["micro"])
+    base = load_baseline(path).get(section, {}).get("results", {})
+    regressions = []
+    for name, current in results.items():
+        previous = base.get(name)
+        if not previous:
+            continue
+        for metric, value in current.items():
+            old = previous.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            if metric.endswith("_ms") and metric.startswith(("p50", "p95", "median", "mean")) \
+                    and value > old * (1 + latency_tolerance):
+                regressions.append(f"{name}.{metric}: {old} -> {value} (+{(value / old - 1) * 100:.0f}%)")
+            elif metric == "throughput_rps" and value < old * (1 - throughput_tolerance):
+                regressions.append(f"{name}.{metric}: {old} -> {value} ({(value / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def report_regressions(section: str, results: Dict[str, dict]) -> int:
+    regressions = compare(section, results)
+    if not load_baseline().get(section):
+        print(f"⚠️ Belum ada baseline '{section}' (jalankan dengan --save-baseline).")
+        return 0
+    if regressions:
+        print(f"❌ {len(regressions)} regresi dibanding baseline:")
+        for line in regressions:
+            print(f"   - {line}")
+        return 1
+    print("✅ Tidak ada regresi dibanding baseline.")
+    return 0
@@ -0,0 +1,255 @@
+# bench/fake_groq.py
+"""
+Pengganti lokal API chat completions Groq untuk benchmark (tanpa memakai kuota).
+
+- Latency per call diambil dari distribusi yang bisa diatur (fixed / uniform / lognormal).
+- Injeksi rate limit: acak (probabilitas) dan/atau kuota RPM per API key, dibalas 429
+  + header retry-after. Header x-ratelimit-*-requests seperti Groq: kuota HARIAN (RPD).
+- Jawaban kalengan (canned) per jenis prompt: router, generate soal, evaluasi (tunggal &
+  batch), analisis psikologi, analisis progres, casual chat. Mendukung stream=True (SSE).
+
+Jalankan sendiri:
+    python -m bench.fake_groq --port 8999 --latency lognormal:600,0.4 --rate-limit 0.02
+lalu arahkan aplikasi ke sini:  GROQ_BASE_URL=http://127.0.0.1:8999
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from collections import deque
+from typing import Dict, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class LatencyModel:
+    """Spesifikasi: "fixed:MS", "uniform:MIN_MS,MAX_MS", atau "lognormal:MEDIAN_MS,SIGMA"."""
+
+    def __init__(self, spec: str = "lognormal:600,0.4", seed: Optional[int] = None):
+        self.spec = spec
+        kind, _, params = spec.partition(":")
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p]
+        self.rng = random.Random(seed)
+        if kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Distribusi latency tidak dikenal: {spec}")
+
+    def sample(self) -> float:
+        """Detik."""
+        if self.kind == "fixed":
+            ms = self.params[0]
+        elif self.kind == "uniform":
+            ms = self.rng.uniform(self.params[0], self.params[1])
+        else:
+            ms = self.rng.lognormvariate(math.log(self.params[0]), self.params[1])
+        return max(ms, 0.0) / 1000
+
+
+# ==========================================
+# JAWABAN KALENGAN PER JENIS PROMPT
+# ==========================================
+ROUTER_SKILL = re.compile(r"- (.+)")
+EXAM_WORDS = re.compile(r"\b(tes|test|ujian|uji|soal|quiz|kuis|exam)\b", re.IGNORECASE)
+RECOMMEND_WORDS = re.compile(r"\b(saran|rekomendasi|belajar apa|mulai dari mana)\b", re.IGNORECASE)
+
+
+def _prompt_text(messages) -> str:
+    return "\n".join(str(m.get("content", "")) for m in messages)
+
+
+def classify_prompt(messages) -> str:
+    text = _prompt_text(messages)
+    if "'Router'" in text:
+        return "router"
+    if "Buatkan 1 soal esai" in text:
+        return "question"
+    if "Daftar Soal & Jawaban" in text:
+        return "evaluate_batch"
+    if "Dosen AI" in text:
+        return "evaluate"
+    if "Konsultan Karir" in text:
+        return "psych"
+    if "DATA PROGRESS" in text:
+        return "progress"
+    return "casual"
+
+
+def canned_content(kind: str, messages, rng: random.Random) -> str:
+    text = _prompt_text(messages)
+    if kind == "router":
+        user_text = str(messages[-1].get("content", ""))
+        if EXAM_WORDS.search(user_text):
+            skills = ROUTER_SKILL.findall(text)[:1]
+            return json.dumps({"action": "START_EXAM", "detected_skills": [s.strip() for s in skills]})
+        if RECOMMEND_WORDS.search(user_text):
+            return json.dumps({"action": "GET_RECOMMENDATION", "detected_skills": []})
+        return json.dumps({"action": "CASUAL_CHAT", "detected_skills": []})
+    if kind == "question":
+        n = rng.randint(1, 10 ** 6)
+        return json.dumps({
+            "question_text": f"Jelaskan bagaimana dan mengapa konsep ini dipakai dalam proyek nyata? (#{n})",
+            "grading_rubric": {"keywords": ["konsep", "contoh", "alasan"],
+                               "explanation_focus": "Definisi, contoh penerapan dan alasan pemakaian"},
+        })
+    if kind == "evaluate":
+        score = rng.randint(40, 95)
+        return json.dumps({"score": score, "feedback": "Penjelasanmu sudah cukup baik, tambahkan contoh ya.",
+                           "is_correct": score >= 70})
+    if kind == "evaluate_batch":
+        count = len(re.findall(r'"id": \d+', text))
+        results = []
+        for i in range(count):
+            score = rng.randint(40, 95)
+            results.append({"id": i + 1, "score": score, "feedback": "Cukup baik, tambahkan contoh.",
+                            "is_correct": score >= 70})
+        return json.dumps({"results": results})
+    if kind == "psych":
+        return ("Wah, kamu punya bakat alami di role ini! Kebiasaanmu menunjukkan pola pikir yang pas, "
+                "modal penting buat berkembang di dunia IT. Yuk mulai eksplorasi skill dasarnya! 🚀")
+    if kind == "progress":
+        return ("Hai! 👋\n\n🏆 **Highlights**\n- Progres belajarmu konsisten 🔥\n\n"
+                "🚧 **Next Focus**\n- Lanjutkan course yang sedang berjalan\n\nGas terus! 🚀")
+    return ("Pertanyaan bagus! Konsep ini dipakai untuk memecah masalah besar jadi bagian kecil "
+            "yang mudah dikelola. Coba praktikkan dengan contoh sederhana dulu ya! 😊")
+
+
+# ==========================================
+# SERVER
+# ==========================================
+
+class FakeGroq:
+    def __init__(self, latency: LatencyModel, rate_limit: float = 0.0, rpm: int = 0,
+                 retry_after: float = 1.0, seed: Optional[int] = None, rpd: int = 14400):
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rpm = rpm
+        self.rpd = rpd
+        self.daily: Dict[str, int] = {}
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.windows: Dict[str, deque] = {}
+        self.stats = {"requests": 0, "throttled": 0, "by_kind": {}}
+
+    def _over_quota(self, api_key: str, now: float) -> Optional[float]:
+        """Sisa detik sampai kuota RPM key ini terbuka lagi (None jika masih ada kuota)."""
+        if self.rpm <= 0:
+            return None
+        window = self.windows.setdefault(api_key, deque())
+        while window and now - window[0] >= 60:
+            window.popleft()
+        if len(window) >= self.rpm:
+            return 60 - (now - window[0])
+        window.append(now)
+        return None
+
+    def _rate_headers(self, api_key: str) -> dict:
+        # Groq: *-requests = kuota harian; reset = waktu sampai 1 request kembali tersedia
+        if self.rpd <= 0:
+            return {}
+        used = self.daily.get(api_key, 0)
+        return {"x-ratelimit-limit-requests": str(self.rpd),
+                "x-ratelimit-remaining-requests": str(max(self.rpd - used, 0)),
+                "x-ratelimit-reset-requests": f"{86400 / self.rpd:.2f}s"}
+
+    def throttle_response(self, wait: float) -> JSONResponse:
+        self.stats["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit reached (fake)", "type": "requests", "code": "rate_limit_exceeded"}},
+            headers={"retry-after": f"{max(wait, 0.1):.1f}"},
+        )
+
+    def build_app(self) -> FastAPI:
+        app = FastAPI(title="Fake Groq")
+
+        @app.post("/openai/v1/chat/completions")
+        async def chat_completions(request: Request):
+            body = await request.json()
+            api_key = request.headers.get("authorization", "").replace("Bearer ", "")
+            self.stats["requests"] += 1
+
+            wait = self._over_quota(api_key, time.monotonic())
+            if wait is None and self.rng.random() < self.rate_limit:
+                wait = self.retry_after
+            if wait is not None:
+                return self.throttle_response(wait)
+            self.daily[api_key] = self.daily.get(api_key, 0) + 1
+
+            messages = body.get("messages", [])
+            kind = classify_prompt(messages)
+            self.stats["by_kind"][kind] = self.stats["by_kind"].get(kind, 0) + 1
+            content = canned_content(kind, messages, self.rng)
+            prompt_tokens = len(_prompt_text(messages)) // 4
+            completion_tokens = max(len(content) // 4, 1)
+            usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                     "total_tokens": prompt_tokens + completion_tokens}
+            delay = self.latency.sample()
+            completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+            model = body.get("model", "fake")
+
+            if body.get("stream"):
+                return StreamingResponse(self._stream(completion_id, model, content, usage, delay),
+                                         media_type="text/event-stream", headers=self._rate_headers(api_key))
+
+            await asyncio.sleep(delay)
+            return JSONResponse({
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": usage,
+            }, headers=self._rate_headers(api_key))
+
+        @app.get("/stats")
+        async def stats():
+            return {"latency": self.latency.spec, "rate_limit": self.rate_limit, "rpm": self.rpm, "rpd": self.rpd, **self.stats}
+
+        return app
+
+    async def _stream(self, completion_id: str, model: str, content: str, usage: dict, delay: float):
+        # Separuh latency sebelum token pertama, sisanya tersebar di antara potongan teks
+        await asyncio.sleep(delay / 2)
+        words = content.split(" ")
+        step = delay / 2 / max(len(words), 1)
+        for i, word in enumerate(words):
+            chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": model, "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")},
+                                                  "finish_reason": None}]}
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(step)
+        final = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                 "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": usage}}
+        yield f"data: {json.dumps(final)}\n\n"
+        yield "data: [DONE]\n\n"
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", default="lognormal:600,0.4",
+                        help='"fixed:MS", "uniform:MIN,MAX" atau "lognormal:MEDIAN_MS,SIGMA"')
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Probabilitas 429 acak per call (0-1)")
+    parser.add_argument("--rpm", type=int, default=0, help="Kuota request per menit per API key (0 = tanpa batas)")
+    parser.add_argument("--rpd", type=int, default=14400, help="Kuota harian yang dilaporkan di header x-ratelimit-*-requests")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def from_args(args) -> FakeGroq:
+    return FakeGroq(LatencyModel(args.latency, args.seed), args.rate_limit, args.rpm, seed=args.seed, rpd=args.rpd)
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions API untuk benchmark.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8999)
+    add_arguments(parser)
+    args = parser.parse_args()
+    uvicorn.run(from_args(args).build_app(), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# bench/load_test.py
+"""
+Load test end-to-end memakai fake Groq lokal (tanpa kuota Groq).
+
+Menjalankan fake Groq (thread) + aplikasi (subprocess uvicorn, GROQ_BASE_URL diarahkan
+ke fake Groq), lalu menembak /chat/process, /recommendations, /exam/submit dan
+/psych/submit pada beberapa level konkurensi. Output: throughput & latency p50/p95/p99.
+
+    python -m bench.load_test                               # bandingkan dengan bench/baseline.json
+    python -m bench.load_test --concurrency 1,8,32 --requests 200 --latency lognormal:600,0.4
+    python -m bench.load_test --rate-limit 0.05 --rpm 60    # uji perilaku saat kena 429
+    python -m bench.load_test --save-baseline
+
+Baseline di bench/baseline.json dibuat dengan argumen default. Bandingkan hanya
+hasil dengan argumen yang sama (dan di mesin yang sama).
+"""
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Tuple
+
+import httpx
+
+from bench import fake_groq
+from bench.common import RESULTS_DIR, ROOT_DIR, report_regressions, save_section, summarize_ms, write_results
+
+ROLE = "AI Engineer"
+CHAT_MESSAGES = [
+    "halo mora, apa kabar?",
+    "apa bedanya list dan tuple di python?",
+    "jelaskan overfitting dong",
+    "aku mau tes python",
+    "saran belajar buat jadi AI engineer apa ya?",
+    "gimana cara kerja gradient descent?",
+    "terima kasih mora!",
+]
+SKILLS = ["Python", "SQL", "Machine Learning", "Deep Learning", "Data Visualization", "JavaScript", "React"]
+LEVELS = ["Pemula", "Menengah", "Mahir"]
+ANSWERS = [
+    "Konsep ini dipakai untuk memisahkan tanggung jawab, contohnya pada modul data, alasannya supaya mudah dirawat.",
+    "Menurut saya konsep tersebut penting karena contoh penerapannya banyak dan alasannya efisiensi.",
+    "tidak tahu",
+    "",
+]
+
+Request = Tuple[str, str, dict]
+CACHED_METHODS = ["process_user_intent", "casual_chat", "generate_question", "analyze_psych_result"]
+
+
+def chat_request(rng: random.Random) -> Request:
+    return "POST", "/chat/process", {"message": rng.choice(CHAT_MESSAGES), "role": ROLE, "history": []}
+
+
+def recommendation_request(rng: random.Random) -> Request:
+    gaps = [{"skill_name": rng.choice(SKILLS), "target_level": rng.choice(LEVELS)} for _ in range(rng.randint(1, 4))]
+    return "POST", "/recommendations", {"name": "bench", "active_path": ROLE, "missing_skills": gaps}
+
+
+def exam_request(rng: random.Random) -> Request:
+    rubric = {"keywords": ["konsep", "contoh", "alasan"], "explanation_focus": "Definisi, contoh & alasan pemakaian"}
+    return "POST", "/exam/submit", {"user_answer": rng.choice(ANSWERS), "question_context": rubric}
+
+
+def psych_request(rng: random.Random) -> Request:
+    answers = {str(q): rng.choice("AB") for q in range(1, 6) if rng.random() > 0.1}
+    return "POST", "/psych/submit", {"answers": answers}
+
+
+SCENARIOS: Dict[str, Callable[[random.Random], Request]] = {
+    "chat": chat_request,
+    "recommendations": recommendation_request,
+    "exam_submit": exam_request,
+    "psych_submit": psych_request,
+}
+
+
+# ==========================================
+# PROSES: FAKE GROQ & APLIKASI
+# ==========================================
+
+def start_fake_groq(args, port: int):
+    import uvicorn
+
+    app = fake_groq.from_args(args).build_app()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+def start_app(args, port: int, groq_port: int, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "GROQ_BASE_URL": f"http://127.0.0.1:{groq_port}",
+        "GROQ_API_KEYS": ",".join(f"gsk_fake_bench_key_{i:04d}" for i in range(args.keys)),
+        # Kuota lokal key pool mengikuti fake Groq (default: tanpa batas)
+        "GROQ_RPM_LIMIT": str(args.rpm or 100000),
+        "GROQ_TPM_LIMIT": "100000000",
+        "MORA_CACHE_DIR": workdir,
+        "QUESTION_POOL_ENABLED": os.environ.get("QUESTION_POOL_ENABLED", "0"),
+        "PSYCH_TABLE_ENABLED": os.environ.get("PSYCH_TABLE_ENABLED", "0"),
+        "WARMUP_IN_BACKGROUND": "1",
+    }
+    if not args.warm_cache:
+        # Default: cache LLM & singleflight mati, supaya tiap level konkurensi benar-benar
+        # mengukur jalur upstream (hasil tidak bergantung pada kebetulan prompt kembar)
+        for method in CACHED_METHODS:
+            env[f"LLM_CACHE_TTL_{method.upper()}"] = "0"
+        env["LLM_COALESCE_METHODS"] = ""
+    log = open(os.path.join(workdir, "app.log"), "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT_DIR, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 180):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Aplikasi tidak siap dalam {timeout:g} detik")
+
+
+# ==========================================
+# DRIVER
+# ==========================================
+
+async def drive(base_url: str, make_request: Callable[[random.Random], Request], concurrency: int,
+                total: int, seed: int) -> dict:
+    rng = random.Random(seed)
+    requests = [make_request(rng) for _ in range(total)]
+    queue = asyncio.Queue()
+    for item in requests:
+        queue.put_nowait(item)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            try:
+                method, path, body = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    ok = statuses.get("200", 0)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "throughput_rps": round(total / elapsed, 2),
+        **summarize_ms(latencies),
+        "error_rate": round(1 - ok / total, 4) if total else 0.0,
+        "statuses": statuses,
+    }
+
+
+def run(args) -> dict:
+    groq_port, app_port = args.groq_port, args.port
+    base_url = f"http://127.0.0.1:{app_port}"
+    fake = start_fake_groq(args, groq_port)
+    workdir = tempfile.mkdtemp(prefix="mora-bench-")
+    app = start_app(args, app_port, groq_port, workdir)
+    try:
+        wait_ready(base_url)
+        print(f"✅ Aplikasi siap di {base_url} (fake Groq :{groq_port}, latency {args.latency}, log {workdir}/app.log)")
+        results = {}
+        scenarios = args.scenarios.split(",") if args.scenarios else list(SCENARIOS)
+        for name in scenarios:
+            for concurrency in args.concurrency:
+                key = f"{name}@c{concurrency}"
+                results[key] = asyncio.run(
+                    drive(base_url, SCENARIOS[name], concurrency, args.requests, args.seed + concurrency))
+                row = results[key]
+                print(f"{key:28} {row['throughput_rps']:>8} rps  p50 {row['p50_ms']:>9} ms  "
+                      f"p95 {row['p95_ms']:>9} ms  p99 {row['p99_ms']:>9} ms  err {row['error_rate']:.2%}")
+        print(f"📦 Fake Groq: {httpx.get(f'http://127.0.0.1:{groq_port}/stats').json()}")
+        return results
+    finally:
+        app.terminate()
+        try:
+            app.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            app.kill()
+        fake.should_exit = True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test MORA dengan fake Groq lokal.")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=60, help="Jumlah request per skenario per level konkurensi")
+    parser.add_argument("--scenarios", default="", help=f"Subset skenario, pisah koma ({', '.join(SCENARIOS)})")
+    parser.add_argument("--keys", type=int, default=4, help="Jumlah API key palsu")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--groq-port", type=int, default=8999)
+    parser.add_argument("--warm-cache", action="store_true", help="Biarkan cache LLM & singleflight aktif (default: dimatikan)")
+    parser.add_argument("--save-baseline", action="store_true")
+    fake_groq.add_arguments(parser)
+    parser.set_defaults(latency="lognormal:300,0.4")
+    args = parser.parse_args()
+    if args.seed is None:
+        args.seed = 42
+
+    results = run(args)
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    print(f"📦 Hasil disimpan ke {write_results('load', results)}")
+    if args.save_baseline:
+        save_section("load", results)
+        print("✅ Baseline load diperbarui.")
+        return 0
+    return report_regressions("load", results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+# bench/microbench.py
+"""
+Microbenchmark jalur lokal (tanpa LLM):
+- find_keywords_in_text untuk pesan pendek / panjang
+- get_recommendations (scoring TF-IDF + filter) untuk 1, 5 dan 20 skill gap
+
+    python -m bench.microbench                  # bandingkan dengan bench/baseline.json
+    python -m bench.microbench --save-baseline  # simpan hasil sebagai baseline baru
+"""
+import argparse
+import csv
+import os
+import random
+import statistics
+import sys
+import time
+
+from bench.common import ROOT_DIR, report_regressions, save_section, write_results
+
+MESSAGES = {
+    "keywords_short": "aku mau belajar python sama sql dong",
+    "keywords_long": (
+        "Halo Mora, aku lagi bingung nih. Di kantor aku pakai Python dan Pandas buat olah data, "
+        "tapi sekarang diminta bikin dashboard pakai React, JavaScript, dan sedikit Docker juga. "
+        "Aku juga pernah coba Machine Learning pakai scikit-learn dan TensorFlow tapi belum paham "
+        "konsep overfitting, regularisasi, dan cross validation. Kira-kira harus mulai dari mana ya? "
+    ) * 4,
+}
+
+
+def bench(func, repeat: int, number: int) -> dict:
+    """Median & mean per call (ms) dari `repeat` kali pengukuran masing-masing `number` panggilan."""
+    func()  # pemanasan
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        runs.append((time.perf_counter() - started) / number)
+    return {
+        "median_ms": round(statistics.median(runs) * 1000, 4),
+        "mean_ms": round(statistics.mean(runs) * 1000, 4),
+        "min_ms": round(min(runs) * 1000, 4),
+        "calls": repeat * number,
+    }
+
+
+def profile(schemas, keywords, gaps: int, rng: random.Random):
+    levels = ["Pemula", "Menengah", "Mahir"]
+    return schemas.UserProfile(
+        name="bench", active_path="AI Engineer",
+        missing_skills=[schemas.SkillGap(skill_name=rng.choice(keywords), target_level=rng.choice(levels))
+                        for _ in range(gaps)],
+        completed_courses=[],
+    )
+
+
+def run(repeat: int, number: int) -> dict:
+    os.environ.setdefault("QUESTION_POOL_ENABLED", "0")
+    os.environ.setdefault("PSYCH_TABLE_ENABLED", "0")
+    sys.path.insert(0, ROOT_DIR)
+    from fastapi import Response
+
+    from app import schemas
+    import app.main as main
+
+    main.load_models()
+    # Tabel rekomendasi dibangun di background setelah load; tunggu supaya yang diukur jalur lookup
+    main.rec_table.wait()
+    with open(os.path.join(ROOT_DIR, "app", "data", "Skill Keywords.csv"), newline="", encoding="utf-8") as f:
+        keywords = [row["keyword"] for row in csv.DictReader(f) if row.get("keyword")]
+
+    results = {}
+    for name, message in MESSAGES.items():
+        results[name] = bench(lambda: main.find_keywords_in_text(message), repeat, number)
+
+    rng = random.Random(7)
+    for gaps in (1, 5, 20):
+        user = profile(schemas, keywords, gaps, rng)
+        results[f"recommendations_{gaps}_gaps"] = bench(
+            lambda: main.get_recommendations(user, Response()), repeat, max(number // gaps, 10))
+    # Skill di luar tabel (typo / frasa bebas) -> fallback scoring TF-IDF live
+    unknown = schemas.UserProfile(
+        name="bench", active_path="AI Engineer",
+        missing_skills=[schemas.SkillGap(skill_name=f"{rng.choice(keywords)} lanjutan", target_level="Menengah")
+                        for _ in range(5)],
+        completed_courses=[],
+    )
+    results["recommendations_5_gaps_live"] = bench(
+        lambda: main.get_recommendations(unknown, Response()), repeat, max(number // 5, 10))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmark keyword matching & scoring rekomendasi.")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--number", type=int, default=200)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.repeat, args.number)
+    print(f"{'benchmark':32} {'median ms':>10} {'mean ms':>10} {'min ms':>10}")
+    for name, row in results.items():
+        print(f"{name:32} {row['median_ms']:>10} {row['mean_ms']:>10} {row['min_ms']:>10}")
+    print(f"📦 Hasil disimpan ke {write_results('micro', results)}")
+
+    if args.save_baseline:
+        save_section("micro", results)
+        print("✅ Baseline micro diperbarui.")
+        return 0
+    return report_regressions("micro", results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# bench/retrieval.py
+"""
+Recall & latency retrieval top-k: inverted index (MaxScore) vs brute force (vecs @ matrix.T).
+
+Katalog sintetis dibuat dari katalog asli: tiap course sintetis = term dari satu course asli
++ term acak (distribusi Zipf atas kosakata vectorizer), bobot acak, dinormalisasi L2.
+Query = nama skill dari "Skill Keywords.csv" yang di-transform oleh vectorizer asli.
+
+    python -m bench.retrieval                          # 1k, 10k, 100k course
+    python -m bench.retrieval --sizes 54,100000 --queries 500
+    python -m bench.retrieval --save-baseline
+
+Recall@k harus 1.0 (hasil index identik dengan brute force); selain itu exit code 1.
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from bench.common import ROOT_DIR, report_regressions, save_section, summarize_ms, write_results
+
+TOP_K = 14
+MIN_SCORE = 0.1
+
+
+def synthetic_matrix(base, n_docs: int, extra_terms: int, seed: int):
+    from scipy.sparse import csr_matrix
+
+    rng = np.random.default_rng(seed)
+    base = base.tocsr()
+    n_terms = base.shape[1]
+    # Peringkat Zipf -> index term (urutan acak supaya term populer tidak selalu kolom awal)
+    term_of_rank = rng.permutation(n_terms)
+    rows, cols, data = [], [], []
+    for i in range(n_docs):
+        src = i % base.shape[0]
+        start, end = base.indptr[src], base.indptr[src + 1]
+        ranks = np.minimum(rng.zipf(1.3, extra_terms) - 1, n_terms - 1)
+        terms = np.unique(np.concatenate([base.indices[start:end], term_of_rank[ranks]]))
+        weights = rng.random(len(terms)) + 0.05
+        rows.append(np.full(len(terms), i))
+        cols.append(terms)
+        data.append(weights / np.linalg.norm(weights))
+    return csr_matrix((np.concatenate(data), (np.concatenate(rows), np.concatenate(cols))),
+                      shape=(n_docs, n_terms))
+
+
+def load_queries(tfidf, n: int, seed: int):
+    with open(os.path.join(ROOT_DIR, "app", "data", "Skill Keywords.csv"), newline="", encoding="utf-8") as f:
+        keywords = [row["keyword"] for row in csv.DictReader(f) if row.get("keyword")]
+    rng = random.Random(seed)
+    vecs = tfidf.transform([rng.choice(keywords).lower() for _ in range(n)])
+    # Query tanpa term yang dikenal vectorizer tidak menguji apa pun
+    nonempty = np.flatnonzero(np.diff(vecs.indptr))
+    return vecs[nonempty]
+
+
+def measure(search, vecs) -> tuple:
+    latencies, results = [], []
+    for g in range(vecs.shape[0]):
+        vec = vecs[g]
+        started = time.perf_counter()
+        idx, scores = search(vec)
+        latencies.append(time.perf_counter() - started)
+        keep = scores[0] >= MIN_SCORE
+        results.append((idx[0][keep], scores[0][keep]))
+    return latencies, results
+
+
+def run(sizes, n_queries: int, seed: int) -> dict:
+    sys.path.insert(0, ROOT_DIR)
+    from app.services.model_registry import load_course_models
+    from app.services.retrieval_index import RetrievalIndex, brute_force_top_k, recall_at_k
+
+    parts = load_course_models()
+    vecs = load_queries(parts["tfidf"], n_queries, seed)
+    results = {}
+    for n_docs in sizes:
+        matrix = parts["matrix"] if n_docs == parts["matrix"].shape[0] else \
+            synthetic_matrix(parts["matrix"], n_docs, extra_terms=30, seed=seed)
+        started = time.perf_counter()
+        index = RetrievalIndex(matrix)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        brute_lat, brute = measure(lambda v: brute_force_top_k(v, matrix, TOP_K), vecs)
+        index_lat, indexed = measure(lambda v: index.search_many(v, TOP_K, MIN_SCORE), vecs)
+        recall = recall_at_k([r for r, _ in brute], [r for r, _ in indexed])
+        max_score_diff = max((float(np.max(np.abs(a - b))) for (_, a), (_, b) in zip(brute, indexed)
+                              if len(a) and len(a) == len(b)), default=0.0)
+
+        for name, latencies in (("brute", brute_lat), ("index", index_lat)):
+            results[f"{name}_{n_docs}"] = {"courses": n_docs, "queries": len(latencies),
+                                           "mean_ms": round(float(np.mean(latencies)) * 1000, 4),
+                                           **summarize_ms(latencies)}
+        results[f"index_{n_docs}"].update({
+            "recall_at_k": round(recall, 4), "max_score_diff": max_score_diff,
+            "build_ms": round(build_ms, 1), "index_kb": round(index.memory_bytes() / 1024, 1),
+            "nnz": int(matrix.nnz),
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall & latency retrieval index vs brute force.")
+    parser.add_argument("--sizes", type=lambda v: [int(n) for n in v.split(",")], default=[1000, 10000, 100000])
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=11)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.queries, args.seed)
+    print(f"{'benchmark':16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'recall@k':>9}")
+    for name, row in results.items():
+        print(f"{name:16} {row['p50_ms']:>9} {row['p95_ms']:>9} {row['p99_ms']:>9} {row.get('recall_at_k', ''):>9}")
+    print(f"📦 Hasil disimpan ke {write_results('retrieval', results)}")
+
+    if any(row.get("recall_at_k", 1.0) < 1.0 for row in results.values()):
+        print("❌ Hasil index berbeda dengan brute force.")
+        return 1
+    if args.save_baseline:
+        save_section("retrieval", results)
+        print("✅ Baseline retrieval diperbarui.")
+        return 0
+    return report_regressions("retrieval", results)
+
+
+if __name__ == "__main__":
+    sys.exit(main())